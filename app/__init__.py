@@ -1,10 +1,11 @@
 from flask import Flask
 from flask_caching import Cache
-from app.config import CACHE_TYPE, CACHE_DIR, CACHE_DEFAULT_TIMEOUT
+from app.config import CACHE_TYPE, CACHE_DIR, CACHE_DEFAULT_TIMEOUT, CACHE_LOCAL_MAX_BYTES, CACHE_LOCAL_TIMEOUT, CACHE_COLUMNAR_MIN_CELLS
 from app.views import main
 from app.dash_app import init_dashboard
 from app.limiter import limiter
 from app.models import init_db
+from app import database
 
 # Initialize cache
 cache = Cache()
@@ -16,7 +17,10 @@ def create_app():
     app.config.update(
         CACHE_TYPE=CACHE_TYPE,
         CACHE_DIR=CACHE_DIR,
-        CACHE_DEFAULT_TIMEOUT=CACHE_DEFAULT_TIMEOUT
+        CACHE_DEFAULT_TIMEOUT=CACHE_DEFAULT_TIMEOUT,
+        CACHE_LOCAL_MAX_BYTES=CACHE_LOCAL_MAX_BYTES,
+        CACHE_LOCAL_TIMEOUT=CACHE_LOCAL_TIMEOUT,
+        CACHE_COLUMNAR_MIN_CELLS=CACHE_COLUMNAR_MIN_CELLS
     )
     
     # Initialize cache with app
@@ -29,6 +33,7 @@ def create_app():
     app.register_blueprint(main)
     
     # Initialize database
+    database.init_app(app)
     with app.app_context():
         init_db()
     
@@ -0,0 +1,213 @@
+import logging
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import pandas as pd
+from cachelib.serializers import FileSystemSerializer
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.filesystemcache import FileSystemCache
+from app.columnar import MAGIC, UnsupportedFrame, dumps_frame, loads_frame
+
+logger = logging.getLogger(__name__)
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by ``value`` in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+class ColumnarSerializer(FileSystemSerializer):
+    """
+    FileSystemCache serializer that writes DataFrames in the columnar format
+    (app.columnar) and pickles everything else. Files written by the plain
+    pickle serializer still load.
+
+    Frames under ``min_cells`` values are pickled too: pickle protocol 5
+    already writes their blocks as raw buffers, and its fixed cost is lower.
+
+    The byte count of each thread's last load is kept (last_load_size) so
+    TwoTierCache can size the values it promotes without serializing them again.
+    """
+    def __init__(self, min_cells: int = 100_000):
+        self.min_cells = min_cells
+        self._sizes = threading.local()
+
+    def last_load_size(self) -> Optional[int]:
+        """Bytes read by this thread's last load."""
+        return getattr(self._sizes, "value", None)
+
+    def dump(self, value: Any, f, protocol: int = pickle.HIGHEST_PROTOCOL) -> None:
+        if isinstance(value, pd.DataFrame) and value.size >= self.min_cells:
+            try:
+                f.write(dumps_frame(value))
+                return
+            except UnsupportedFrame:
+                pass
+        super().dump(value, f, protocol)
+
+    def load(self, f) -> Any:
+        data = f.read()
+        self._sizes.value = len(data)
+        if data[:len(MAGIC)] == MAGIC:
+            return loads_frame(data)
+        try:
+            return pickle.loads(data)
+        except pickle.PickleError as e:
+            self._warn(e)
+            return None
+
+class LRUMemoryTier:
+    """
+    Size-bounded in-process LRU with per-entry expiry.
+
+    Values are returned as stored, not copied: memoized results must be
+    treated as read-only, as they already are when they come back from the
+    shared tier once per call.
+    """
+    def __init__(self, max_bytes: int, default_timeout: int):
+        self.max_bytes = max_bytes
+        self.default_timeout = default_timeout
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at, size = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, size: Optional[int] = None):
+        """Store ``value``; ``size`` in bytes is estimated unless the caller already knows it."""
+        size = estimate_size(value) if size is None else size
+        timeout = self.default_timeout if timeout is None else timeout
+        expires_at = time.monotonic() + timeout if timeout else 0
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+class TwoTierCache(BaseCache):
+    """
+    Flask-Caching backend: an in-process LRU in front of the shared FileSystemCache.
+
+    Hits in this worker are served from memory without unpickling from disk;
+    misses fall through to the shared tier (and populate the local one).
+    Writes go to both; DataFrames are stored on disk in the columnar format. Enable with CACHE_TYPE="app.cache_backend.TwoTierCache".
+    """
+    def __init__(self, shared: BaseCache, max_bytes: int, local_timeout: int, default_timeout: int = 300):
+        super().__init__(default_timeout=default_timeout)
+        self.shared = shared
+        self.local = LRUMemoryTier(max_bytes, local_timeout)
+        self.local_timeout = local_timeout
+        self._stats = {"local": {"hits": 0, "misses": 0}, "shared": {"hits": 0, "misses": 0}}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        shared = FileSystemCache.factory(app, config, list(args), dict(kwargs))
+        shared.serializer = ColumnarSerializer(config.get("CACHE_COLUMNAR_MIN_CELLS", 100_000))
+        return cls(
+            shared,
+            max_bytes=config.get("CACHE_LOCAL_MAX_BYTES", 64 * 1024 * 1024),
+            local_timeout=config.get("CACHE_LOCAL_TIMEOUT", 300),
+            default_timeout=kwargs.get("default_timeout", 300),
+        )
+
+    def _count(self, tier: str, outcome: str):
+        with self._stats_lock:
+            self._stats[tier][outcome] += 1
+
+    def _loaded_size(self) -> Optional[int]:
+        """Serialized size of the value this thread just read from the shared tier, if known."""
+        last_load_size = getattr(getattr(self.shared, "serializer", None), "last_load_size", None)
+        return last_load_size() if last_load_size else None
+
+    def _local_timeout(self, timeout: Optional[int]) -> int:
+        timeout = self._normalize_timeout(timeout)
+        return min(timeout, self.local_timeout) if timeout else self.local_timeout
+
+    def get(self, key: str) -> Any:
+        found, value = self.local.get(key)
+        if found:
+            self._count("local", "hits")
+            return value
+        self._count("local", "misses")
+        value = self.shared.get(key)
+        if value is None:
+            self._count("shared", "misses")
+            return None
+        self._count("shared", "hits")
+        # The shared tier doesn't expose the remaining lifetime; the local TTL bounds staleness
+        self.local.set(key, value, self.local_timeout, size=self._loaded_size())
+        return value
+
+    def has(self, key: str) -> bool:
+        found, _ = self.local.get(key)
+        return found or self.shared.has(key)
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        self.local.set(key, value, self._local_timeout(timeout))
+        return self.shared.set(key, value, timeout)
+
+    def add(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        added = self.shared.add(key, value, timeout)
+        if added:
+            self.local.set(key, value, self._local_timeout(timeout))
+        return added
+
+    def delete(self, key: str) -> bool:
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def clear(self) -> bool:
+        self.local.clear()
+        return self.shared.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit and miss counts per tier for this worker, plus the local tier's size in bytes."""
+        with self._stats_lock:
+            stats = {tier: dict(counts) for tier, counts in self._stats.items()}
+        stats["local"]["bytes"] = self.local.size
+        return stats
@@ -1,7 +1,8 @@
-import requests
 from datetime import datetime, timedelta
-from app.utils import SessionLocal, TaoPriceHistory, Base
+from app.models import get_db
+from app.utils import TaoPriceHistory, Base
 from app.config import COINGECKO_API_KEY
+from app.http_cache import conditional_get
 import logging
 
 COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
@@ -23,7 +24,7 @@ def fetch_tao_price_from_coingecko():
         "x-cg-pro-api-key": COINGECKO_API_KEY
     }
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
+        resp = conditional_get(url, params=params, headers=headers)
         resp.raise_for_status()
         data = resp.json()
         price = data.get(TAO_ID, {}).get("usd")
@@ -48,7 +49,7 @@ def fetch_tao_price_history_from_coingecko(days=365):
         "x-cg-pro-api-key": COINGECKO_API_KEY
     }
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=15)
+        resp = conditional_get(url, params=params, headers=headers)
         resp.raise_for_status()
         data = resp.json()
         prices = data.get("prices", [])
@@ -67,23 +68,24 @@ def update_tao_price_history(days=365):
     Fetch and store daily close TAO price for the past `days` days in the database.
     Skips dates already present.
     """
-    session = SessionLocal()
-    existing_dates = set(r.date.date() for r in session.query(TaoPriceHistory.date).all())
+    with get_db() as session:
+        existing_dates = set(r.date.date() for r in session.query(TaoPriceHistory.date).all())
+    # Fetched without holding a connection
     history = fetch_tao_price_history_from_coingecko(days)
     new_rows = 0
-    for entry in history:
-        if entry["date"].date() not in existing_dates:
-            row = TaoPriceHistory(
-                date=entry["date"],
-                price_usd=entry["price_usd"],
-                source="coingecko",
-                updated_at=datetime.utcnow()
-            )
-            session.add(row)
-            new_rows += 1
-    if new_rows > 0:
-        session.commit()
-    session.close()
+    with get_db() as session:
+        for entry in history:
+            if entry["date"].date() not in existing_dates:
+                row = TaoPriceHistory(
+                    date=entry["date"],
+                    price_usd=entry["price_usd"],
+                    source="coingecko",
+                    updated_at=datetime.utcnow()
+                )
+                session.add(row)
+                new_rows += 1
+        if new_rows > 0:
+            session.commit()
     logger.info(f"Added {new_rows} new TAO price history rows.")
     return new_rows
 
@@ -92,23 +94,21 @@ def get_latest_tao_price():
     Get the most recent TAO price from the database, or fetch from CoinGecko if not available.
     Returns (price, date).
     """
-    session = SessionLocal()
-    row = session.query(TaoPriceHistory).order_by(TaoPriceHistory.date.desc()).first()
-    session.close()
+    with get_db() as session:
+        row = session.query(TaoPriceHistory).order_by(TaoPriceHistory.date.desc()).first()
     if row and row.price_usd is not None:
         return row.price_usd, row.date
     # Fallback: fetch from API and store
     price, ts = fetch_tao_price_from_coingecko()
     if price is not None:
-        session = SessionLocal()
-        row = TaoPriceHistory(
-            date=ts.replace(hour=0, minute=0, second=0, microsecond=0),
-            price_usd=price,
-            source="coingecko",
-            updated_at=datetime.utcnow()
-        )
-        session.add(row)
-        session.commit()
-        session.close()
+        with get_db() as session:
+            row = TaoPriceHistory(
+                date=ts.replace(hour=0, minute=0, second=0, microsecond=0),
+                price_usd=price,
+                source="coingecko",
+                updated_at=datetime.utcnow()
+            )
+            session.add(row)
+            session.commit()
         return price, ts
     return None, None 
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Columnar binary encoding for pandas DataFrames.
+
+Layout: MAGIC, a little-endian uint32 header length, a JSON header, then
+the data buffers, each starting on an ALIGNMENT boundary.
+
+Numeric, boolean and datetime columns of the same dtype are stored
+together as one C-ordered (columns x rows) NumPy buffer, read back with
+np.frombuffer; each column is a view of its row of that buffer, so nothing
+is copied (including straight from an mmap). String columns share one dictionary: int32 codes
+plus the distinct values as JSON. Frames with anything else (nested
+objects, extension dtypes, MultiIndex) raise UnsupportedFrame so callers
+can fall back to pickle.
+"""
+import json
+import struct
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from app import json_codec
+
+MAGIC = b"COLF\x01"
+ALIGNMENT = 64
+_HEADER = struct.Struct("<I")
+_NUMPY_KINDS = "biufcmM"
+# Codes for missing strings; JSON has a single null, pandas has two
+_NONE, _NAN = -1, -2
+
+class UnsupportedFrame(ValueError):
+    """The frame holds data the columnar format does not encode losslessly."""
+
+def _pad(size: int) -> int:
+    return -size % ALIGNMENT
+
+def _check_label(label):
+    if label is not None and not isinstance(label, (str, int)):
+        raise UnsupportedFrame(f"Unsupported label {label!r}")
+    return label
+
+def _is_numpy(dtype) -> bool:
+    return isinstance(dtype, np.dtype) and dtype.kind in _NUMPY_KINDS
+
+def _is_string(values) -> bool:
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty")
+
+class _Writer:
+    def __init__(self):
+        self.buffers: List[bytes] = []
+        self.offset = 0
+
+    def add(self, buffer: bytes) -> dict:
+        entry = {"offset": self.offset, "nbytes": len(buffer)}
+        self.buffers.append(buffer + b"\0" * _pad(len(buffer)))
+        self.offset += len(buffer) + _pad(len(buffer))
+        return entry
+
+    def strings(self, values) -> dict:
+        items = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(items)
+        codes = codes.astype(np.int32)
+        missing = np.flatnonzero(codes == _NONE)
+        if len(missing):
+            nan = [i for i in missing if items[i] is not None]
+            codes[nan] = _NAN
+        entry = {"kind": "strings", "values": self.add(json_codec.dumps(list(uniques)).encode("utf-8"))}
+        entry.update(self.add(codes.tobytes()))
+        return entry
+
+    def values(self, values) -> dict:
+        """One column or index."""
+        if _is_numpy(values.dtype):
+            array = np.ascontiguousarray(values.to_numpy())
+            entry = {"kind": "numpy", "dtype": array.dtype.str}
+            entry.update(self.add(array.tobytes()))
+            return entry
+        if _is_string(values):
+            return self.strings(values)
+        raise UnsupportedFrame(f"Unsupported dtype {values.dtype}")
+
+def dumps_frame(df: pd.DataFrame) -> bytes:
+    """
+    Encode ``df`` in the columnar format.
+
+    Raises:
+        UnsupportedFrame: If a column, the index or a label cannot be encoded
+    """
+    if isinstance(df.columns, pd.MultiIndex) or not df.columns.is_unique:
+        raise UnsupportedFrame("Columns must be unique and flat")
+    writer = _Writer()
+    header = {
+        "rows": len(df),
+        "order": [_check_label(name) for name in df.columns],
+        "columns_name": _check_label(df.columns.name),
+        "blocks": [],
+    }
+
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        header["index"] = {"kind": "range", "start": index.start, "stop": index.stop, "step": index.step}
+    elif isinstance(index, pd.MultiIndex):
+        raise UnsupportedFrame("MultiIndex is not supported")
+    else:
+        header["index"] = writer.values(index)
+    header["index"]["name"] = _check_label(index.name)
+
+    numeric: Dict[str, List] = {}
+    strings = []
+    for name, dtype in df.dtypes.items():
+        if _is_numpy(dtype):
+            numeric.setdefault(dtype.str, []).append(name)
+        elif _is_string(df[name]):
+            strings.append(name)
+        else:
+            raise UnsupportedFrame(f"Unsupported dtype {dtype} in column {name!r}")
+    for dtype, names in numeric.items():
+        block = np.ascontiguousarray(df[names].to_numpy(dtype=np.dtype(dtype)).T)
+        entry = {"kind": "numpy", "dtype": dtype, "names": names}
+        entry.update(writer.add(block.tobytes()))
+        header["blocks"].append(entry)
+    if strings:
+        # One dictionary for all string columns, codes laid out column by column
+        entry = writer.strings(df[strings].to_numpy().T.ravel())
+        entry["names"] = strings
+        header["blocks"].append(entry)
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix = MAGIC + _HEADER.pack(len(header_bytes)) + header_bytes
+    return b"".join([prefix, b"\0" * _pad(len(prefix))] + writer.buffers)
+
+def is_columnar(buffer) -> bool:
+    """True if ``buffer`` starts with the columnar MAGIC."""
+    return bytes(buffer[:len(MAGIC)]) == MAGIC
+
+def loads_frame(buffer, copy: bool = True) -> pd.DataFrame:
+    """
+    Decode a frame written by dumps_frame from bytes, a memoryview or an mmap.
+    With ``copy=False`` numeric blocks are read-only views into ``buffer``.
+    """
+    view = memoryview(buffer)
+    if not is_columnar(view):
+        raise ValueError("Not a columnar frame")
+    (header_len,) = _HEADER.unpack_from(view, len(MAGIC))
+    start = len(MAGIC) + _HEADER.size
+    header = json.loads(bytes(view[start:start + header_len]))
+    base = start + header_len
+    base += _pad(base)
+    rows = header["rows"]
+
+    def raw(entry):
+        return view[base + entry["offset"]:base + entry["offset"] + entry["nbytes"]]
+
+    def decode(entry):
+        if entry["kind"] == "numpy":
+            array = np.frombuffer(raw(entry), dtype=np.dtype(entry["dtype"]))
+            return array.copy() if copy else array
+        uniques = json_codec.loads(bytes(raw(entry["values"])))
+        lookup = np.empty(len(uniques) + 2, dtype=object)
+        lookup[:len(uniques)] = uniques
+        lookup[_NONE], lookup[_NAN] = None, np.nan
+        return lookup.take(np.frombuffer(raw(entry), dtype=np.int32))
+
+    index_entry = header["index"]
+    if index_entry["kind"] == "range":
+        index = pd.RangeIndex(index_entry["start"], index_entry["stop"], index_entry["step"], name=index_entry["name"])
+    else:
+        index = pd.Index(decode(index_entry), name=index_entry["name"])
+
+    # Columns are assembled in their original order straight from the block
+    # buffers: reordering a consolidated frame afterwards would copy every block
+    columns = {}
+    for entry in header["blocks"]:
+        values = decode(entry).reshape(len(entry["names"]), rows)
+        columns.update(zip(entry["names"], values))
+    if columns:
+        df = pd.DataFrame({name: columns[name] for name in header["order"]}, index=index,
+                          columns=header["order"], copy=False)
+    else:
+        df = pd.DataFrame(index=index)
+    df.columns.name = header["columns_name"]
+    return df
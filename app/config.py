@@ -19,9 +19,23 @@ COINGECKO_API_KEY = os.environ.get('COINGECKO_API_KEY')
 TAO_API_BASE = "https://api.tao.app"
 
 # === Caching Configuration ===
-CACHE_TYPE = os.getenv("CACHE_TYPE", "filesystem")  # Options: 'filesystem', 'redis', etc.
-CACHE_DIR = os.getenv("CACHE_DIR", "./cache")       # Used if CACHE_TYPE == 'filesystem'
+CACHE_TYPE = os.getenv("CACHE_TYPE", "app.cache_backend.TwoTierCache")  # Options: 'filesystem', 'redis', 'app.cache_backend.TwoTierCache' (memory LRU + filesystem), etc.
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")       # Used by the filesystem and TwoTierCache backends
 CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "600"))  # in seconds
+CACHE_LOCAL_MAX_BYTES = int(os.getenv("CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024)))  # Per-worker memory tier of TwoTierCache
+CACHE_COLUMNAR_MIN_CELLS = int(os.getenv("CACHE_COLUMNAR_MIN_CELLS", "100000"))  # DataFrames this large are cached in the columnar format, smaller ones pickled
+CACHE_LOCAL_TIMEOUT = int(os.getenv("CACHE_LOCAL_TIMEOUT", "300"))  # Max seconds an entry is served from memory without checking disk
+# Serve subnet info/screener rows past CACHE_DEFAULT_TIMEOUT while a background refresh runs,
+# up to CACHE_MAX_STALENESS seconds old; beyond that the refresh is synchronous again
+CACHE_STALE_WHILE_REVALIDATE = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_STALENESS = int(os.getenv("CACHE_MAX_STALENESS", "3600"))  # in seconds
+# Results memoized with app.data_version.memoize_versioned are keyed on the data version,
+# so they are recomputed when collectors commit new data; this only bounds cache size
+VERSIONED_CACHE_TIMEOUT = int(os.getenv("VERSIONED_CACHE_TIMEOUT", "86400"))  # in seconds
+# Siblings of CACHE_DIR, never inside it: the filesystem cache backend treats
+# every entry of CACHE_DIR as one of its own files when clearing and pruning
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.normpath(CACHE_DIR) + "_snapshots")  # Memory-mapped per-data-version frames shared by workers
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.normpath(CACHE_DIR) + "_http")  # ETag/Last-Modified cache for outbound GETs
 
 # === Rate Limiting Configuration ===
 # Flask web application rate limits (for incoming HTTP requests)
@@ -37,9 +51,26 @@ TAO_API_RATE_LIMIT = {
     "requests_per_minute": int(os.getenv("TAO_API_REQUESTS_PER_MINUTE", "30")),  # Default: 30 requests per minute
     "initial_retry_delay": float(os.getenv("TAO_API_INITIAL_RETRY_DELAY", "1.0")),  # Initial delay in seconds
     "max_retries": int(os.getenv("TAO_API_MAX_RETRIES", "3")),  # Maximum number of retries
-    "max_retry_delay": float(os.getenv("TAO_API_MAX_RETRY_DELAY", "30.0")),  # Maximum retry delay in seconds
+    "max_retry_delay": float(os.getenv("TAO_API_MAX_RETRY_DELAY", "30.0")),  # Maximum retry delay in seconds; caps a shared Retry-After pause
+    "web_acquire_timeout": float(os.getenv("TAO_API_WEB_ACQUIRE_TIMEOUT", "5.0")),  # Max seconds a web request waits to refresh an endpoint (lock, lease and token) before serving stale rows; keep well below the gunicorn worker timeout
     "batch_size": int(os.getenv("TAO_API_BATCH_SIZE", "5")),  # Number of requests to process before pausing
     "batch_delay": float(os.getenv("TAO_API_BATCH_DELAY", "2.0")),  # Delay between batches in seconds
+    "burst": int(os.getenv("TAO_API_BURST", "1")),  # Requests allowed back-to-back before the rate applies
+    "max_workers": int(os.getenv("TAO_API_MAX_WORKERS", "4")),  # Concurrent collector requests (1 = sequential batches)
+    # Adaptive (AIMD) limit: starts at requests_per_minute, then learns the real ceiling
+    "min_requests_per_minute": float(os.getenv("TAO_API_MIN_REQUESTS_PER_MINUTE", "6")),  # Floor after backoffs
+    "max_requests_per_minute": float(os.getenv("TAO_API_MAX_REQUESTS_PER_MINUTE", "120")),  # Ceiling for increases
+    "increase_per_success": float(os.getenv("TAO_API_INCREASE_PER_SUCCESS", "0.5")),  # Requests/minute added per success
+    "decrease_factor": float(os.getenv("TAO_API_DECREASE_FACTOR", "0.5")),  # Multiplier applied on 429/503
+}
+
+# === Outbound HTTP ===
+# Shared client used for TAO.app and CoinGecko (app/http_client.py)
+HTTP_CLIENT = {
+    "connect_timeout": float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),  # Seconds to establish a connection
+    "read_timeout": float(os.getenv("HTTP_READ_TIMEOUT", "15")),  # Seconds to wait between bytes of the response
+    "pool_connections": int(os.getenv("HTTP_POOL_CONNECTIONS", "4")),  # Hosts kept in the pool cache
+    "pool_maxsize": int(os.getenv("HTTP_POOL_MAXSIZE", "10")),  # Keep-alive connections per host
 }
 
 # === Database Configuration ===
@@ -49,6 +80,16 @@ if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 DATABASE_URI = database_url
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Shared engine settings (app/database.py)
+DATABASE_ENGINE = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),  # Connections kept open per process
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),  # Extra connections allowed under load
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),  # Seconds to wait for a free connection
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # Reconnect connections older than this, in seconds
+    "statement_timeout_ms": int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000")),  # PostgreSQL statement_timeout
+    "sqlite_busy_timeout_ms": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),  # Wait on a locked SQLite database
+    "sqlite_synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # NORMAL is durable enough under WAL
+}
 
 # === Scoring Weights ===
 SUBNET_SCORING_WEIGHTS = {
@@ -63,6 +104,11 @@ SUBNET_SCORING_WEIGHTS = {
 # Time series data retention configuration
 RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))  # Days to keep time series data
 MAX_ROWS_PER_NETUID = int(os.getenv("MAX_ROWS_PER_NETUID", "100"))  # Max rows per netuid
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))  # Rows deleted per retention transaction
+RETENTION_FREQUENCY = os.getenv("RETENTION_FREQUENCY", "daily")  # Cadence of the scheduled retention pass
+ROLLUP_HOURLY_RETENTION_DAYS = int(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", "90"))  # Days to keep hourly APY rollups; daily rollups are kept indefinitely
+TIME_SERIES_FLUSH_SIZE = int(os.getenv("TIME_SERIES_FLUSH_SIZE", "100"))  # Rows per multi-row INSERT from collectors
+APY_RAW_ARCHIVE = os.getenv("APY_RAW_ARCHIVE", "false").lower() in ("1", "true", "yes")  # Also keep full TAO.app APY responses in subnet_apy_raw
 DATA_FETCH_FREQUENCIES = {
     "apy": "daily",  # APY and emissions data
     "emissions": "daily",
@@ -70,3 +116,11 @@ DATA_FETCH_FREQUENCIES = {
     "reputation": "hourly",
     "metadata": "weekly"  # GitHub and other metadata
 }
+
+# === Collector Scheduler ===
+# Long-running worker (Procfile: worker) that runs each metric at its DATA_FETCH_FREQUENCIES cadence
+SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "60"))  # Max sleep between checks
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.05"))  # Up to this fraction of each cadence is added after the window start
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "300"))  # Leader lease lifetime on SQLite, in seconds
+SCHEDULER_RETRY_SECONDS = int(os.getenv("SCHEDULER_RETRY_SECONDS", "900"))  # Delay before a window with failed netuids is resumed
+COLLECTION_MAX_ATTEMPTS = int(os.getenv("COLLECTION_MAX_ATTEMPTS", "3"))  # Attempts per netuid and collection window before it is given up
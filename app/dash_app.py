@@ -2,8 +2,9 @@ from dash import Dash, html, dcc, dash_table, Input, Output
 import plotly.express as px
 import pandas as pd
 from app.logic import compute_basic_subnet_score
-from app.utils import fetch_combined_subnet_data, load_latest_apy_df
-from app.config import CACHE_DEFAULT_TIMEOUT
+from app.utils import fetch_combined_subnet_data, load_latest_apy_df, refresh_subnet_cache, SubnetInfoCache, SubnetScreenerCache
+from app.data_version import memoize_versioned
+from app.models import SubnetAPY
 
 def init_dashboard(server, cache):
     app = Dash(
@@ -15,13 +16,13 @@ def init_dashboard(server, cache):
 
     app.title = "Subnet Dashboard"
 
-    @cache.memoize(timeout=CACHE_DEFAULT_TIMEOUT)
+    @memoize_versioned(cache, SubnetInfoCache.__tablename__, SubnetScreenerCache.__tablename__, refresh=refresh_subnet_cache)
     def load_subnet_data():
         df = fetch_combined_subnet_data()
         df = compute_basic_subnet_score(df)
         return df
 
-    @cache.memoize(timeout=CACHE_DEFAULT_TIMEOUT)
+    @memoize_versioned(cache, SubnetAPY.__tablename__)
     def load_fundamentals_data():
         """Load and cache the latest APY data."""
         return load_latest_apy_df()
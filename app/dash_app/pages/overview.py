@@ -2,7 +2,8 @@ import dash
 from dash import html, dcc, dash_table, Input, Output
 import plotly.express as px
 import pandas as pd
-from app.utils import fetch_combined_subnet_data
+from app.utils import fetch_combined_subnet_data, refresh_subnet_cache, SubnetInfoCache, SubnetScreenerCache
+from app.data_version import memoize_versioned
 from app.logic import compute_basic_subnet_score
 import dash_bootstrap_components as dbc
 from app import cache
@@ -84,7 +85,8 @@ def layout():
     Output('subnet-table', 'data'),
     Input('metric-selector', 'value')
 )
-@cache.memoize(timeout=600)  # Cache for 10 minutes
+# Recomputed only when a refresh publishes new subnet info/screener data
+@memoize_versioned(cache, SubnetInfoCache.__tablename__, SubnetScreenerCache.__tablename__, refresh=refresh_subnet_cache)
 def update_dashboard(selected_metric):
     df = fetch_combined_subnet_data()
     df = compute_basic_subnet_score(df)
@@ -1,16 +1,17 @@
 import dash
 from dash import html, dcc, dash_table, Input, Output, State
 import dash_bootstrap_components as dbc
-from app.subnet_metrics import load_latest_apy_df, load_all_validator_apy_df, prepare_validator_distribution_data
-from app.utils import fetch_combined_subnet_data, fetch_and_cache_json, load_cache_df, SubnetInfoCache, SubnetScreenerCache
+from app.subnet_metrics import load_latest_apy_df, load_all_validator_apy_df
+from app.utils import fetch_and_cache_json, load_cache_df, cache_updated_at, SubnetInfoCache, SubnetScreenerCache
 import pandas as pd
 import plotly.express as px
 from app import cache
+from app.data_version import memoize_versioned
+from app.snapshots import load_snapshot
+from app.models import SubnetAPY
 import numpy as np
 import plotly.graph_objs as go
-import sqlalchemy
 from sqlalchemy.orm import Session
-from app.utils import SessionLocal
 import app.coingecko as coingecko
 
 # Register the page
@@ -21,7 +22,7 @@ dash.register_page(
     title="Subnet Metrics"
 )
 
-@cache.memoize(timeout=600)  # Cache for 10 minutes
+@memoize_versioned(cache, SubnetAPY.__tablename__)  # Until the next collection with new data
 def get_fundamentals_data():
     """Load and cache the latest APY data."""
     return load_latest_apy_df()
@@ -311,8 +312,8 @@ def layout():
 )
 def update_subnet_scatter(log_x_toggle, log_y_toggle, label_toggle):
     # Load cached/DB data only
-    apy_df = load_latest_apy_df()
-    screener_df = fetch_combined_subnet_data()
+    apy_df = load_snapshot("latest_apy")
+    screener_df = load_snapshot("subnet_combined")
     # Use 'netuid', 'market_cap_tao', 'subnet_name', 'validator_count', 'price_7d_pct_change', 'price_1m_pct_change' from screener_df
     # Use 'netuid', 'mean_apy' from apy_df (rename to subnet_apy for clarity)
     apy_df = apy_df.rename(columns={"mean_apy": "subnet_apy"})
@@ -426,7 +427,7 @@ def update_subnet_scatter(log_x_toggle, log_y_toggle, label_toggle):
     Input('validator-selector', 'value')  # Dummy input to trigger on load
 )
 def update_validator_options(_):
-    df = prepare_validator_distribution_data()
+    df = load_snapshot("validator_distribution")
     if df.empty:
         return []
     # Get unique validator names, sorted alphabetically, ensure 'No-name' is present if any
@@ -445,7 +446,7 @@ def update_validator_distribution(selected_validator, filters):
     print(f"Selected validator: {selected_validator}")
     print(f"Active filters: {filters}")
     
-    df = prepare_validator_distribution_data()
+    df = load_snapshot("validator_distribution")
     print(f"\nDataFrame shape: {df.shape}")
     
     if df.empty:
@@ -628,7 +629,7 @@ def update_emissions_efficiency_dual_plot(label_toggle):
     # Compute market cap USD using global TAO price and market_cap_tao
     df['market_cap_usd'] = df['market_cap_tao'] * global_tao_price
     # Merge in mean_apy for top 64 validators per subnet
-    apy_df = load_latest_apy_df()
+    apy_df = load_snapshot("latest_apy")
     if 'mean_apy' in apy_df.columns:
         df = pd.merge(df, apy_df[['netuid', 'mean_apy']], on='netuid', how='left')
     else:
@@ -707,10 +708,8 @@ def update_emissions_efficiency_dual_plot(label_toggle):
         )
     ])
     # Get latest cache update time from both caches
-    session = SessionLocal()
-    info_time = session.query(sqlalchemy.func.max(SubnetInfoCache.updated_at)).scalar()
-    screener_time = session.query(sqlalchemy.func.max(SubnetScreenerCache.updated_at)).scalar()
-    session.close()
+    info_time = cache_updated_at(SubnetInfoCache)
+    screener_time = cache_updated_at(SubnetScreenerCache)
     last_update = max([t for t in [info_time, screener_time] if t is not None], default=None)
     if last_update is not None:
         last_update = str(last_update)
@@ -0,0 +1,54 @@
+import functools
+import logging
+from typing import Callable, Optional, Tuple
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import VERSIONED_CACHE_TIMEOUT
+from app.models import DataVersion, get_db
+
+logger = logging.getLogger(__name__)
+
+def current_versions(*sources: str) -> Optional[Tuple[int, ...]]:
+    """
+    Current data version of each source, in one query.
+    Returns None if the versions cannot be read.
+    """
+    try:
+        with get_db() as db:
+            rows = dict(db.query(DataVersion.name, DataVersion.version)
+                        .filter(DataVersion.name.in_(sources))
+                        .all())
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not read data versions for {sources}: {str(e)}")
+        return None
+    return tuple(rows.get(source, 0) for source in sources)
+
+def memoize_versioned(cache, *sources: str, timeout: int = VERSIONED_CACHE_TIMEOUT,
+                      refresh: Optional[Callable[[], None]] = None):
+    """
+    Like ``cache.memoize`` but keyed on the data version of ``sources``
+    (table names), so a result is computed once per data change instead of
+    once per timeout.
+
+    Args:
+        cache: Flask-Caching Cache instance
+        sources: Table names whose data the function reads
+        timeout: Upper bound on how long an entry is kept
+        refresh: Called before the versions are read, for sources that are
+            refreshed on demand rather than by the collector (e.g. the TAO.app caches)
+    """
+    def decorator(f):
+        @cache.memoize(timeout=timeout)
+        @functools.wraps(f)
+        def cached(data_version, *args, **kwargs):
+            return f(*args, **kwargs)
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if refresh is not None:
+                refresh()
+            version = current_versions(*sources)
+            if version is None:
+                return f(*args, **kwargs)
+            return cached(version, *args, **kwargs)
+        return wrapper
+    return decorator
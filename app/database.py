@@ -0,0 +1,105 @@
+"""
+The process-wide SQLAlchemy engine and session factories.
+
+Every module gets its connections from ``engine`` here, so there is one pool
+per process with the settings from DATABASE_ENGINE:
+
+- SQLite runs in WAL mode with a busy timeout, so readers don't block the
+  collector's writes and concurrent writers wait instead of failing.
+- PostgreSQL connections carry a statement_timeout.
+- Pools are disposed after gunicorn forks (see gunicorn.conf.py) so workers
+  never share a socket inherited from the master.
+
+``request_session`` is a session scoped to the current thread that
+``init_app`` removes when the Flask app context ends, even on errors.
+"""
+import threading
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app.config import DATABASE_URI, DATABASE_ENGINE
+
+def _is_memory_sqlite(uri: str) -> bool:
+    return uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)
+
+def create_db_engine(uri: str = DATABASE_URI, settings: Optional[Dict[str, Any]] = None) -> Engine:
+    """Create an engine with the pool, pragmas and timeouts from ``settings`` (DATABASE_ENGINE by default)."""
+    settings = {**DATABASE_ENGINE, **(settings or {})}
+    kwargs: Dict[str, Any] = {'pool_pre_ping': True}
+    connect_args: Dict[str, Any] = {}
+    if uri.startswith('sqlite'):
+        connect_args['check_same_thread'] = False
+    elif uri.startswith('postgresql'):
+        connect_args['options'] = f"-c statement_timeout={settings['statement_timeout_ms']}"
+    if not _is_memory_sqlite(uri):
+        # In-memory SQLite keeps one connection per thread and takes no pool sizing
+        kwargs.update(
+            pool_size=settings['pool_size'],
+            max_overflow=settings['max_overflow'],
+            pool_timeout=settings['pool_timeout'],
+            pool_recycle=settings['pool_recycle'],
+        )
+    db_engine = create_engine(uri, connect_args=connect_args, **kwargs)
+
+    if db_engine.dialect.name == 'sqlite':
+        @event.listens_for(db_engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                if not _is_memory_sqlite(uri):
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute(f"PRAGMA busy_timeout={int(settings['sqlite_busy_timeout_ms'])}")
+                cursor.execute(f"PRAGMA synchronous={settings['sqlite_synchronous']}")
+            finally:
+                cursor.close()
+
+    _count_checkouts(db_engine)
+    return db_engine
+
+_stats_lock = threading.Lock()
+_checkouts: Dict[int, Dict[str, int]] = {}
+
+def _count_checkouts(db_engine: Engine):
+    counters = _checkouts.setdefault(id(db_engine), {'checkouts': 0, 'checked_out': 0, 'connects': 0})
+
+    @event.listens_for(db_engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        with _stats_lock:
+            counters['connects'] += 1
+
+    @event.listens_for(db_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _stats_lock:
+            counters['checkouts'] += 1
+            counters['checked_out'] += 1
+
+    @event.listens_for(db_engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        with _stats_lock:
+            counters['checked_out'] -= 1
+
+def pool_stats(db_engine: Optional[Engine] = None) -> Dict[str, Any]:
+    """Connection checkouts, connections currently checked out and new connections opened, plus the pool status."""
+    db_engine = db_engine or engine
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_checkouts.get(id(db_engine), {}))
+    stats['pool'] = db_engine.pool.status()
+    return stats
+
+def dispose_engine(db_engine: Optional[Engine] = None):
+    """
+    Drop the pool's connections without closing them. Call in a freshly forked
+    child: the sockets belong to the parent, which keeps using them.
+    """
+    (db_engine or engine).dispose(close=False)
+
+engine = create_db_engine()
+SessionLocal = sessionmaker(bind=engine)
+request_session = scoped_session(SessionLocal)
+
+def init_app(app):
+    """Remove the request-scoped session when each Flask app context ends."""
+    @app.teardown_appcontext
+    def remove_request_session(exception=None):
+        request_session.remove()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlparse
+import requests
+from app import http_client
+from app.config import HTTP_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+class ConditionalCache:
+    """
+    On-disk HTTP cache keyed by URL that stores ETag / Last-Modified validators.
+
+    Each entry is a small JSON file with the validators and the response body.
+    Writes go through a temp file and os.replace, so gunicorn workers sharing
+    the directory never read a half-written entry.
+    """
+    def __init__(self, directory: str = HTTP_CACHE_DIR):
+        self.directory = directory
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'hits': 0, 'misses': 0, 'errors': 0})
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def load(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, response: requests.Response):
+        entry = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body': response.content.decode(response.encoding or 'utf-8'),
+        }
+        if not entry['etag'] and not entry['last_modified']:
+            return  # Nothing to revalidate with
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(url))
+        except OSError as e:
+            logger.warning(f"Could not write HTTP cache entry for {url}: {str(e)}")
+
+    def record(self, endpoint: str, outcome: str):
+        with self._lock:
+            self._stats[endpoint][outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-endpoint hit (304), miss (full body) and error counts for this process."""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+http_cache = ConditionalCache()
+
+def conditional_get(url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+                    timeout=None, getter=http_client.get) -> requests.Response:
+    """
+    GET ``url``, revalidating a cached copy with If-None-Match / If-Modified-Since.
+
+    On a 304 the cached body is put back on the response, so callers can use
+    ``.json()`` as usual; ``response.not_modified`` tells them the data is
+    unchanged and any derived state can be kept.
+    
+    Args:
+        url: URL to fetch
+        params: Query parameters
+        headers: Request headers
+        timeout: Passed to ``getter``
+        getter: Function used to send the request (defaults to the shared client)
+        
+    Returns:
+        requests.Response with an extra ``not_modified`` attribute
+    """
+    full_url = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+    endpoint = urlparse(url).path
+    headers = dict(headers or {})
+    cached = http_cache.load(full_url)
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+        response = getter(url, params=params, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException:
+        http_cache.record(endpoint, 'errors')
+        raise
+    response.not_modified = False
+    if response.status_code == 304 and cached:
+        response._content = cached['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.not_modified = True
+        http_cache.record(endpoint, 'hits')
+    elif response.ok:
+        http_cache.store(full_url, response)
+        http_cache.record(endpoint, 'misses')
+    else:
+        http_cache.record(endpoint, 'errors')
+    return response
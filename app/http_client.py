@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from app.config import HTTP_CLIENT, TAO_API_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (HTTP_CLIENT["connect_timeout"], HTTP_CLIENT["read_timeout"])
+
+def build_session() -> requests.Session:
+    """
+    Create a requests.Session with keep-alive pools, gzip and retry logic.
+
+    Only connection errors and 500/502/504 are retried here. 429 and 503 are
+    left to the adaptive rate limiter so the two backoff mechanisms don't compete.
+    """
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=TAO_API_RATE_LIMIT["max_retries"],
+        read=False,  # A hung upstream costs one read timeout, not max_retries of them
+        backoff_factor=TAO_API_RATE_LIMIT["initial_retry_delay"],
+        status_forcelist=[500, 502, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=HTTP_CLIENT["pool_connections"],
+        pool_maxsize=max(HTTP_CLIENT["pool_maxsize"], TAO_API_RATE_LIMIT["max_workers"])
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+session = build_session()
+
+_stats: Dict[str, Dict[str, float]] = defaultdict(
+    lambda: {"requests": 0, "errors": 0, "bytes": 0, "total_ms": 0.0, "max_ms": 0.0}
+)
+_stats_lock = threading.Lock()
+
+def _record(endpoint: str, elapsed_ms: float, size: int, error: bool):
+    with _stats_lock:
+        entry = _stats[endpoint]
+        entry["requests"] += 1
+        entry["errors"] += int(error)
+        entry["bytes"] += size
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+def get(url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout=None) -> requests.Response:
+    """
+    GET ``url`` through the shared session.
+    
+    Args:
+        url: URL to fetch
+        params: Query parameters
+        headers: Extra request headers
+        timeout: (connect, read) seconds, defaults to DEFAULT_TIMEOUT
+        
+    Returns:
+        requests.Response
+        
+    Raises:
+        requests.exceptions.RequestException: On connection errors and timeouts
+    """
+    endpoint = f"{urlparse(url).netloc}{urlparse(url).path}"
+    start = time.perf_counter()
+    try:
+        response = session.get(url, params=params, headers=headers, timeout=timeout or DEFAULT_TIMEOUT)
+    except requests.exceptions.RequestException:
+        _record(endpoint, (time.perf_counter() - start) * 1000, 0, True)
+        raise
+    # Wire bytes (compressed) when the server sent a length, decoded size otherwise
+    size = int(response.headers.get("Content-Length") or len(response.content))
+    _record(endpoint, (time.perf_counter() - start) * 1000, size, response.status_code >= 400)
+    return response
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Per-endpoint request count, errors, bytes received and latency (ms) for this process."""
+    with _stats_lock:
+        result = {}
+        for endpoint, entry in _stats.items():
+            result[endpoint] = dict(entry, avg_ms=entry["total_ms"] / entry["requests"] if entry["requests"] else 0.0)
+        return result
@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam
+from app.config import COLLECTION_MAX_ATTEMPTS, RETENTION_DAYS
+from app.models import CollectionJournal, engine, get_db
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+
+def window_run_id(metric: str, interval_seconds: int, now: Optional[datetime] = None) -> str:
+    """
+    Run id for the collection window containing ``now``.
+    Every run started inside the same window (e.g. the same UTC day for a daily
+    metric) shares the id, so re-running resumes instead of starting over.
+    """
+    now = now or datetime.utcnow()
+    epoch = int((now - datetime(1970, 1, 1)).total_seconds())
+    window_start = datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % interval_seconds)
+    return f"{metric}:{window_start:%Y%m%dT%H%M}"
+
+def get_run_status(run_id: str) -> Dict[int, str]:
+    """Get netuid -> status for every netuid journaled under ``run_id``, in plan order."""
+    CollectionJournal.__table__.create(bind=engine, checkfirst=True)
+    with get_db() as db:
+        rows = db.query(CollectionJournal.netuid, CollectionJournal.status)\
+            .filter(CollectionJournal.run_id == run_id)\
+            .order_by(CollectionJournal.id)\
+            .all()
+        return {netuid: status for netuid, status in rows}
+
+def _is_resumable(status: str, attempts: int, max_attempts: int) -> bool:
+    return status == STATUS_PENDING or (status == STATUS_FAILED and attempts < max_attempts)
+
+def resumable_netuids(run_id: str, max_attempts: int = COLLECTION_MAX_ATTEMPTS) -> List[int]:
+    """Netuids of ``run_id`` still pending, or failed fewer than ``max_attempts`` times, in plan order."""
+    CollectionJournal.__table__.create(bind=engine, checkfirst=True)
+    with get_db() as db:
+        rows = db.query(CollectionJournal.netuid, CollectionJournal.status, CollectionJournal.attempts)\
+            .filter(CollectionJournal.run_id == run_id)\
+            .order_by(CollectionJournal.id)\
+            .all()
+        return [netuid for netuid, status, attempts in rows if _is_resumable(status, attempts, max_attempts)]
+
+def begin_run(run_id: str, metric: str, netuids: List[int],
+              max_attempts: int = COLLECTION_MAX_ATTEMPTS) -> Tuple[List[int], List[int]]:
+    """
+    Journal the planned netuids and split them into remaining and already done.
+    Netuids that failed ``max_attempts`` times in this run are given up and
+    appear in neither list.
+
+    Returns:
+        (netuids still to process, netuids already stored in this run)
+    """
+    status = get_run_status(run_id)
+    resumable = set(resumable_netuids(run_id, max_attempts))
+    new = [n for n in netuids if n not in status]
+    if new:
+        with get_db() as db:
+            db.add_all([
+                CollectionJournal(run_id=run_id, metric=metric, netuid=n, status=STATUS_PENDING, attempts=0)
+                for n in new
+            ])
+            db.commit()
+    done = [n for n in netuids if status.get(n) == STATUS_OK]
+    remaining = [n for n in netuids if n not in status or n in resumable]
+    if done:
+        logger.info(f"Resuming run {run_id}: {len(done)} done, {len(remaining)} remaining")
+    return remaining, done
+
+def record_attempt(run_id: str, netuid: int, ok: bool, latency_ms: float, error: Optional[str] = None):
+    """Record the outcome of one attempt for a journaled netuid."""
+    record_attempts(run_id, [(netuid, ok, latency_ms, error)])
+
+def record_attempts(run_id: str, attempts: List[Tuple[int, bool, Optional[float], Optional[str]]]):
+    """
+    Record several attempt outcomes in one transaction.
+    
+    Args:
+        run_id: Collection run id
+        attempts: (netuid, ok, latency_ms, error) tuples
+    """
+    if not attempts:
+        return
+    table = CollectionJournal.__table__
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            table.update()
+            .where(table.c.run_id == bindparam('b_run_id'), table.c.netuid == bindparam('b_netuid'))
+            .values(
+                status=bindparam('b_status'),
+                attempts=table.c.attempts + 1,
+                latency_ms=bindparam('b_latency_ms'),
+                error=bindparam('b_error'),
+                updated_at=now
+            ),
+            [{
+                'b_run_id': run_id,
+                'b_netuid': netuid,
+                'b_status': STATUS_OK if ok else STATUS_FAILED,
+                'b_latency_ms': latency_ms,
+                'b_error': None if ok else (error or '')[:1000],
+            } for netuid, ok, latency_ms, error in attempts]
+        )
+
+def purge_old_runs(days: int = RETENTION_DAYS) -> int:
+    """Delete journal entries older than ``days``. Returns number of rows deleted."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with get_db() as db:
+        deleted = db.query(CollectionJournal)\
+            .filter(CollectionJournal.updated_at < cutoff)\
+            .delete(synchronize_session=False)
+        db.commit()
+        return deleted
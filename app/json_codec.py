@@ -0,0 +1,24 @@
+"""
+JSON encoding for cached API payloads.
+
+Uses orjson when it is installed and the standard library otherwise; both
+read each other's output.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> str:
+    """Encode ``obj`` as compact JSON text."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'))
+
+def loads(data):
+    """Decode JSON text (or bytes) produced by ``dumps`` or any JSON encoder."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,133 @@
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from sqlalchemy import update, text, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.models import Lease, engine, get_db
+
+logger = logging.getLogger(__name__)
+
+def holder_id() -> str:
+    """Identify this process across dynos: host, pid and thread."""
+    return f"{os.environ.get('DYNO', socket.gethostname())}:{os.getpid()}:{threading.get_ident()}"
+
+def try_acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """
+    Take or renew the named lease for ``ttl`` seconds.
+    Succeeds if the lease is free, expired, or already ours.
+    """
+    now = time.time()
+    Lease.__table__.create(bind=engine, checkfirst=True)
+    with get_db() as db:
+        result = db.execute(
+            update(Lease)
+            .where(Lease.name == name, or_(Lease.expires_at < now, Lease.holder == holder))
+            .values(holder=holder, expires_at=now + ttl)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return True
+        db.add(Lease(name=name, holder=holder, expires_at=now + ttl))
+        try:
+            db.commit()
+            return True
+        except IntegrityError:
+            # Held by someone else (or they inserted it first)
+            db.rollback()
+            return False
+
+def release_lease(name: str, holder: str):
+    """Give the lease up early if we still hold it."""
+    with get_db() as db:
+        db.query(Lease).filter(Lease.name == name, Lease.holder == holder).delete(synchronize_session=False)
+        db.commit()
+
+class LeaderLock:
+    """
+    Leader election between processes sharing the database.
+
+    On PostgreSQL this is a session-level advisory lock held on a dedicated
+    connection: it is released automatically if the process dies. SQLite has
+    no advisory locks, so there a lease row is renewed by a heartbeat thread
+    and expires after ``ttl`` seconds without one.
+    """
+    def __init__(self, name: str, ttl: float = 300):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder_id()
+        # pg advisory locks take a bigint key; a stable hash of the name keeps it readable in config
+        self.key = zlib.crc32(name.encode())
+        self._conn = None
+        self._held = False
+        self._heartbeat = None
+        self._stop = threading.Event()
+
+    @property
+    def use_advisory_lock(self) -> bool:
+        return engine.dialect.name == "postgresql"
+
+    def acquire(self) -> bool:
+        """Try to become leader without blocking."""
+        if self._held:
+            return self.check()
+        try:
+            if self.use_advisory_lock:
+                conn = engine.connect()
+                locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+                # Session-level advisory locks survive commit; don't sit idle in a transaction
+                conn.commit()
+                if locked:
+                    self._conn = conn
+                    self._held = True
+                else:
+                    conn.close()
+            elif try_acquire_lease(self.name, self.holder, self.ttl):
+                self._held = True
+                self._stop.clear()
+                self._heartbeat = threading.Thread(target=self._renew_lease, daemon=True)
+                self._heartbeat.start()
+        except SQLAlchemyError as e:
+            logger.error(f"Leader election for '{self.name}' failed: {str(e)}")
+            self._held = False
+        return self._held
+
+    def _renew_lease(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not try_acquire_lease(self.name, self.holder, self.ttl):
+                    logger.warning(f"Lost leader lease '{self.name}'")
+                    self._held = False
+                    return
+            except SQLAlchemyError as e:
+                logger.warning(f"Could not renew leader lease '{self.name}': {str(e)}")
+
+    def check(self) -> bool:
+        """Confirm we are still leader (the advisory lock dies with its connection)."""
+        if self._held and self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+            except SQLAlchemyError:
+                logger.warning(f"Lost advisory lock connection for '{self.name}'")
+                self._conn = None
+                self._held = False
+        return self._held
+
+    def release(self):
+        """Step down as leader."""
+        self._stop.set()
+        try:
+            if self._conn is not None:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                self._conn.commit()
+                self._conn.close()
+            elif self._held:
+                release_lease(self.name, self.holder)
+        except SQLAlchemyError as e:
+            logger.warning(f"Error releasing leader lock '{self.name}': {str(e)}")
+        self._conn = None
+        self._held = False
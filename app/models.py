@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, DateTime, JSON, create_engine
+from sqlalchemy import Column, Index, Integer, DateTime, JSON, String, Float, Text, UniqueConstraint, inspect, text, insert, select, update, delete, func, and_, or_, bindparam
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import declared_attr
 from datetime import datetime, timedelta
-from typing import Type, Optional
-from app.config import DATABASE_URI, RETENTION_DAYS, MAX_ROWS_PER_NETUID
+from typing import Type, Optional, Any, Callable, Dict, List, Tuple
+from app.config import RETENTION_DAYS, MAX_ROWS_PER_NETUID, RETENTION_CHUNK_SIZE, TIME_SERIES_FLUSH_SIZE
+from app.database import SessionLocal, engine, request_session
+from flask import has_app_context
+import hashlib
+import json
 import logging
+import threading
 
 # SQLAlchemy setup
-connect_args = {'check_same_thread': False} if DATABASE_URI.startswith('sqlite') else {}
-engine = create_engine(DATABASE_URI, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
 class NetuidTimeSeries(Base):
@@ -20,6 +23,78 @@ class NetuidTimeSeries(Base):
     netuid = Column(Integer, index=True)
     recorded_at = Column(DateTime, default=datetime.utcnow, index=True)
     data = Column(JSON)
+    content_hash = Column(String(64))  # Fingerprint of data, see fingerprint()
+    last_seen_at = Column(DateTime)  # Latest collection that returned identical data
+
+    # Table filled with rows derived from each inserted snapshot, see snapshot_rows()
+    snapshot_model = None
+
+    @classmethod
+    def normalize(cls, data):
+        """Canonical form of ``data`` for fingerprinting. Subclasses sort order-insensitive lists."""
+        return data
+
+    @classmethod
+    def snapshot_rows(cls, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rows for ``snapshot_model`` derived from an inserted row of this table."""
+        return []
+
+    @classmethod
+    def fingerprint(cls, data) -> str:
+        """SHA-256 of the normalized data, stable across key and list ordering."""
+        canonical = json.dumps(cls.normalize(data), sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @declared_attr
+    def __table_args__(cls):
+        # Serves the newest-row-per-netuid lookups without touching the data column
+        return (Index(f"ix_{cls.__tablename__}_netuid_recorded_at", "netuid", "recorded_at"),)
+
+    @classmethod
+    def newest_subquery(cls, netuids=None):
+        """(netuid, max recorded_at) per netuid, optionally limited to ``netuids``."""
+        newest = select(cls.netuid, func.max(cls.recorded_at).label('recorded_at'))
+        if netuids is not None:
+            newest = newest.where(cls.netuid.in_(netuids))
+        return newest.group_by(cls.netuid).subquery()
+
+    @classmethod
+    def latest_per_netuid(cls, db, netuids=None) -> List["NetuidTimeSeries"]:
+        """
+        The newest row for each netuid, in one query whose cost does not grow
+        with the history kept per netuid. Sorted by netuid.
+        """
+        newest = cls.newest_subquery(netuids)
+        rows = db.query(cls)\
+            .join(newest, and_(cls.netuid == newest.c.netuid, cls.recorded_at == newest.c.recorded_at))\
+            .order_by(cls.netuid, cls.id)\
+            .all()
+        # Two rows with the same timestamp: keep the one inserted last
+        return list({row.netuid: row for row in rows}.values())
+
+    @classmethod
+    def expired_ids_query(cls, netuid: Optional[int] = None, now: Optional[datetime] = None):
+        """
+        Ids outside the retention policy, in one windowed scan: rows last seen
+        more than RETENTION_DAYS ago, and everything past the newest
+        MAX_ROWS_PER_NETUID rows of each netuid. A snapshot confirmed by a
+        later identical collection is as recent as its last_seen_at.
+        """
+        cutoff_date = (now or datetime.utcnow()) - timedelta(days=RETENTION_DAYS)
+        ranked = select(
+            cls.id,
+            func.coalesce(cls.last_seen_at, cls.recorded_at).label('seen_at'),
+            func.row_number().over(
+                partition_by=cls.netuid,
+                order_by=(cls.recorded_at.desc(), cls.id.desc())
+            ).label('position')
+        )
+        if netuid is not None:
+            ranked = ranked.where(cls.netuid == netuid)
+        ranked = ranked.subquery()
+        return select(ranked.c.id)\
+            .where(or_(ranked.c.seen_at < cutoff_date, ranked.c.position > MAX_ROWS_PER_NETUID))\
+            .order_by(ranked.c.id)
 
     @classmethod
     def purge_old_records(cls, session, netuid: Optional[int] = None) -> int:
@@ -27,56 +102,240 @@ class NetuidTimeSeries(Base):
         Purge old records based on retention policy.
         If netuid is provided, purges only for that netuid.
         Returns number of records deleted.
+
+        Runs in the caller's transaction; app.retention.run_retention purges
+        every table in short chunked transactions instead.
         """
         try:
-            # First try time-based retention
-            cutoff_date = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
-            query = session.query(cls).filter(cls.recorded_at < cutoff_date)
-            
-            if netuid is not None:
-                query = query.filter(cls.netuid == netuid)
-            
-            time_deleted = query.delete()
-            
-            # Then try row-count based retention per netuid
-            if netuid is not None:
-                netuids = [netuid]
-            else:
-                # Get all unique netuids
-                netuids = [r[0] for r in session.query(cls.netuid).distinct().all()]
-            
-            count_deleted = 0
-            for n in netuids:
-                # Get count of records for this netuid
-                count = session.query(cls).filter(cls.netuid == n).count()
-                if count > MAX_ROWS_PER_NETUID:
-                    # Get the timestamp of the record that would be kept
-                    cutoff_record = session.query(cls)\
-                        .filter(cls.netuid == n)\
-                        .order_by(cls.recorded_at.desc())\
-                        .offset(MAX_ROWS_PER_NETUID - 1)\
-                        .first()
-                    
-                    if cutoff_record:
-                        # Delete all records older than this one
-                        count_deleted += session.query(cls)\
-                            .filter(cls.netuid == n)\
-                            .filter(cls.recorded_at < cutoff_record.recorded_at)\
-                            .delete()
-            
+            ids = session.execute(cls.expired_ids_query(netuid)).scalars().all()
+            total_deleted = 0
+            for start in range(0, len(ids), RETENTION_CHUNK_SIZE):
+                chunk = ids[start:start + RETENTION_CHUNK_SIZE]
+                total_deleted += session.execute(delete(cls).where(cls.id.in_(chunk))).rowcount
             session.commit()
-            total_deleted = time_deleted + count_deleted
             logging.info(f"Purged {total_deleted} old records from {cls.__tablename__}")
             return total_deleted
-            
+
         except Exception as e:
             session.rollback()
             logging.error(f"Error purging old records from {cls.__tablename__}: {str(e)}")
             raise
 
+_schema_checked = set()
+
+def ensure_schema(model_class):
+    """Create the model's table or add missing columns, once per process."""
+    if model_class in _schema_checked:
+        return
+    model_class.__table__.create(bind=engine, checkfirst=True)
+    add_missing_columns(model_class.__table__)
+    add_missing_indexes(model_class.__table__)
+    _schema_checked.add(model_class)
+
+class TimeSeriesWriter:
+    """
+    Buffers NetuidTimeSeries records and writes them as multi-row INSERTs.
+
+    Instead of one session and commit per netuid, records are collected and
+    written in one transaction per ``flush_size`` records (and once more when
+    the writer is closed). Safe to share between collector threads.
+
+    Records whose fingerprint matches the latest stored snapshot for their
+    netuid are not inserted; that snapshot's ``last_seen_at`` is moved
+    forward instead, so unchanged data costs an UPDATE, not a new row.
+
+    ``on_flush(entries, error)`` is called after every flush attempt with the
+    ``(netuid, meta)`` pairs of records that were added with a meta value,
+    and the exception if the write failed.
+    """
+    def __init__(self, flush_size: Optional[int] = None,
+                 on_flush: Optional[Callable[[List[Tuple[int, Any]], Optional[Exception]], None]] = None):
+        self.flush_size = max(flush_size or TIME_SERIES_FLUSH_SIZE, 1)
+        self.on_flush = on_flush
+        self._pending: List[Tuple[NetuidTimeSeries, Any]] = []
+        self._lock = threading.RLock()
+        self.rows_written = 0
+        self.rows_unchanged = 0
+
+    def add(self, record: NetuidTimeSeries, meta: Any = None):
+        """Queue a record, flushing when the buffer is full."""
+        with self._lock:
+            self._pending.append((record, meta))
+            if len(self._pending) >= self.flush_size:
+                self.flush()
+
+    @staticmethod
+    def _row(record: NetuidTimeSeries) -> Dict[str, Any]:
+        row = {c.name: getattr(record, c.name) for c in record.__table__.columns if c.name != 'id'}
+        if row.get('recorded_at') is None:
+            row['recorded_at'] = datetime.utcnow()
+        if row.get('content_hash') is None:
+            row['content_hash'] = type(record).fingerprint(row['data'])
+        return row
+
+    @staticmethod
+    def _latest_snapshots(db, model_class, netuids) -> Dict[int, Tuple[int, str]]:
+        """netuid -> (id, content_hash) of the newest stored row, in one query."""
+        newest = model_class.newest_subquery(netuids)
+        rows = db.execute(
+            select(model_class.id, model_class.netuid, model_class.content_hash)
+            .join(newest, and_(model_class.netuid == newest.c.netuid,
+                               model_class.recorded_at == newest.c.recorded_at))
+            .order_by(model_class.id)
+        ).all()
+        return {netuid: (id_, content_hash) for id_, netuid, content_hash in rows}
+
+    def _write(self, db, model_class, rows) -> Tuple[int, int]:
+        """Insert changed rows and heartbeat unchanged ones. Returns (inserted, unchanged)."""
+        latest: Dict[int, Any] = dict(self._latest_snapshots(db, model_class, {r['netuid'] for r in rows}))
+        inserts, heartbeats = [], []
+        for row in sorted(rows, key=lambda r: r['recorded_at']):
+            previous = latest.get(row['netuid'])
+            if previous is not None and previous[1] == row['content_hash']:
+                if isinstance(previous[0], dict):
+                    # Duplicate of a row inserted in this same batch
+                    previous[0]['last_seen_at'] = row['recorded_at']
+                else:
+                    heartbeats.append({'b_id': previous[0], 'b_last_seen_at': row['recorded_at']})
+                continue
+            inserts.append(row)
+            latest[row['netuid']] = (row, row['content_hash'])
+        if inserts:
+            db.execute(insert(model_class), inserts)
+            if model_class.snapshot_model is not None:
+                facts = [fact for row in inserts for fact in model_class.snapshot_rows(row)]
+                if facts:
+                    db.execute(insert(model_class.snapshot_model), facts)
+        if heartbeats:
+            table = model_class.__table__
+            db.execute(
+                table.update()
+                .where(table.c.id == bindparam('b_id'))
+                .values(last_seen_at=bindparam('b_last_seen_at')),
+                heartbeats
+            )
+        return len(inserts), len(rows) - len(inserts)
+
+    def flush(self) -> int:
+        """Write everything buffered. Returns number of records handled (inserted or refreshed)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            entries = [(record.netuid, meta) for record, meta in pending if meta is not None]
+            error = None
+            try:
+                by_model: Dict[type, List[Dict[str, Any]]] = {}
+                for record, _ in pending:
+                    by_model.setdefault(type(record), []).append(self._row(record))
+                inserted = unchanged = 0
+                tables = []
+                for model_class in by_model:
+                    ensure_schema(model_class)
+                    tables.append(model_class.__tablename__)
+                    if model_class.snapshot_model is not None:
+                        ensure_schema(model_class.snapshot_model)
+                        tables.append(model_class.snapshot_model.__tablename__)
+                ensure_data_versions(tables)
+                with get_db() as db:
+                    changed = []
+                    for model_class, rows in by_model.items():
+                        i, u = self._write(db, model_class, rows)
+                        inserted += i
+                        unchanged += u
+                        # A heartbeat moves last_seen_at, which the dashboards show as "Last
+                        # Updated", so it bumps the table too; only new rows add validator facts
+                        if i or u:
+                            changed.append(model_class.__tablename__)
+                        if i and model_class.snapshot_model is not None:
+                            changed.append(model_class.snapshot_model.__tablename__)
+                    bump_data_version(db, changed)
+                    db.commit()
+                self.rows_written += inserted
+                self.rows_unchanged += unchanged
+                logging.info(f"Flushed {inserted} time series rows ({unchanged} unchanged snapshots refreshed)")
+            except Exception as e:
+                error = e
+                logging.error(f"Error flushing {len(pending)} time series rows: {str(e)}")
+            if self.on_flush is not None:
+                self.on_flush(entries, error)
+            if error is not None:
+                raise error
+            return len(pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Keep whatever was collected even if the run itself failed
+        self.flush()
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class ValidatorAPYSnapshot(Base):
+    """
+    One row per validator per stored SubnetAPY snapshot, written alongside it.
+
+    Mirrors ``SubnetAPY.data['validator_apys']`` so validator filters, group-bys
+    and lookups can run in SQL instead of decoding every JSON blob.
+    ``recorded_at`` equals the parent snapshot's ``recorded_at``.
+    """
+    __tablename__ = "validator_apy_snapshot"
+    __table_args__ = (
+        Index("ix_validator_apy_snapshot_netuid_recorded_at", "netuid", "recorded_at"),
+        Index("ix_validator_apy_snapshot_hotkey_recorded_at", "hotkey", "recorded_at"),
+        # A unique index rather than a constraint so add_missing_indexes can add it to existing tables
+        Index("uq_validator_apy_snapshot_netuid_recorded_at_hotkey", "netuid", "recorded_at", "hotkey", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    netuid = Column(Integer, nullable=False)
+    hotkey = Column(String(64))
+    recorded_at = Column(DateTime, nullable=False)
+    validator_name = Column(String(255))
+    alpha_apy = Column(Float)
+    alpha_stake = Column(Float)
+    nominated_stake = Column(Float)
+    vtrust = Column(Float)
+
 class SubnetAPY(NetuidTimeSeries):
     """Time series data for subnet APY."""
     __tablename__ = "subnet_apy"
+    snapshot_model = ValidatorAPYSnapshot
+
+    @classmethod
+    def snapshot_rows(cls, row):
+        data = row.get('data') or {}
+        validators = data.get('validator_apys') or []
+        # One row per hotkey and snapshot (unique index); a repeated hotkey keeps its last entry
+        by_hotkey = {v.get('hotkey'): v for v in validators if v.get('hotkey') is not None}
+        validators = list(by_hotkey.values()) + [v for v in validators if v.get('hotkey') is None]
+        return [{
+            'netuid': row['netuid'],
+            'hotkey': v.get('hotkey'),
+            'recorded_at': row['recorded_at'],
+            'validator_name': v.get('validator_name'),
+            'alpha_apy': _to_float(v.get('alpha_apy')),
+            'alpha_stake': _to_float(v.get('alpha_stake')),
+            'nominated_stake': _to_float(v.get('nominated_stake')),
+            'vtrust': _to_float(v.get('vtrust')),
+        } for v in validators]
+
+    @classmethod
+    def normalize(cls, data):
+        """Validator order in the API response carries no meaning."""
+        if isinstance(data, dict) and isinstance(data.get('validator_apys'), list):
+            data = dict(data)
+            data['validator_apys'] = sorted(data['validator_apys'], key=lambda v: str(v.get('hotkey')))
+        return data
+
+class SubnetAPYRaw(NetuidTimeSeries):
+    """Unprojected TAO.app APY responses, only written when APY_RAW_ARCHIVE is enabled."""
+    __tablename__ = "subnet_apy_raw"
 
 class SubnetEmission(NetuidTimeSeries):
     """Time series data for subnet emissions."""
@@ -90,22 +349,275 @@ class SubnetReputation(NetuidTimeSeries):
     """Time series data for subnet reputation."""
     __tablename__ = "subnet_reputation"
 
+class APYRollup(Base):
+    """
+    Per-subnet APY aggregates for one time bucket, kept after the raw
+    snapshots are purged. Filled by app.rollups.
+
+    The apy_* columns describe the positive validator alpha APYs seen in the
+    bucket; stake totals are averaged over the bucket's snapshots.
+    """
+    __abstract__ = True
+
+    id = Column(Integer, primary_key=True)
+    netuid = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    samples = Column(Integer, nullable=False)  # Snapshots covering the bucket (summed hourly for daily)
+    subnet_apy = Column(Float)  # Mean of the subnet-level APY
+    validator_count = Column(Integer)
+    apy_count = Column(Integer)  # Validator APY values aggregated
+    apy_min = Column(Float)
+    apy_max = Column(Float)
+    apy_mean = Column(Float)
+    apy_median = Column(Float)
+    apy_std = Column(Float)  # Population standard deviation, so tiers can be pooled
+    alpha_stake_total = Column(Float)
+    nominated_stake_total = Column(Float)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (UniqueConstraint('netuid', 'bucket_start', name=f"uq_{cls.__tablename__}_netuid_bucket"),)
+
+class SubnetAPYHourly(APYRollup):
+    """Hourly APY rollups of SubnetAPY, kept for ROLLUP_HOURLY_RETENTION_DAYS."""
+    __tablename__ = "subnet_apy_hourly"
+
+class SubnetAPYDaily(APYRollup):
+    """Daily APY rollups built from the hourly tier, kept indefinitely."""
+    __tablename__ = "subnet_apy_daily"
+
+class ApiRequestBudget(Base):
+    """
+    Token bucket state for an outbound API, shared by every process.
+
+    ``refilled_at`` is a Unix timestamp so the refill arithmetic can run inside
+    a single UPDATE on both SQLite and PostgreSQL.
+    """
+    __tablename__ = "api_request_budget"
+
+    name = Column(String(64), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    capacity = Column(Float, nullable=False)
+    rate_per_sec = Column(Float, nullable=False)
+    refilled_at = Column(Float, nullable=False)
+    blocked_until = Column(Float)  # Retry-After: no tokens are granted before this time
+    decreased_at = Column(Float)  # Last multiplicative decrease
+
+class CollectionJournal(Base):
+    """Per-netuid checkpoint of a collection run, so an interrupted run can resume."""
+    __tablename__ = "collection_journal"
+    __table_args__ = (UniqueConstraint('run_id', 'netuid', name='uq_collection_journal_run_netuid'),)
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String(64), nullable=False, index=True)
+    metric = Column(String(32), nullable=False)
+    netuid = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')  # pending | ok | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float)
+    error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Lease(Base):
+    """Expiring named lock held by one process (leader election, single-flight refreshes)."""
+    __tablename__ = "lease"
+
+    name = Column(String(128), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    expires_at = Column(Float, nullable=False)  # Unix timestamp
+
+class DataVersion(Base):
+    """Counter per data source (table name), bumped whenever a collector commits new data."""
+    __tablename__ = "data_version"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+_versions_ensured = set()
+
+def ensure_data_versions(names: List[str]):
+    """
+    Create missing data_version rows in their own transaction, so that
+    bump_data_version() is a plain UPDATE inside the collector's transaction.
+    """
+    missing = set(names) - _versions_ensured
+    if not missing:
+        return
+    DataVersion.__table__.create(bind=engine, checkfirst=True)
+    with get_db() as db:
+        existing = {name for (name,) in db.query(DataVersion.name).filter(DataVersion.name.in_(missing))}
+        db.add_all([DataVersion(name=name, version=0) for name in missing - existing])
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process created them first
+            db.rollback()
+    _versions_ensured.update(missing)
+
+def bump_data_version(db, names: List[str]):
+    """
+    Increment the version of each source in ``db``'s transaction, so the new
+    version becomes visible together with the data it describes.
+    Call ensure_data_versions() for the names first.
+    """
+    if not names:
+        return
+    db.execute(
+        update(DataVersion)
+        .where(DataVersion.name.in_(list(names)))
+        .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def add_missing_columns(table, bind=None):
+    """
+    Add columns declared on ``table`` that the existing database table lacks.
+    create_all() never alters tables that already exist, so new nullable
+    columns are added here with a plain ALTER TABLE.
+
+    Returns:
+        List[str]: Names of the columns that were added
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    if not inspector.has_table(table.name):
+        return []
+    existing = {c['name'] for c in inspector.get_columns(table.name)}
+    missing = [c for c in table.columns if c.name not in existing]
+    if not missing:
+        return []
+    with bind.begin() as conn:
+        for column in missing:
+            column_type = column.type.compile(dialect=bind.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            logging.info(f"Added column {table.name}.{column.name}")
+    return [column.name for column in missing]
+
+def add_missing_indexes(table, bind=None):
+    """
+    Create indexes declared on ``table`` that an existing database table lacks.
+
+    Before a unique index is added, rows duplicating one another on its
+    (non-null) columns are removed, keeping the oldest.
+    """
+    bind = bind or engine
+    existing = {index['name'] for index in inspect(bind).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        if index.unique:
+            _delete_duplicates(table, list(index.columns), bind)
+        try:
+            index.create(bind=bind)
+        except SQLAlchemyError:
+            # Another process created it first
+            if index.name not in {i['name'] for i in inspect(bind).get_indexes(table.name)}:
+                raise
+
+def _delete_duplicates(table, columns, bind):
+    keep = select(func.min(table.c.id)).where(*(c.isnot(None) for c in columns)).group_by(*columns)
+    with bind.begin() as conn:
+        deleted = conn.execute(
+            delete(table).where(*(c.isnot(None) for c in columns), table.c.id.not_in(keep))
+        ).rowcount
+    if deleted:
+        logging.warning(f"Removed {deleted} duplicate {table.name} rows before adding a unique index")
+
 # Create all tables
 def init_db():
-    """Initialize database tables."""
+    """Initialize database tables, including the API cache tables of app.utils."""
+    # Imported here: app.utils imports this module
+    from app.utils import init_cache_tables
+    init_cache_tables()
     Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        add_missing_columns(table)
+        add_missing_indexes(table)
+    backfill_snapshot_tables()
+
+BACKFILL_LEASE_TTL = 600  # seconds one process may spend backfilling before another may take over
+
+def backfill_snapshot_tables(batch_size: int = 200) -> int:
+    """
+    Derive snapshot rows for stored history when a snapshot table is still empty,
+    e.g. right after it was added. Returns the number of rows written.
+
+    Every worker calls this at startup; a lease per table lets one of them do
+    the work, and the table's unique index rejects a second copy regardless.
+    """
+    # Imported here: app.locks imports this module
+    from app.locks import holder_id, release_lease, try_acquire_lease
+    written = 0
+    for model_class in NetuidTimeSeries.__subclasses__():
+        snapshot_model = model_class.snapshot_model
+        if snapshot_model is None:
+            continue
+        lease, holder = f"backfill:{snapshot_model.__tablename__}", holder_id()
+        if not try_acquire_lease(lease, holder, BACKFILL_LEASE_TTL):
+            logging.info(f"Another process is backfilling {snapshot_model.__tablename__}")
+            continue
+        try:
+            count = _backfill_snapshot_table(model_class, snapshot_model, batch_size)
+        except IntegrityError:
+            logging.info(f"{snapshot_model.__tablename__} was backfilled by another process")
+            count = 0
+        finally:
+            release_lease(lease, holder)
+        if count:
+            logging.info(f"Backfilled {count} {snapshot_model.__tablename__} rows from {model_class.__tablename__}")
+        written += count
+    return written
+
+def _backfill_snapshot_table(model_class, snapshot_model, batch_size: int) -> int:
+    count, last_id = 0, 0
+    with get_db() as db:
+        if db.query(snapshot_model.id).first() is not None:
+            return 0
+        while True:
+            rows = db.execute(
+                select(model_class.id, model_class.netuid, model_class.recorded_at, model_class.data)
+                .where(model_class.id > last_id)
+                .order_by(model_class.id)
+                .limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            facts = [fact for row in rows for fact in model_class.snapshot_rows(dict(row))]
+            if facts:
+                db.execute(insert(snapshot_model), facts)
+                count += len(facts)
+        db.commit()
+    return count
+
+_session_depth = threading.local()
 
 class DBSession:
-    """Database session context manager."""
+    """
+    Database session context manager.
+
+    Inside a Flask app context the outermost block uses the request-scoped
+    session, which app.database removes at teardown; nested blocks and code
+    outside a request get a session of their own. Either way the session is
+    rolled back on errors and closed when the block ends.
+    """
     def __init__(self):
         self.db = None
+        self.scoped = False
 
     def __enter__(self):
-        self.db = SessionLocal()
+        depth = getattr(_session_depth, 'value', 0)
+        self.scoped = depth == 0 and has_app_context()
+        self.db = request_session() if self.scoped else SessionLocal()
+        _session_depth.value = depth + 1
         return self.db
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        _session_depth.value -= 1
         if self.db:
+            if exc_type is not None:
+                self.db.rollback()
             self.db.close()
 
 def get_db():
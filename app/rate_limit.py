@@ -0,0 +1,325 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from sqlalchemy import update, case, select, and_, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.models import ApiRequestBudget, engine, get_db, add_missing_columns
+from app.config import TAO_API_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+class RateLimitTimeout(Exception):
+    """No token was granted within the caller's timeout."""
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for TAO.app API requests.
+
+    Tokens refill continuously at ``requests_per_minute / 60`` per second up to
+    ``burst``. Every request takes one token, so any number of threads sharing
+    a bucket stay under the configured rate together.
+    """
+    def __init__(self, requests_per_minute: int, burst: int = 1):
+        self.requests_per_minute = requests_per_minute
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Block until a token is available, then take it.
+
+        Raises:
+            RateLimitTimeout: If ``timeout`` seconds pass without a token
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                sleep_time = (1 - self.tokens) / self.rate
+            # Add small random jitter to prevent thundering herd
+            _sleep_until_due(sleep_time + random.uniform(0, 0.1), deadline)
+
+    # Kept for callers written against the old RateLimiter interface
+    wait = acquire
+
+def _sleep_until_due(seconds: float, deadline: Optional[float]):
+    """Sleep ``seconds``, or raise RateLimitTimeout if that would pass ``deadline`` (time.monotonic)."""
+    if deadline is not None and time.monotonic() + seconds > deadline:
+        raise RateLimitTimeout(f"No request token within the deadline (next in {seconds:.1f}s)")
+    time.sleep(seconds)
+
+class SharedTokenBucket:
+    """
+    Token bucket stored in the ``api_request_budget`` table.
+
+    Web workers, collectors and one-off scripts all draw from the same row,
+    so their combined traffic stays under the limit. Taking a token is one
+    conditional UPDATE that refills and decrements in place, which is atomic
+    on SQLite and PostgreSQL alike. If the database is unavailable the bucket
+    degrades to a per-process TokenBucket rather than blocking requests.
+    """
+    def __init__(self, name: str, requests_per_minute: float, burst: int = 1):
+        self.name = name
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(max(burst, 1))
+        self._local = TokenBucket(requests_per_minute, burst)
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _stored_rate(self, rate_per_sec: float) -> float:
+        """Rate to keep for an existing bucket row. The configured limit always wins here."""
+        return self.rate
+
+    def _ensure_row(self):
+        """Create the table and bucket row on first use and apply the configured limit."""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            ApiRequestBudget.__table__.create(bind=engine, checkfirst=True)
+            add_missing_columns(ApiRequestBudget.__table__)
+            with get_db() as db:
+                row = db.get(ApiRequestBudget, self.name)
+                if row is None:
+                    db.add(ApiRequestBudget(
+                        name=self.name,
+                        tokens=self.capacity,
+                        capacity=self.capacity,
+                        rate_per_sec=self._stored_rate(self.rate),
+                        refilled_at=time.time()
+                    ))
+                else:
+                    row.capacity = self.capacity
+                    row.rate_per_sec = self._stored_rate(row.rate_per_sec)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another process inserted the row first
+                    db.rollback()
+            self._ready = True
+
+    def try_acquire(self) -> float:
+        """
+        Try to take one token.
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one is due
+        """
+        return self._take()
+
+    def _take(self, **values) -> float:
+        """try_acquire, also writing ``values`` to the bucket row if a token is taken."""
+        self._ensure_row()
+        now = time.time()
+        b = ApiRequestBudget
+        elapsed = case((b.refilled_at < now, now - b.refilled_at), else_=0.0)
+        refilled = b.tokens + elapsed * b.rate_per_sec
+        available = case((refilled > b.capacity, b.capacity), else_=refilled)
+        not_blocked = or_(b.blocked_until.is_(None), b.blocked_until <= now)
+
+        with get_db() as db:
+            result = db.execute(
+                update(b)
+                .where(b.name == self.name, not_blocked, available >= 1)
+                .values(tokens=available - 1, refilled_at=now, **values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if result.rowcount == 1:
+                return 0.0
+            tokens, rate, blocked_until = db.execute(
+                select(available, b.rate_per_sec, b.blocked_until).where(b.name == self.name)
+            ).one()
+        if blocked_until is not None and blocked_until > now:
+            return blocked_until - now
+        return max(1 - tokens, 0.0) / rate
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Block until the shared budget grants a token.
+
+        Web requests pass a ``timeout`` so a long upstream pause makes them
+        fail fast (and serve what they have) instead of sleeping through it.
+
+        Raises:
+            RateLimitTimeout: If ``timeout`` seconds pass without a token
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                sleep_time = self.try_acquire()
+            except SQLAlchemyError as e:
+                logger.warning(f"Shared request budget '{self.name}' unavailable, using local limiter: {str(e)}")
+                self._local.acquire(None if deadline is None else max(deadline - time.monotonic(), 0.0))
+                return
+            if sleep_time <= 0:
+                return
+            # Jitter spreads out processes that wake up for the same token
+            _sleep_until_due(sleep_time + random.uniform(0, 0.1), deadline)
+
+    wait = acquire
+
+class AdaptiveTokenBucket(SharedTokenBucket):
+    """
+    Shared token bucket whose rate is tuned by AIMD.
+
+    Every successful (2xx/3xx) response adds ``increase_per_success``
+    requests/minute up to ``max_requests_per_minute``. Successes are counted
+    in the process and applied by the UPDATE that takes the next token, so
+    they cost no write of their own. A 429 or 503 multiplies the rate by
+    ``decrease_factor`` (at most once per DECREASE_COOLDOWN seconds, so a burst
+    of throttled in-flight requests counts as one signal), empties the bucket
+    and blocks all processes until Retry-After (at most ``max_pause`` seconds)
+    has passed. The learned rate lives in the bucket row, so the next run
+    starts from it instead of from the configured default.
+    """
+    THROTTLE_STATUSES = (429, 503)
+    DECREASE_COOLDOWN = 5.0
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int = 1,
+                 min_requests_per_minute: float = 6, max_requests_per_minute: float = 120,
+                 increase_per_success: float = 0.5, decrease_factor: float = 0.5,
+                 max_pause: float = 30.0):
+        super().__init__(name, requests_per_minute, burst)
+        self.max_pause = max_pause
+        self.min_rate = min_requests_per_minute / 60.0
+        self.max_rate = max(max_requests_per_minute / 60.0, self.min_rate)
+        self.increase = increase_per_success / 60.0
+        self.decrease_factor = decrease_factor
+        self._successes = 0
+        self._successes_lock = threading.Lock()
+
+    def _stored_rate(self, rate_per_sec: float) -> float:
+        """Keep the learned rate, clamped to the configured bounds."""
+        return min(max(rate_per_sec, self.min_rate), self.max_rate)
+
+    def on_success(self):
+        """Additive increase after a request that was not throttled, applied with the next token."""
+        with self._successes_lock:
+            self._successes += 1
+
+    def try_acquire(self) -> float:
+        """Try to take one token, raising the rate for the successes counted since the last one."""
+        with self._successes_lock:
+            successes, self._successes = self._successes, 0
+        if not successes:
+            return self._take()
+        b = ApiRequestBudget
+        increased = b.rate_per_sec + successes * self.increase
+        taken = False
+        try:
+            wait = self._take(rate_per_sec=case((increased > self.max_rate, self.max_rate), else_=increased))
+            taken = wait <= 0
+            return wait
+        finally:
+            if not taken:
+                # Not written: carry the increase over to the next token
+                with self._successes_lock:
+                    self._successes += successes
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Multiplicative decrease after a 429/503 and a shared pause for Retry-After.
+
+        Args:
+            retry_after: Seconds the server asked us to wait, if it said so
+        """
+        now = time.time()
+        with self._successes_lock:
+            self._successes = 0
+        pause = retry_after if retry_after is not None else TAO_API_RATE_LIMIT["initial_retry_delay"]
+        # Every process honours the pause, so a huge Retry-After must not stall them all
+        pause = min(pause, self.max_pause)
+        b = ApiRequestBudget
+        decreased = b.rate_per_sec * self.decrease_factor
+        may_decrease = or_(b.decreased_at.is_(None), b.decreased_at < now - self.DECREASE_COOLDOWN)
+        new_rate = case(
+            (and_(may_decrease, decreased < self.min_rate), self.min_rate),
+            (may_decrease, decreased),
+            else_=b.rate_per_sec
+        )
+        try:
+            with get_db() as db:
+                db.execute(
+                    update(b)
+                    .where(b.name == self.name)
+                    .values(
+                        rate_per_sec=new_rate,
+                        decreased_at=case((may_decrease, now), else_=b.decreased_at),
+                        tokens=0.0,
+                        refilled_at=now,
+                        blocked_until=case(
+                            (and_(b.blocked_until.is_not(None), b.blocked_until > now + pause), b.blocked_until),
+                            else_=now + pause
+                        )
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                rate = db.execute(select(b.rate_per_sec).where(b.name == self.name)).scalar()
+            logger.warning(
+                f"Throttled by upstream on '{self.name}': pausing {pause:.1f}s, "
+                f"rate now {rate * 60:.1f} requests/minute"
+            )
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not record throttle on '{self.name}': {str(e)}")
+            time.sleep(pause)
+
+    def observe(self, response) -> bool:
+        """
+        Feed a response into the controller.
+
+        Returns:
+            True if the response was a throttle signal and should be retried
+        """
+        if response.status_code in self.THROTTLE_STATUSES:
+            self.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+            return True
+        if response.status_code < 400:
+            self.on_success()
+        return False
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+# Budget for every request made with TAO_APP_API_KEY
+tao_api_budget = AdaptiveTokenBucket(
+    "tao.app",
+    TAO_API_RATE_LIMIT["requests_per_minute"],
+    burst=TAO_API_RATE_LIMIT["burst"],
+    min_requests_per_minute=TAO_API_RATE_LIMIT["min_requests_per_minute"],
+    max_requests_per_minute=TAO_API_RATE_LIMIT["max_requests_per_minute"],
+    increase_per_success=TAO_API_RATE_LIMIT["increase_per_success"],
+    decrease_factor=TAO_API_RATE_LIMIT["decrease_factor"],
+    max_pause=TAO_API_RATE_LIMIT["max_retry_delay"]
+)
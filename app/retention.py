@@ -0,0 +1,115 @@
+"""
+Retention pass over the time series tables.
+
+Raw APY history is rolled up into hourly and daily tiers before anything is
+deleted. Expired rows are found with one windowed scan per table (see
+NetuidTimeSeries.expired_ids_query) and deleted by id in short transactions of
+RETENTION_CHUNK_SIZE rows, so writers are never blocked for a whole pass.
+"""
+import logging
+import time
+from typing import Any, Dict, List
+from sqlalchemy import and_, delete, exists, select
+from app.config import RETENTION_CHUNK_SIZE
+from app.journal import purge_old_runs
+from app.models import NetuidTimeSeries, SubnetAPYHourly, bump_data_version, ensure_data_versions, get_db
+from app.rollups import ROLLUP_SOURCES, expired_hourly_ids_query, run_rollups
+
+logger = logging.getLogger(__name__)
+
+def time_series_models() -> List[type]:
+    """Every concrete NetuidTimeSeries table."""
+    return NetuidTimeSeries.__subclasses__()
+
+def orphaned_snapshot_ids_query(model_class):
+    """Ids of ``model_class.snapshot_model`` rows whose parent snapshot is gone."""
+    snapshot_model = model_class.snapshot_model
+    parent = exists().where(and_(model_class.netuid == snapshot_model.netuid,
+                                 model_class.recorded_at == snapshot_model.recorded_at))
+    return select(snapshot_model.id).where(~parent).order_by(snapshot_model.id)
+
+def delete_in_chunks(model_class, ids: List[int], chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """Delete ``ids`` from ``model_class`` committing every ``chunk_size`` rows. Returns rows deleted."""
+    chunk_size = max(chunk_size, 1)
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        with get_db() as db:
+            deleted += db.execute(
+                delete(model_class).where(model_class.id.in_(ids[start:start + chunk_size]))
+            ).rowcount
+            db.commit()
+    return deleted
+
+def _timed_delete(model_class, ids_query, chunk_size: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with get_db() as db:
+        ids = db.execute(ids_query).scalars().all()
+    deleted = delete_in_chunks(model_class, ids, chunk_size)
+    return {'deleted': deleted, 'seconds': round(time.perf_counter() - started, 3)}
+
+def purge_table(model_class, chunk_size: int = RETENTION_CHUNK_SIZE) -> Dict[str, Dict[str, Any]]:
+    """
+    Apply the retention policy to one table, then drop snapshot rows left
+    without a parent. Returns table name -> ``{'deleted', 'seconds'}``.
+    """
+    report = {model_class.__tablename__: _timed_delete(model_class, model_class.expired_ids_query(), chunk_size)}
+    if model_class.snapshot_model is not None:
+        report[model_class.snapshot_model.__tablename__] = _timed_delete(
+            model_class.snapshot_model, orphaned_snapshot_ids_query(model_class), chunk_size)
+    return report
+
+def run_retention(chunk_size: int = RETENTION_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    One retention pass over every time series table plus the collection journal.
+
+    Raw APY snapshots are rolled up first (see app.rollups); if that fails
+    their tables are left alone this pass.
+
+    Returns a report: ``rolled_up`` maps rollup table to rows written,
+    ``tables`` maps table name to ``{'deleted', 'seconds'}``, with ``deleted``
+    and ``seconds`` totals for the whole pass.
+    """
+    started = time.perf_counter()
+    tables: Dict[str, Dict[str, Any]] = {}
+    skip = set()
+    try:
+        rolled_up = run_rollups()
+    except Exception as e:
+        # Never purge raw history that has not been rolled up
+        logger.error(f"Rollups failed, keeping raw rows of their source tables: {str(e)}")
+        rolled_up = {}
+        skip.update(ROLLUP_SOURCES)
+    for model_class in time_series_models():
+        if model_class in skip:
+            continue
+        try:
+            tables.update(purge_table(model_class, chunk_size))
+        except Exception as e:
+            logger.error(f"Retention failed for {model_class.__tablename__}: {str(e)}")
+    try:
+        tables[SubnetAPYHourly.__tablename__] = _timed_delete(SubnetAPYHourly, expired_hourly_ids_query(), chunk_size)
+    except Exception as e:
+        logger.error(f"Retention failed for {SubnetAPYHourly.__tablename__}: {str(e)}")
+
+    changed = [name for name, entry in tables.items() if entry['deleted']]
+    if changed:
+        ensure_data_versions(changed)
+        with get_db() as db:
+            bump_data_version(db, changed)
+            db.commit()
+
+    journal_started = time.perf_counter()
+    tables['collection_journal'] = {
+        'deleted': purge_old_runs(),
+        'seconds': round(time.perf_counter() - journal_started, 3),
+    }
+
+    report = {
+        'rolled_up': rolled_up,
+        'tables': tables,
+        'deleted': sum(entry['deleted'] for entry in tables.values()),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Retention pass deleted {report['deleted']} rows in {report['seconds']}s: "
+                + ", ".join(f"{name}={entry['deleted']}" for name, entry in tables.items()))
+    return report
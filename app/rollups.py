@@ -0,0 +1,245 @@
+"""
+Hourly and daily APY rollups.
+
+Raw SubnetAPY snapshots only live for RETENTION_DAYS / MAX_ROWS_PER_NETUID.
+Before each retention pass every complete hour that has not been rolled up yet
+is aggregated into subnet_apy_hourly, and every complete day of hourly rows
+into subnet_apy_daily, so long-range trends survive the purge. A day that
+gains hourly rows after its daily row was written is rebuilt.
+
+A snapshot counts towards every hour between its recorded_at and its
+last_seen_at: unchanged data is stored once (see TimeSeriesWriter) but was
+observed for that whole span.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+from app.config import ROLLUP_HOURLY_RETENTION_DAYS
+from app.models import (SubnetAPY, SubnetAPYDaily, SubnetAPYHourly, ValidatorAPYSnapshot,
+                        bump_data_version, ensure_data_versions, get_db)
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+# Raw tables whose rows must be rolled up before retention may delete them
+ROLLUP_SOURCES = (SubnetAPY,)
+
+ROLLUP_COLUMNS = ['netuid', 'bucket_start', 'samples', 'subnet_apy', 'validator_count', 'apy_count',
+                  'apy_min', 'apy_max', 'apy_mean', 'apy_median', 'apy_std',
+                  'alpha_stake_total', 'nominated_stake_total']
+
+def _last_buckets(db, rollup_model, netuids=None) -> Dict[int, datetime]:
+    """netuid -> newest bucket already rolled up."""
+    query = select(rollup_model.netuid, func.max(rollup_model.bucket_start)).group_by(rollup_model.netuid)
+    if netuids is not None:
+        query = query.where(rollup_model.netuid.in_(netuids))
+    return dict(db.execute(query).all())
+
+def _after_watermark(df: pd.DataFrame, done: Dict[int, datetime]) -> pd.DataFrame:
+    """Drop buckets at or before each netuid's newest rolled-up bucket."""
+    if not done or df.empty:
+        return df
+    watermark = pd.to_datetime(df['netuid'].map(done))
+    return df[watermark.isna() | (df['bucket_start'] > watermark)]
+
+def _frame(db, query) -> pd.DataFrame:
+    result = db.connection().execute(query)
+    return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+def _snapshot_hours(snapshots: pd.DataFrame, end: datetime) -> pd.DataFrame:
+    """One (snapshot_id, netuid, bucket_start) row per hour each snapshot was observed."""
+    first = pd.to_datetime(snapshots['recorded_at']).dt.floor('h')
+    seen = pd.to_datetime(snapshots['last_seen_at']).fillna(pd.to_datetime(snapshots['recorded_at']))
+    last = seen.dt.floor('h').clip(upper=pd.Timestamp(end - HOUR))
+    hours = ((last - first) // pd.Timedelta(HOUR)).astype(int) + 1
+    expanded = snapshots.loc[snapshots.index.repeat(hours.clip(lower=0))].copy()
+    offsets = expanded.groupby(level=0).cumcount()
+    expanded['bucket_start'] = first.loc[expanded.index] + offsets * pd.Timedelta(HOUR)
+    return expanded.reset_index(drop=True)
+
+def build_hourly(db, end: datetime, netuids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Hourly rollup rows for complete hours before ``end`` that are not stored yet."""
+    done = _last_buckets(db, SubnetAPYHourly, netuids)
+    seen_at = func.coalesce(SubnetAPY.last_seen_at, SubnetAPY.recorded_at)
+    window = [SubnetAPY.recorded_at < end]
+    if done:
+        window.append(seen_at >= min(done.values()) + HOUR)
+    if netuids is not None:
+        window.append(SubnetAPY.netuid.in_(netuids))
+
+    snapshots = _frame(db, select(
+        SubnetAPY.id.label('snapshot_id'), SubnetAPY.netuid, SubnetAPY.recorded_at,
+        SubnetAPY.last_seen_at, SubnetAPY.data['apy'].as_float().label('subnet_apy')
+    ).where(*window))
+    if snapshots.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    snapshots['recorded_at'] = pd.to_datetime(snapshots['recorded_at'])
+    snapshots['subnet_apy'] = pd.to_numeric(snapshots['subnet_apy'], errors='coerce')
+    hours = _after_watermark(_snapshot_hours(snapshots, end), done)
+    if hours.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    keys = ['netuid', 'bucket_start']
+    rollup = hours.groupby(keys).agg(samples=('snapshot_id', 'size'), subnet_apy=('subnet_apy', 'mean'))
+
+    # Matched to their snapshot here rather than joined in SQL: SQLite turns the
+    # recorded_at bound into a range scan of the (netuid, recorded_at) index per snapshot
+    validator_window = [ValidatorAPYSnapshot.recorded_at < end,
+                        ValidatorAPYSnapshot.recorded_at >= snapshots['recorded_at'].min()]
+    if netuids is not None:
+        validator_window.append(ValidatorAPYSnapshot.netuid.in_(netuids))
+    validators = _frame(db, select(
+        ValidatorAPYSnapshot.netuid, ValidatorAPYSnapshot.recorded_at, ValidatorAPYSnapshot.hotkey,
+        ValidatorAPYSnapshot.alpha_apy, ValidatorAPYSnapshot.alpha_stake, ValidatorAPYSnapshot.nominated_stake
+    ).where(*validator_window))
+    if not validators.empty:
+        validators = validators.merge(snapshots[['snapshot_id', 'netuid', 'recorded_at']], on=['netuid', 'recorded_at'])
+        validators = validators.drop(columns=['netuid']).merge(hours[['snapshot_id'] + keys], on='snapshot_id')
+        grouped = validators.groupby(keys)
+        rollup['validator_count'] = grouped['hotkey'].nunique()
+        for column in ('alpha_stake', 'nominated_stake'):
+            rollup[f'{column}_total'] = grouped[column].sum() / rollup['samples']
+        positive = validators.loc[validators['alpha_apy'] > 0].assign(
+            apy_square=lambda df: df['alpha_apy'] ** 2)
+        stats = positive.groupby(keys).agg(
+            apy_count=('alpha_apy', 'size'), apy_min=('alpha_apy', 'min'), apy_max=('alpha_apy', 'max'),
+            apy_mean=('alpha_apy', 'mean'), apy_median=('alpha_apy', 'median'), apy_square=('apy_square', 'mean'))
+        stats['apy_std'] = np.sqrt((stats.pop('apy_square') - stats['apy_mean'] ** 2).clip(lower=0))
+        rollup = rollup.join(stats)
+    return rollup.reset_index().reindex(columns=ROLLUP_COLUMNS)
+
+def _weighted_medians(hourly: pd.DataFrame, keys) -> pd.Series:
+    """Per group, the hourly median at which half of the group's APY values are reached."""
+    ranked = hourly.loc[hourly['apy_median'].notna() & (hourly['apy_count'] > 0)]\
+        .sort_values(keys + ['apy_median'])
+    cumulative = ranked.groupby(keys)['apy_count'].cumsum()
+    half = ranked.groupby(keys)['apy_count'].transform('sum') / 2
+    return ranked.loc[cumulative >= half].groupby(keys)['apy_median'].first()
+
+def _combine(hourly: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    Merge hourly rows per ``keys``. Counts, extremes, mean and population std
+    combine exactly; the median is the count-weighted median of hourly medians
+    and validator_count the largest hourly count.
+    """
+    count = hourly['apy_count'].fillna(0)
+    hourly = hourly.assign(
+        apy_count=count,
+        apy_weighted=hourly['apy_mean'] * count,
+        apy_moment=(hourly['apy_std'] ** 2 + hourly['apy_mean'] ** 2) * count,
+        subnet_weighted=hourly['subnet_apy'] * hourly['samples'],
+        subnet_samples=hourly['samples'].where(hourly['subnet_apy'].notna(), 0),
+    )
+    grouped = hourly.groupby(keys)
+    combined = grouped.agg(
+        samples=('samples', 'sum'), subnet_weighted=('subnet_weighted', 'sum'),
+        subnet_samples=('subnet_samples', 'sum'), validator_count=('validator_count', 'max'),
+        apy_count=('apy_count', 'sum'), apy_min=('apy_min', 'min'), apy_max=('apy_max', 'max'),
+        apy_weighted=('apy_weighted', 'sum'), apy_moment=('apy_moment', 'sum'),
+        alpha_stake_total=('alpha_stake_total', 'mean'), nominated_stake_total=('nominated_stake_total', 'mean'),
+    )
+    total = combined['apy_count'].where(combined['apy_count'] > 0)
+    combined['subnet_apy'] = combined.pop('subnet_weighted') / combined.pop('subnet_samples').where(lambda n: n > 0)
+    combined['apy_mean'] = combined.pop('apy_weighted') / total
+    combined['apy_std'] = np.sqrt((combined.pop('apy_moment') / total - combined['apy_mean'] ** 2).clip(lower=0))
+    combined['apy_median'] = _weighted_medians(hourly, keys)
+    return combined.reset_index()
+
+def build_daily(db, end: datetime, netuids: Optional[Iterable[int]] = None,
+                touched: Iterable[Tuple[int, datetime]] = ()) -> pd.DataFrame:
+    """
+    Daily rollup rows for complete days before ``end``, built from the hourly tier.
+
+    Days in ``touched`` ((netuid, day) pairs) are rebuilt even when already
+    rolled up: a heartbeat extends a snapshot's last_seen_at, which can add
+    hourly rows to a day after its daily row was written.
+    """
+    done = _last_buckets(db, SubnetAPYDaily, netuids)
+    touched = {(int(netuid), pd.Timestamp(day)) for netuid, day in touched}
+    window = [SubnetAPYHourly.bucket_start < end]
+    if done:
+        start = min(done.values()) + DAY
+        if touched:
+            start = min(start, min(day for _, day in touched).to_pydatetime())
+        window.append(SubnetAPYHourly.bucket_start >= start)
+    if netuids is not None:
+        window.append(SubnetAPYHourly.netuid.in_(netuids))
+    hourly = _frame(db, select(*(getattr(SubnetAPYHourly, c) for c in ROLLUP_COLUMNS)).where(*window))
+    if hourly.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    hourly['bucket_start'] = pd.to_datetime(hourly['bucket_start']).dt.floor('D')
+    daily = _combine(hourly, ['netuid', 'bucket_start']).reindex(columns=ROLLUP_COLUMNS)
+    fresh = daily.index.isin(_after_watermark(daily, done).index)
+    rebuilt = pd.MultiIndex.from_frame(daily[['netuid', 'bucket_start']]).isin(list(touched)) if touched else False
+    return daily[fresh | rebuilt]
+
+def _touched_days(rows: pd.DataFrame) -> List[Tuple[int, datetime]]:
+    """(netuid, day) of every day ``rows`` (rollup rows) fall in."""
+    if rows.empty:
+        return []
+    days = rows[['netuid', 'bucket_start']].assign(bucket_start=pd.to_datetime(rows['bucket_start']).dt.floor('D'))
+    return list(days.drop_duplicates().itertuples(index=False, name=None))
+
+def _store(db, rollup_model, rows: pd.DataFrame, replace: bool = False) -> int:
+    """Insert rollup rows; with ``replace``, stored rows for the same buckets are deleted first."""
+    if rows.empty:
+        return 0
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows['bucket_start'] = rows['bucket_start'].map(lambda ts: ts.to_pydatetime() if hasattr(ts, 'to_pydatetime') else ts)
+    records = rows.to_dict('records')
+    for record in records:
+        for column in ('netuid', 'samples', 'validator_count', 'apy_count'):
+            if record[column] is not None:
+                record[column] = int(record[column])
+    if replace:
+        for netuid, buckets in rows.groupby('netuid')['bucket_start']:
+            db.execute(delete(rollup_model).where(rollup_model.netuid == int(netuid),
+                                                  rollup_model.bucket_start.in_(list(buckets))))
+    db.execute(insert(rollup_model), records)
+    return len(records)
+
+def run_rollups(now: Optional[datetime] = None, netuids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    Roll up every complete hour and day not stored yet, and rebuild the days
+    that gained hourly rows. Both tiers are written in one transaction, so a
+    failed run leaves no day behind its hours. Safe to run repeatedly.
+    Returns rollup table -> rows written.
+    """
+    now = now or datetime.utcnow()
+    netuids = list(netuids) if netuids is not None else None
+    hour_end = now.replace(minute=0, second=0, microsecond=0)
+    day_end = hour_end.replace(hour=0)
+    hourly_name, daily_name = SubnetAPYHourly.__tablename__, SubnetAPYDaily.__tablename__
+    ensure_data_versions([hourly_name, daily_name])
+    with get_db() as db:
+        hourly = build_hourly(db, hour_end, netuids)
+        written = {hourly_name: _store(db, SubnetAPYHourly, hourly)}
+        db.flush()
+        daily = build_daily(db, day_end, netuids, touched=_touched_days(hourly))
+        written[daily_name] = _store(db, SubnetAPYDaily, daily, replace=True)
+        changed = [name for name, count in written.items() if count]
+        if changed:
+            bump_data_version(db, changed)
+        db.commit()
+    logger.info("Rolled up " + ", ".join(f"{count} {name} rows" for name, count in written.items()))
+    return written
+
+def expired_hourly_ids_query(now: Optional[datetime] = None):
+    """Hourly rollups older than ROLLUP_HOURLY_RETENTION_DAYS. Daily rollups never expire."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=ROLLUP_HOURLY_RETENTION_DAYS)
+    return select(SubnetAPYHourly.id).where(SubnetAPYHourly.bucket_start < cutoff).order_by(SubnetAPYHourly.id)
+
+def load_apy_rollups(tier: str = 'daily', netuids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Stored rollups of one tier ('hourly' or 'daily') as a DataFrame sorted by netuid and bucket."""
+    rollup_model = {'hourly': SubnetAPYHourly, 'daily': SubnetAPYDaily}[tier]
+    query = select(*(getattr(rollup_model, c) for c in ROLLUP_COLUMNS))\
+        .order_by(rollup_model.netuid, rollup_model.bucket_start)
+    if netuids is not None:
+        query = query.where(rollup_model.netuid.in_(list(netuids)))
+    with get_db() as db:
+        return _frame(db, query)
@@ -0,0 +1,189 @@
+import logging
+import random
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from app.config import (DATA_FETCH_FREQUENCIES, RETENTION_FREQUENCY, SCHEDULER_POLL_SECONDS, SCHEDULER_JITTER,
+                        SCHEDULER_LEASE_TTL, SCHEDULER_RETRY_SECONDS)
+from app.locks import LeaderLock
+from app.journal import get_run_status, resumable_netuids, window_run_id
+from app.models import SubnetAPY
+from app.utils import get_last_recorded
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_SECONDS = {
+    "hourly": 60 * 60,
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+}
+
+def parse_frequency(frequency) -> int:
+    """Convert a DATA_FETCH_FREQUENCIES value ('hourly', 'daily', 'weekly' or seconds) to seconds."""
+    if isinstance(frequency, (int, float)):
+        return int(frequency)
+    frequency = str(frequency).strip().lower()
+    if frequency in FREQUENCY_SECONDS:
+        return FREQUENCY_SECONDS[frequency]
+    if frequency.isdigit():
+        return int(frequency)
+    raise ValueError(f"Unknown fetch frequency: {frequency!r}")
+
+def collect_apy(run_id: str):
+    """Scheduled APY collection for all registered subnets."""
+    # Imported lazily: subnet_metrics pulls in plotly and the HTTP session
+    from app.subnet_metrics import store_all_subnet_apy
+    return store_all_subnet_apy(run_id=run_id)
+
+# Metric name -> (collector taking a run id, time series model used to find the last run)
+COLLECTORS: Dict[str, tuple] = {
+    "apy": (collect_apy, SubnetAPY),
+}
+
+def retention(run_id: str):
+    """Scheduled retention pass over the time series tables and the collection journal."""
+    from app.retention import run_retention
+    return run_retention()
+
+# Maintenance job name -> (function taking a run id, cadence)
+MAINTENANCE: Dict[str, tuple] = {
+    "retention": (retention, RETENTION_FREQUENCY),
+}
+
+class Job:
+    """One metric collected at a fixed cadence with jitter."""
+    def __init__(self, name: str, fn: Callable, interval: int, model_class=None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.model_class = model_class
+        self.next_run = 0.0
+
+    def next_window_run(self, now: float) -> float:
+        """
+        When to run next: the start of the window after the one containing
+        ``now`` (the current run's start time), plus up to SCHEDULER_JITTER of the interval. Runs are pinned to
+        the windows of window_run_id, so each window gets exactly one run id
+        and jitter can neither repeat a window nor skip one.
+        """
+        window_start = now - now % self.interval
+        return window_start + self.interval + random.uniform(0, SCHEDULER_JITTER) * self.interval
+
+    def schedule_from_history(self):
+        """
+        Resume an unfinished run of the current window at once (netuids still
+        pending, or failed fewer than COLLECTION_MAX_ATTEMPTS times), otherwise
+        wait for the next window if this one already ran, so restarts don't
+        collect twice.
+        """
+        now = time.time()
+        run_id = window_run_id(self.name, self.interval)
+        if get_run_status(run_id):
+            self.next_run = now if resumable_netuids(run_id) else self.next_window_run(now)
+            return
+        last_run = None
+        if self.model_class is not None:
+            recorded = get_last_recorded(self.model_class)
+            last_run = max(recorded.values(), default=None)
+        if last_run is not None and (last_run - datetime(1970, 1, 1)).total_seconds() >= now - now % self.interval:
+            self.next_run = self.next_window_run(now)
+        else:
+            self.next_run = now
+
+    def run(self):
+        started = time.time()
+        logger.info(f"Running scheduled job '{self.name}'")
+        # One journaled run per cadence window: a restart mid-run resumes it
+        run_id = window_run_id(self.name, self.interval, datetime.utcfromtimestamp(started))
+        try:
+            self.fn(run_id)
+            logger.info(f"Job '{self.name}' finished in {time.time() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Job '{self.name}' failed: {str(e)}")
+        # From the window this run started in: a run overlapping into the next
+        # window must not make that window wait for the one after it
+        self.next_run = self.next_window_run(started)
+        self._schedule_retry(run_id, started)
+
+    def _schedule_retry(self, run_id: str, started: float):
+        """Resume the run after SCHEDULER_RETRY_SECONDS if netuids failed and its window is still open."""
+        retry_at = time.time() + SCHEDULER_RETRY_SECONDS
+        if retry_at >= started - started % self.interval + self.interval:
+            return
+        try:
+            failed = resumable_netuids(run_id)
+        except Exception as e:
+            logger.error(f"Could not read the journal of run {run_id}: {str(e)}")
+            return
+        if failed:
+            logger.info(f"Retrying {len(failed)} netuids of run {run_id} in {SCHEDULER_RETRY_SECONDS}s")
+            self.next_run = retry_at
+
+def build_jobs(frequencies: Optional[dict] = None) -> Dict[str, Job]:
+    """Create a job for every metric in DATA_FETCH_FREQUENCIES that has a collector."""
+    frequencies = frequencies or DATA_FETCH_FREQUENCIES
+    jobs = {}
+    for metric, frequency in frequencies.items():
+        if metric not in COLLECTORS:
+            logger.info(f"No collector registered for '{metric}' ({frequency}), skipping")
+            continue
+        fn, model_class = COLLECTORS[metric]
+        jobs[metric] = Job(metric, fn, parse_frequency(frequency), model_class)
+    return jobs
+
+def build_maintenance_jobs(maintenance: Optional[dict] = None) -> Dict[str, Job]:
+    """Create the housekeeping jobs that run next to the collectors."""
+    maintenance = MAINTENANCE if maintenance is None else maintenance
+    return {name: Job(name, fn, parse_frequency(frequency)) for name, (fn, frequency) in maintenance.items()}
+
+class Scheduler:
+    """
+    Runs collection jobs at their cadence while holding the leader lock.
+
+    Every worker dyno runs a Scheduler, but only the one holding the
+    'collector-scheduler' lock collects; the others poll until it goes away.
+    """
+    def __init__(self, jobs: Dict[str, Job], poll_seconds: int = SCHEDULER_POLL_SECONDS):
+        self.jobs = jobs
+        self.poll_seconds = poll_seconds
+        self.lock = LeaderLock("collector-scheduler", ttl=SCHEDULER_LEASE_TTL)
+        self._stop = threading.Event()
+        self._leading = False
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def tick(self):
+        """Run due jobs if we are leader. Returns seconds until the next check."""
+        if not self.lock.acquire():
+            if self._leading:
+                logger.warning("Lost scheduler leadership")
+            self._leading = False
+            return self.poll_seconds
+        if not self._leading:
+            logger.info(f"Became scheduler leader ({self.lock.holder})")
+            self._leading = True
+            for job in self.jobs.values():
+                job.schedule_from_history()
+
+        for job in sorted(self.jobs.values(), key=lambda j: j.next_run):
+            if self._stop.is_set():
+                break
+            if job.next_run <= time.time() and self.lock.check():
+                job.run()
+
+        next_due = min((job.next_run for job in self.jobs.values()), default=time.time() + self.poll_seconds)
+        return min(max(next_due - time.time(), 1), self.poll_seconds)
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"Scheduler started with jobs: {', '.join(f'{j.name}/{j.interval}s' for j in self.jobs.values()) or 'none'}")
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(self.tick())
+        finally:
+            self.lock.release()
+            logger.info("Scheduler stopped")
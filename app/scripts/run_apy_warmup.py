@@ -3,7 +3,12 @@
 Script to run APY warmup, can be used both locally and on Heroku.
 For Heroku: heroku run python -m app.scripts.run_apy_warmup
 For local: python -m app.scripts.run_apy_warmup
+
+Runs are journaled per APY cadence window (e.g. per UTC day), so running it
+again after a crash only fetches the subnets that are still missing.
+Pass --run-id to choose the run explicitly.
 """
+import argparse
 import os
 import sys
 import logging
@@ -13,10 +18,19 @@ from pathlib import Path
 project_root = str(Path(__file__).parent.parent.parent)
 sys.path.append(project_root)
 
+from app.config import DATA_FETCH_FREQUENCIES
+from app.journal import window_run_id
+from app.models import init_db
+from app.scheduler import parse_frequency
 from app.subnet_metrics import store_all_subnet_apy
 
-def main():
+def main(argv=None):
     """Run the APY warmup script."""
+    parser = argparse.ArgumentParser(description="Collect APY data for all subnets")
+    parser.add_argument("--run-id", help="Journal run id (default: current APY cadence window)")
+    args = parser.parse_args(argv)
+    run_id = args.run_id or window_run_id("apy", parse_frequency(DATA_FETCH_FREQUENCIES["apy"]))
+
     # Set up logging
     logging.basicConfig(
         level=logging.INFO,
@@ -29,8 +43,9 @@ def main():
         logger.warning("Not running on Heroku - this is fine for local testing")
 
     try:
-        logger.info("🚀 Starting APY data collection...")
-        results = store_all_subnet_apy()
+        init_db()
+        logger.info(f"🚀 Starting APY data collection (run {run_id})...")
+        results = store_all_subnet_apy(run_id=run_id)
         success_count = sum(1 for success in results.values() if success)
         logger.info(f"✨ APY data collection complete. Success: {success_count}/{len(results)} subnets")
         return True
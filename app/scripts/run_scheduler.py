@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Long-running collector scheduler. Runs each metric at its DATA_FETCH_FREQUENCIES cadence,
+plus the retention pass at RETENTION_FREQUENCY.
+For Heroku: add `worker: python -m app.scripts.run_scheduler` to the Procfile and scale worker dynos
+For local: python -m app.scripts.run_scheduler
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to Python path
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from app.models import init_db
+from app.scheduler import Scheduler, build_jobs, build_maintenance_jobs
+
+def main():
+    """Run the collector scheduler until SIGTERM."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    init_db()
+    jobs = build_jobs()
+    jobs.update(build_maintenance_jobs())
+    Scheduler(jobs).run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 from datetime import datetime, timedelta
 import time
-from app.utils import get_db, get_cached_netuids
+from typing import Dict, Optional
+from app.journal import begin_run, record_attempt, record_attempts
+from app.models import TimeSeriesWriter
+from app.utils import get_cached_netuids, get_last_recorded, prioritize_netuids
 
 __all__ = ['run_warmup']
 
-def run_warmup(fetch_fn, model_class, name="metric", min_age_hours=6, sleep_sec=6):
+def run_warmup(fetch_fn, model_class, name="metric", min_age_hours=6, sleep_sec=6,
+               run_id: Optional[str] = None) -> Dict[int, bool]:
     """
     Generic warmup function to collect data for all subnets.
-    Uses cached subnet info to determine which subnets to process.
+    Uses cached subnet info to determine which subnets to process, stalest
+    and highest market cap first.
+
+    A subnet is reported as stored only once the writer has committed its
+    row. With a ``run_id`` every attempt, including a failed final flush, is
+    journaled per netuid as in store_all_subnet_apy.
     
     Args:
         fetch_fn: Function that fetches data for a subnet (takes netuid as arg)
@@ -15,27 +24,69 @@ def run_warmup(fetch_fn, model_class, name="metric", min_age_hours=6, sleep_sec=
         name: Name of the metric for logging
         min_age_hours: Skip subnets with data newer than this
         sleep_sec: Seconds to sleep between requests
+        run_id: Collection run to checkpoint into, e.g. from app.journal.window_run_id
+
+    Returns:
+        Dict mapping netuid to success status (True/False)
     """
+    label = name.upper()
     now = datetime.utcnow()
     netuids = get_cached_netuids()
-    print(f"[{name.upper()}] 🔍 Found {len(netuids)} active subnets")
-    
-    with get_db() as db:
-        for netuid in netuids:
-            recent = db.query(model_class).filter(
-                model_class.netuid == netuid,
-                model_class.recorded_at > now - timedelta(hours=min_age_hours)
-            ).first()
-            if recent:
-                print(f"[{name.upper()}] ✅ Skipping netuid={netuid} (cached)")
-                continue
+    print(f"[{label}] 🔍 Found {len(netuids)} active subnets")
+
+    # One grouped query for freshness instead of one query per netuid
+    last_recorded = get_last_recorded(model_class)
+    cutoff = now - timedelta(hours=min_age_hours)
+    due = []
+    for netuid in netuids:
+        recent = last_recorded.get(netuid)
+        if recent and recent > cutoff:
+            print(f"[{label}] ✅ Skipping netuid={netuid} (cached)")
+        else:
+            due.append(netuid)
+
+    results: Dict[int, bool] = {}
+    if run_id is not None:
+        due, done = begin_run(run_id, name, due)
+        results.update({netuid: True for netuid in done})
+
+    def flushed(entries, error):
+        if run_id is not None:
+            record_attempts(run_id, [
+                (netuid, error is None, latency_ms, None if error is None else str(error))
+                for netuid, latency_ms in entries
+            ])
+        for netuid, _ in entries:
+            results[netuid] = error is None
+            if error is None:
+                print(f"[{label}] ✅ Stored for netuid={netuid}")
+            else:
+                print(f"[{label}] ❌ Failed to store netuid={netuid}: {error}")
 
+    # Rows are written in multi-row INSERTs rather than one commit per netuid
+    writer = TimeSeriesWriter(on_flush=flushed)
+    try:
+        for netuid in prioritize_netuids(model_class, due, last_recorded):
+            started = time.perf_counter()
             try:
                 data = fetch_fn(netuid)
-                record = model_class(netuid=netuid, data=data)
-                db.add(record)
-                db.commit()
-                print(f"[{name.upper()}] ✅ Stored for netuid={netuid}")
             except Exception as e:
-                print(f"[{name.upper()}] ❌ Failed for netuid={netuid}: {e}")
+                results[netuid] = False
+                if run_id is not None:
+                    record_attempt(run_id, netuid, False, (time.perf_counter() - started) * 1000, str(e))
+                print(f"[{label}] ❌ Failed for netuid={netuid}: {e}")
+            else:
+                latency_ms = (time.perf_counter() - started) * 1000
+                try:
+                    writer.add(model_class(netuid=netuid, data=data, recorded_at=datetime.utcnow()), meta=latency_ms)
+                except Exception:
+                    # A failed flush was already reported and journaled by flushed()
+                    pass
             time.sleep(sleep_sec)
+    finally:
+        try:
+            writer.flush()
+        except Exception:
+            # Already reported and journaled by flushed()
+            pass
+    return results
@@ -0,0 +1,172 @@
+"""
+Per-data-version snapshots of the frames the dashboards share.
+
+The first worker to ask for a dataset at a new data version builds it and
+writes it to SNAPSHOT_DIR in the columnar format (app.columnar); every
+worker then maps that file read-only. The frame is computed once per
+version rather than once per worker, and its numeric blocks are backed by
+the page cache instead of each worker's heap. Frames the columnar format
+cannot encode are pickled instead, which still saves the rebuild.
+"""
+import glob
+import logging
+import mmap
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+import pandas as pd
+from app.columnar import UnsupportedFrame, dumps_frame, is_columnar, loads_frame
+from app.config import SNAPSHOT_DIR
+from app.data_version import current_versions
+
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: workers may build the same snapshot concurrently
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class Dataset:
+    """A frame derived from ``sources`` (table names) by ``builder``."""
+    def __init__(self, name: str, builder: Callable[[], pd.DataFrame], sources: Tuple[str, ...],
+                 refresh: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.builder = builder
+        self.sources = sources
+        self.refresh = refresh
+
+DATASETS: Dict[str, Dataset] = {}
+
+def register_dataset(name: str, builder: Callable[[], pd.DataFrame], sources: Tuple[str, ...],
+                     refresh: Optional[Callable[[], None]] = None):
+    DATASETS[name] = Dataset(name, builder, sources, refresh)
+
+# Versions to try when the snapshot file disappears between building and reading it
+READ_ATTEMPTS = 3
+
+# name -> (version, frame); the frame keeps its mmap alive
+_loaded: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+_loaded_lock = threading.Lock()
+
+def _path(name: str, version: tuple) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}-{'-'.join(str(v) for v in version)}.snap")
+
+@contextmanager
+def _build_lock(name: str):
+    """Serialize builders of one dataset across the workers on this host."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(SNAPSHOT_DIR, f"{name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _write(path: str, df: pd.DataFrame):
+    try:
+        payload = dumps_frame(df)
+    except UnsupportedFrame as e:
+        logger.info(f"Snapshot {os.path.basename(path)} pickled: {str(e)}")
+        payload = pickle.dumps(df, pickle.HIGHEST_PROTOCOL)
+    fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+def _read(path: str) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Empty snapshot {path}")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if is_columnar(mapped):
+        return loads_frame(mapped, copy=False)
+    try:
+        return pickle.loads(mapped)
+    finally:
+        mapped.close()
+
+def _remove_old(name: str, keep: str):
+    # Workers still mapping an old file keep its pages until they drop it
+    for path in glob.glob(os.path.join(SNAPSHOT_DIR, f"{name}-*.snap")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def load_snapshot(name: str) -> pd.DataFrame:
+    """
+    Current snapshot of dataset ``name``, building it if this data version has none yet.
+
+    Numeric columns of the returned frame are read-only views of the mapped
+    file: filter, merge or copy it, but don't assign into it in place.
+
+    An empty frame is returned as built but never written: builders return
+    one when their inputs are missing or failed to load, and persisting it
+    would serve that gap for the whole data version.
+    """
+    dataset = DATASETS[name]
+    if dataset.refresh is not None:
+        dataset.refresh()
+    for _ in range(READ_ATTEMPTS):
+        version = current_versions(*dataset.sources)
+        if version is None:
+            return dataset.builder()
+        with _loaded_lock:
+            loaded = _loaded.get(name)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+
+        path = _path(name, version)
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        if not os.path.exists(path):
+            with _build_lock(name):
+                if not os.path.exists(path):
+                    df = dataset.builder()
+                    if df.empty:
+                        logger.warning(f"Snapshot {name} built empty, not persisting it")
+                        return df
+                    _write(path, df)
+                    _remove_old(name, keep=path)
+        try:
+            df = _read(path)
+        except FileNotFoundError:
+            # A worker that saw a newer version removed this file; load that version instead
+            continue
+        with _loaded_lock:
+            _loaded[name] = (version, df)
+        return df
+    logger.warning(f"Snapshot {name} kept being replaced while loading, building it in process")
+    return dataset.builder()
+
+def _latest_apy():
+    from app.subnet_metrics import load_latest_apy_df
+    return load_latest_apy_df()
+
+def _validator_apy():
+    from app.subnet_metrics import load_all_validator_apy_df
+    return load_all_validator_apy_df()
+
+def _validator_distribution():
+    from app.subnet_metrics import prepare_validator_distribution_data
+    return prepare_validator_distribution_data()
+
+def _subnet_combined():
+    from app.utils import fetch_combined_subnet_data
+    return fetch_combined_subnet_data()
+
+def _refresh_subnet_cache():
+    from app.utils import refresh_subnet_cache
+    refresh_subnet_cache()
+
+# Imported lazily above: subnet_metrics pulls in plotly and the HTTP client
+register_dataset("latest_apy", _latest_apy, ("subnet_apy",))
+register_dataset("validator_apy", _validator_apy, ("subnet_apy",))
+register_dataset("validator_distribution", _validator_distribution,
+                 ("subnet_apy", "subnet_info", "subnet_screener"), refresh=_refresh_subnet_cache)
+register_dataset("subnet_combined", _subnet_combined, ("subnet_info", "subnet_screener"), refresh=_refresh_subnet_cache)
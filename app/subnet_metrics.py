@@ -3,52 +3,21 @@ from datetime import datetime
 import logging
 import time
 from typing import Dict, List, Optional, Any
-from app.models import SubnetAPY, get_db
-from app.config import TAO_API_BASE, TAO_APP_API_KEY, TAO_API_RATE_LIMIT
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-import random
+from app.models import NetuidTimeSeries, SubnetAPY, SubnetAPYRaw, TimeSeriesWriter, ValidatorAPYSnapshot, get_db
+from sqlalchemy import and_, func, select
+from app.config import TAO_API_BASE, TAO_APP_API_KEY, TAO_API_RATE_LIMIT, APY_RAW_ARCHIVE
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from sqlalchemy import desc
 import plotly.express as px
-from app.utils import fetch_combined_subnet_data
+from app.utils import fetch_combined_subnet_data, discover_netuids, prioritize_netuids
+from app.rate_limit import tao_api_budget
+from app import http_client
+from app.journal import begin_run, get_run_status, record_attempt, record_attempts
 
 logger = logging.getLogger(__name__)
 
-class RateLimiter:
-    """Rate limiter for TAO.app API requests."""
-    def __init__(self, requests_per_minute: int):
-        self.requests_per_minute = requests_per_minute
-        self.interval = 60.0 / requests_per_minute
-        self.last_request_time = 0.0
-
-    def wait(self):
-        """Wait if necessary to respect rate limit."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.interval:
-            sleep_time = self.interval - time_since_last_request
-            # Add small random jitter to prevent thundering herd
-            sleep_time += random.uniform(0, 0.1)
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-
-# Create a session with retry logic
-session = requests.Session()
-retry_strategy = Retry(
-    total=TAO_API_RATE_LIMIT["max_retries"],
-    backoff_factor=TAO_API_RATE_LIMIT["initial_retry_delay"],
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["GET"]
-)
-adapter = HTTPAdapter(max_retries=retry_strategy)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
-
-# Initialize rate limiter
-rate_limiter = RateLimiter(TAO_API_RATE_LIMIT["requests_per_minute"])
+# Rate limiter shared by all collector threads and every other process using the API key
+rate_limiter = tao_api_budget
 
 def fetch_alpha_apy(netuid: int) -> Dict:
     """
@@ -67,11 +36,14 @@ def fetch_alpha_apy(netuid: int) -> Dict:
     params = {"netuid": netuid}
     headers = {"X-API-Key": TAO_APP_API_KEY}
     
-    # Wait for rate limit
-    rate_limiter.wait()
-    
     try:
-        response = session.get(url, params=params, headers=headers, timeout=10)
+        for attempt in range(TAO_API_RATE_LIMIT["max_retries"] + 1):
+            # Wait for rate limit
+            rate_limiter.acquire()
+            response = http_client.get(url, params=params, headers=headers)
+            if not rate_limiter.observe(response):
+                break
+            logger.warning(f"Throttled ({response.status_code}) fetching netuid {netuid}, attempt {attempt + 1}")
         response.raise_for_status()
         data = response.json()
         
@@ -124,12 +96,56 @@ def fetch_alpha_apy(netuid: int) -> Dict:
         logger.error(f"Error fetching APY data for netuid {netuid}: {str(e)}")
         raise
 
-def store_alpha_apy(netuid: int) -> Optional[SubnetAPY]:
+# Per-validator fields the dashboards read; everything else in the response is dropped
+VALIDATOR_FIELDS = ('hotkey', 'validator_name', 'alpha_apy', 'alpha_stake', 'nominated_stake', 'vtrust')
+
+def project_apy_payload(data: Dict) -> Dict:
+    """
+    Reduce a fetch_alpha_apy response to what gets stored in SubnetAPY.data.
+
+    The raw response carries every validator field in ``data['data']`` and the
+    same validators again in ``validator_apys``; only the subnet APY and the
+    projected validator list are kept.
+    
+    Args:
+        data: Response returned by fetch_alpha_apy
+        
+    Returns:
+        Dict with 'apy' and 'validator_apys'
+    """
+    return {
+        'apy': data.get('apy'),
+        'validator_apys': [
+            {field: v.get(field) for field in VALIDATOR_FIELDS}
+            for v in data.get('validator_apys', [])
+        ]
+    }
+
+def build_apy_records(netuid: int) -> List[NetuidTimeSeries]:
+    """
+    Fetch APY data for a subnet and wrap it in unsaved records.
+    
+    Args:
+        netuid: The subnet ID to fetch APY for
+        
+    Returns:
+        [SubnetAPY with the projected payload], followed by a SubnetAPYRaw
+        with the full response when APY_RAW_ARCHIVE is enabled
+    """
+    data = fetch_alpha_apy(netuid)
+    recorded_at = datetime.utcnow()
+    records = [SubnetAPY(netuid=netuid, data=project_apy_payload(data), recorded_at=recorded_at)]
+    if APY_RAW_ARCHIVE:
+        records.append(SubnetAPYRaw(netuid=netuid, data=data, recorded_at=recorded_at))
+    return records
+
+def store_alpha_apy(netuid: int, writer: Optional[TimeSeriesWriter] = None) -> Optional[SubnetAPY]:
     """
     Fetch and store APY data for a specific subnet.
     
     Args:
         netuid: The subnet ID to fetch and store APY for
+        writer: Buffered writer to queue the record on instead of committing it here
         
     Returns:
         SubnetAPY record if successful, None if failed
@@ -138,81 +154,193 @@ def store_alpha_apy(netuid: int) -> Optional[SubnetAPY]:
         Exception: If database operation fails
     """
     try:
-        # Fetch data
-        data = fetch_alpha_apy(netuid)
+        record, *archive = build_apy_records(netuid)
+        apy_value = record.data.get('apy', 'N/A')
+
+        if writer is not None:
+            for r in (record, *archive):
+                writer.add(r)
+            logger.info(f"Queued APY data for netuid {netuid}: APY={apy_value}%")
+            return record
         
-        # Store in database
-        db_session = get_db()
-        with db_session as db:
-            record = SubnetAPY(
-                netuid=netuid,
-                data=data,
-                recorded_at=datetime.utcnow()
-            )
-            db.add(record)
-            db.commit()
+        # Store in database (an unchanged snapshot only refreshes last_seen_at)
+        with TimeSeriesWriter() as single:
+            for r in (record, *archive):
+                single.add(r)
             
-            # Log success with APY value
-            apy_value = data.get('apy', 'N/A')
-            logger.info(
-                f"Stored APY data for netuid {netuid}: "
-                f"APY={apy_value}%, "
-                f"recorded_at={record.recorded_at}"
-            )
-            return record
+        # Log success with APY value
+        logger.info(
+            f"Stored APY data for netuid {netuid}: "
+            f"APY={apy_value}%, "
+            f"recorded_at={record.recorded_at}"
+        )
+        return record
             
     except Exception as e:
         logger.error(f"Error storing APY data for netuid {netuid}: {str(e)}")
         raise
 
-def process_batch(netuids: List[int]) -> Dict[int, bool]:
+def collect_netuid(netuid: int, writer: TimeSeriesWriter, run_id: Optional[str] = None) -> bool:
+    """
+    Fetch one subnet and queue it on the run's writer.
+
+    Failures are journaled right away; successes are journaled by the
+    writer's flush callback once the row is actually committed.
+    
+    Args:
+        netuid: The subnet ID to process
+        writer: Buffered writer shared by the run
+        run_id: Collection run to checkpoint into (see app.journal)
+        
+    Returns:
+        True if the data was fetched and queued
+    """
+    started = time.perf_counter()
+    try:
+        record, *archive = build_apy_records(netuid)
+    except Exception as e:
+        logger.error(f"Failed to process netuid {netuid}: {str(e)}")
+        if run_id is not None:
+            record_attempt(run_id, netuid, False, (time.perf_counter() - started) * 1000, str(e))
+        return False
+    try:
+        for r in archive:
+            writer.add(r)
+        writer.add(record, meta=(time.perf_counter() - started) * 1000)
+    except Exception:
+        # A failed flush is journaled and reported by the writer's callback
+        return False
+    return True
+
+def process_batch(netuids: List[int], writer: TimeSeriesWriter, run_id: Optional[str] = None) -> Dict[int, bool]:
     """
     Process a batch of netuids with rate limiting.
     
     Args:
         netuids: List of netuids to process
+        writer: Buffered writer shared by the run
+        run_id: Collection run to checkpoint into
         
     Returns:
         Dict mapping netuid to success status (True/False)
     """
-    results = {}
-    for netuid in netuids:
-        try:
-            store_alpha_apy(netuid)
-            results[netuid] = True
-        except Exception as e:
-            logger.error(f"Failed to process netuid {netuid}: {str(e)}")
-            results[netuid] = False
-    return results
-
-def store_all_subnet_apy(start_netuid: int = 1, end_netuid: int = 64) -> Dict[int, bool]:
+    return {netuid: collect_netuid(netuid, writer, run_id) for netuid in netuids}
+
+def process_concurrently(netuids: List[int], max_workers: int, writer: TimeSeriesWriter,
+                         run_id: Optional[str] = None) -> Dict[int, bool]:
     """
-    Fetch and store APY data for a range of subnets using batched processing.
+    Process netuids on a thread pool, keeping several requests in flight.
+
+    Throughput is bounded by the shared ``rate_limiter`` rather than by fixed
+    batch pauses, so the run takes roughly ``len(netuids) / rate`` seconds no
+    matter how slow individual responses are.
+
+    Args:
+        netuids: List of netuids to process
+        max_workers: Number of concurrent requests
+        writer: Buffered writer shared by the run
+        run_id: Collection run to checkpoint into
+
+    Returns:
+        Dict mapping netuid to success status (True/False)
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="apy") as executor:
+        futures = {netuid: executor.submit(collect_netuid, netuid, writer, run_id) for netuid in netuids}
+    # Preserve the input order so callers see the same dict as the batched path
+    return {netuid: future.result() for netuid, future in futures.items()}
+
+def store_all_subnet_apy(
+    start_netuid: Optional[int] = None,
+    end_netuid: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    netuids: Optional[List[int]] = None,
+    run_id: Optional[str] = None,
+    flush_size: Optional[int] = None
+) -> Dict[int, bool]:
+    """
+    Fetch and store APY data for all registered subnets, or for a given set.
+
+    Without arguments the netuids come from the cached subnet list and are
+    ordered by prioritize_netuids: never-collected and stalest subnets first,
+    highest market cap first among equally stale ones. With ``max_workers`` > 1
+    requests run concurrently under the shared token bucket; with 1 the
+    original batched, sequential processing is used.
+
+    With a ``run_id`` every netuid is checkpointed in the collection journal.
+    Calling again with the same id only processes netuids that are missing or
+    failed; the plan is read back from the journal, so a finished run costs no
+    API calls at all.
+
+    Records go through a TimeSeriesWriter, so the run commits one multi-row
+    INSERT per ``flush_size`` subnets instead of one transaction per subnet.
     
     Args:
-        start_netuid: First subnet ID to process (inclusive)
-        end_netuid: Last subnet ID to process (inclusive)
+        start_netuid: First subnet ID to process (inclusive), instead of discovery
+        end_netuid: Last subnet ID to process (inclusive), instead of discovery
+        max_workers: Concurrent requests (defaults to TAO_API_RATE_LIMIT["max_workers"])
+        netuids: Explicit netuids to process, in the given order
+        run_id: Collection run id, e.g. from app.journal.window_run_id
+        flush_size: Rows per INSERT (defaults to TIME_SERIES_FLUSH_SIZE)
         
     Returns:
         Dict mapping netuid to success status (True/False)
     """
     all_results = {}
-    netuids = list(range(start_netuid, end_netuid + 1))
+    if netuids is None and run_id is not None:
+        # Resuming: the plan was journaled by the first attempt
+        netuids = list(get_run_status(run_id)) or None
+    if netuids is None:
+        if start_netuid is not None and end_netuid is not None:
+            netuids = list(range(start_netuid, end_netuid + 1))
+        else:
+            netuids = prioritize_netuids(SubnetAPY, discover_netuids())
+            logger.info(f"Discovered {len(netuids)} subnets from the cached subnet list")
+    if run_id is not None:
+        netuids, done = begin_run(run_id, "apy", netuids)
+        all_results.update({netuid: True for netuid in done})
     batch_size = TAO_API_RATE_LIMIT["batch_size"]
-    
-    # Process in batches
-    for i in range(0, len(netuids), batch_size):
-        batch = netuids[i:i + batch_size]
-        logger.info(f"Processing batch {i//batch_size + 1} of {(len(netuids) + batch_size - 1)//batch_size}")
-        
-        # Process batch
-        batch_results = process_batch(batch)
-        all_results.update(batch_results)
-        
-        # Wait between batches if not the last batch
-        if i + batch_size < len(netuids):
-            logger.info(f"Waiting {TAO_API_RATE_LIMIT['batch_delay']} seconds before next batch...")
-            time.sleep(TAO_API_RATE_LIMIT["batch_delay"])
+    if max_workers is None:
+        max_workers = TAO_API_RATE_LIMIT["max_workers"]
+
+    flush_failed = set()
+
+    def journal_flushed(entries, error):
+        if run_id is not None:
+            record_attempts(run_id, [
+                (netuid, error is None, latency_ms, None if error is None else str(error))
+                for netuid, latency_ms in entries
+            ])
+        if error is not None:
+            flush_failed.update(netuid for netuid, _ in entries)
+
+    writer = TimeSeriesWriter(flush_size=flush_size, on_flush=journal_flushed)
+    try:
+        if not netuids:
+            logger.info("Nothing to collect")
+        elif max_workers > 1:
+            logger.info(f"Processing {len(netuids)} subnets with {max_workers} concurrent workers")
+            all_results.update(process_concurrently(netuids, max_workers, writer, run_id))
+        else:
+            # Process in batches
+            for i in range(0, len(netuids), batch_size):
+                batch = netuids[i:i + batch_size]
+                logger.info(f"Processing batch {i//batch_size + 1} of {(len(netuids) + batch_size - 1)//batch_size}")
+                
+                # Process batch
+                batch_results = process_batch(batch, writer, run_id)
+                all_results.update(batch_results)
+                
+                # Wait between batches if not the last batch
+                if i + batch_size < len(netuids):
+                    logger.info(f"Waiting {TAO_API_RATE_LIMIT['batch_delay']} seconds before next batch...")
+                    time.sleep(TAO_API_RATE_LIMIT["batch_delay"])
+    finally:
+        try:
+            writer.flush()
+        except Exception:
+            # Already logged and journaled by journal_flushed
+            pass
+    all_results.update({netuid: False for netuid in flush_failed})
     
     # Log summary
     success_count = sum(1 for success in all_results.values() if success)
@@ -224,10 +352,10 @@ def store_all_subnet_apy(start_netuid: int = 1, end_netuid: int = 64) -> Dict[in
     return all_results
 
 def get_latest_apy():
-    """Get the latest APY records for each subnet."""
+    """Get the latest APY record for each subnet, sorted by netuid."""
     db_session = get_db()
     with db_session as db:
-        return db.query(SubnetAPY).order_by(desc(SubnetAPY.recorded_at)).all()
+        return SubnetAPY.latest_per_netuid(db)
 
 def load_latest_apy_df():
     """Load the latest APY data into a pandas DataFrame with additional metrics aggregated from all validators."""
@@ -239,7 +367,7 @@ def load_latest_apy_df():
     rows = []
     for r in records:
         netuid = r.netuid
-        recorded_at = r.recorded_at
+        recorded_at = r.last_seen_at or r.recorded_at
         validator_apys = r.data.get('validator_apys', [])
         for v in validator_apys:
             if v.get('alpha_apy') is not None:
@@ -268,29 +396,32 @@ def load_latest_apy_df():
 
 def load_all_validator_apy_df():
     """Return a DataFrame with all validator APYs, one row per validator per subnet."""
-    records = get_latest_apy()
-    rows = []
-    for r in records:
-        netuid = r.netuid
-        recorded_at = r.recorded_at
-        validator_apys = r.data.get('validator_apys', [])
-        for v in validator_apys:
-            if v.get('alpha_apy') is not None:
-                # Set validator_name to 'No-name' if missing or empty
-                name = v.get('validator_name')
-                if not name or str(name).strip() == '':
-                    name = 'No-name'
-                rows.append({
-                    'netuid': netuid,
-                    'recorded_at': recorded_at,
-                    'alpha_apy': float(v['alpha_apy']),
-                    'vtrust': v.get('vtrust'),
-                    'validator_name': name,
-                    'hotkey': v.get('hotkey', 'Unknown'),
-                    'alpha_stake': v.get('alpha_stake', 0),
-                    'nominated_stake': v.get('nominated_stake', 0)
-                })
-    df = pd.DataFrame(rows)
+    newest = SubnetAPY.newest_subquery()
+    query = select(
+        ValidatorAPYSnapshot.netuid,
+        func.coalesce(SubnetAPY.last_seen_at, SubnetAPY.recorded_at).label('recorded_at'),
+        ValidatorAPYSnapshot.alpha_apy,
+        ValidatorAPYSnapshot.vtrust,
+        ValidatorAPYSnapshot.validator_name,
+        ValidatorAPYSnapshot.hotkey,
+        ValidatorAPYSnapshot.alpha_stake,
+        ValidatorAPYSnapshot.nominated_stake,
+    ).join(newest, and_(ValidatorAPYSnapshot.netuid == newest.c.netuid,
+                        ValidatorAPYSnapshot.recorded_at == newest.c.recorded_at))\
+     .join(SubnetAPY, and_(SubnetAPY.netuid == newest.c.netuid,
+                           SubnetAPY.recorded_at == newest.c.recorded_at))\
+     .where(ValidatorAPYSnapshot.alpha_apy.isnot(None))\
+     .order_by(ValidatorAPYSnapshot.netuid, ValidatorAPYSnapshot.id)
+    with get_db() as db:
+        result = db.connection().execute(query)
+        df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+    if df.empty:
+        return df
+    # Set validator_name to 'No-name' if missing or empty
+    names = df['validator_name'].fillna('').astype(str)
+    df['validator_name'] = names.where(names.str.strip() != '', 'No-name')
+    df['hotkey'] = df['hotkey'].fillna('Unknown')
+    df[['alpha_stake', 'nominated_stake']] = df[['alpha_stake', 'nominated_stake']].fillna(0)
     return df
 
 def _build_apy_boxplot(log_value):
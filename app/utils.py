@@ -1,32 +1,85 @@
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, Column, Integer, Text, DateTime, desc, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, func, and_, inspect, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.config import TAO_API_BASE, TAO_APP_API_KEY, DATABASE_URI, CACHE_DEFAULT_TIMEOUT, COINGECKO_API_KEY
-from app.models import SubnetAPY, get_db
-from typing import List
+from app.config import TAO_API_BASE, TAO_APP_API_KEY, CACHE_DEFAULT_TIMEOUT, COINGECKO_API_KEY, TAO_API_RATE_LIMIT, CACHE_STALE_WHILE_REVALIDATE, CACHE_MAX_STALENESS
+from app.database import engine
+from app.models import SubnetAPY, add_missing_columns, bump_data_version, ensure_data_versions, get_db
+from app.rate_limit import RateLimitTimeout, tao_api_budget
+from app.http_cache import conditional_get
+from app.locks import holder_id, try_acquire_lease, release_lease
+from app import json_codec
+from typing import Dict, List, Optional
 import ast
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 # SQLAlchemy setup
-connect_args = {'check_same_thread': False} if DATABASE_URI.startswith('sqlite') else {}
-engine = create_engine(DATABASE_URI, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
-class SubnetInfoCache(Base):
+# Fields the dashboards read on every load, stored as typed columns next to
+# the full JSON blob so they can be selected without parsing it
+TYPED_FIELDS = {
+    'tao_in': float,
+    'market_cap_tao': float,
+    'price': float,
+    'emission_pct': float,
+    'price_7d_pct_change': float,
+    'price_1m_pct_change': float,
+    'subnet_name': str,
+    'github_repo': str,
+    'subnet_website': str,
+}
+
+class CacheFieldsMixin:
+    tao_in = Column(Float)
+    market_cap_tao = Column(Float)
+    price = Column(Float)
+    emission_pct = Column(Float)
+    price_7d_pct_change = Column(Float)
+    price_1m_pct_change = Column(Float)
+    subnet_name = Column(Text)
+    github_repo = Column(Text)
+    subnet_website = Column(Text)
+
+# Cache tables hold one complete generation of rows per refresh; readers follow
+# the cache_generation pointer, so a refresh in progress is never visible.
+class SubnetInfoCache(CacheFieldsMixin, Base):
     __tablename__ = 'subnet_info'
+    generation = Column(Integer, primary_key=True, default=0)
     netuid = Column(Integer, primary_key=True, index=True)
     data = Column(Text)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
-class SubnetScreenerCache(Base):
+class SubnetScreenerCache(CacheFieldsMixin, Base):
     __tablename__ = 'subnet_screener'
+    generation = Column(Integer, primary_key=True, default=0)
     netuid = Column(Integer, primary_key=True, index=True)
     data = Column(Text)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+def typed_fields(item: dict) -> dict:
+    """Pick TYPED_FIELDS out of an API dict, coercing values that don't fit to None."""
+    values = {}
+    for name, typ in TYPED_FIELDS.items():
+        value = item.get(name)
+        try:
+            values[name] = typ(value) if value is not None else None
+        except (TypeError, ValueError):
+            values[name] = None
+    return values
+
+class CacheGeneration(Base):
+    """Current generation of each cache table and when it was last confirmed fresh."""
+    __tablename__ = 'cache_generation'
+    table_name = Column(String(64), primary_key=True)
+    generation = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 # --- TAO Price History Model ---
 class TaoPriceHistory(Base):
     __tablename__ = 'tao_price_history'
@@ -36,39 +89,314 @@ class TaoPriceHistory(Base):
     source = Column(Text, default='coingecko')
     updated_at = Column(DateTime, default=datetime.utcnow)
 
-# Create tables
-Base.metadata.create_all(bind=engine, checkfirst=True)
+def _rebuild_outdated_cache_tables() -> list:
+    """
+    Rebuild cache tables created before generations, which were keyed by
+    netuid alone. Their rows are carried over unchanged as the first
+    generation, keeping their age, for _migrate_cache_rows to re-encode.
+    Returns the models whose tables were rebuilt.
+    """
+    inspector = inspect(engine)
+    rebuilt = []
+    for model in (SubnetInfoCache, SubnetScreenerCache):
+        if not inspector.has_table(model.__tablename__):
+            continue
+        columns = {col['name'] for col in inspector.get_columns(model.__tablename__)}
+        if 'generation' in columns:
+            continue
+        with engine.connect() as conn:
+            # Only columns the old schema had
+            rows = conn.execute(select(model.netuid, model.data, model.updated_at)).all()
+        model.__table__.drop(bind=engine)
+        model.__table__.create(bind=engine)
+        CacheGeneration.__table__.create(bind=engine, checkfirst=True)
+        rebuilt.append(model)
+        if not rows:
+            continue
+        updated_at = max((row.updated_at for row in rows if row.updated_at), default=datetime.min)
+        ensure_data_versions([model.__tablename__])
+        with get_db() as session:
+            session.add_all([model(generation=1, netuid=row.netuid, data=row.data, updated_at=row.updated_at)
+                             for row in rows])
+            session.merge(CacheGeneration(table_name=model.__tablename__, generation=1, updated_at=updated_at))
+            bump_data_version(session, [model.__tablename__])
+            session.commit()
+        logger.info(f"Carried {len(rows)} {model.__tablename__} rows over to the generation schema")
+    return rebuilt
+
+def _migrate_cache_rows(backfill=()):
+    """
+    Bring existing cache rows up to date with the current encoding.
+
+    Rows written as Python reprs (str(item)) are re-encoded as JSON; repr'd
+    dicts start with "{'", which JSON never does, so once every row is
+    converted this finds nothing. Tables in ``backfill`` just gained typed
+    columns, which are filled from the JSON blob.
+    """
+    with get_db() as session:
+        try:
+            for model in (SubnetInfoCache, SubnetScreenerCache):
+                legacy = session.query(model).filter(model.data.like("{'%")).all()
+                for row in legacy:
+                    row.data = json_codec.dumps(ast.literal_eval(row.data))
+                if legacy:
+                    logger.info(f"Re-encoded {len(legacy)} {model.__tablename__} rows as JSON")
+                if model in backfill:
+                    for row in session.query(model).all():
+                        for name, value in typed_fields(json_codec.loads(row.data)).items():
+                            setattr(row, name, value)
+            session.commit()
+        except (SQLAlchemyError, ValueError, SyntaxError) as e:
+            session.rollback()
+            logger.warning(f"Could not migrate cache rows: {str(e)}")
+
+def init_cache_tables():
+    """Create the cache tables and bring existing ones up to date. Called by app.models.init_db."""
+    rebuilt = _rebuild_outdated_cache_tables()
+    Base.metadata.create_all(bind=engine, checkfirst=True)
+    _migrate_cache_rows(backfill=[model for model in (SubnetInfoCache, SubnetScreenerCache)
+                                  if model in rebuilt or add_missing_columns(model.__table__, bind=engine)])
 
 HEADERS = {"X-API-Key": TAO_APP_API_KEY}
 
-def fetch_and_cache_json(endpoint: str, cache_model):
+SUBNET_INFO_ENDPOINT = '/api/beta/analytics/subnets/info'
+SUBNET_SCREENER_ENDPOINT = '/api/beta/subnet_screener'
+
+
+# Single-flight refresh: one thread per process, one process per database
+REFRESH_LEASE_TTL = 60  # seconds a refresher may hold the endpoint before others take over
+REFRESH_WAIT_SECONDS = 30  # how long background waiters poll for another process's result
+REFRESH_POLL_SECONDS = 0.5
+REFRESH_BUDGET_SECONDS = 45  # longest a background refresh waits for a request token; below REFRESH_LEASE_TTL
+
+class RefreshTimeout(TimeoutError):
+    """A web request could not refresh an endpoint in time and had no cached rows to fall back on."""
+
+_refresh_locks: Dict[str, threading.Lock] = {}
+_refresh_locks_guard = threading.Lock()
+
+def _refresh_lock(endpoint: str) -> threading.Lock:
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(endpoint, threading.Lock())
+
+# Generations older than current - KEEP_GENERATIONS + 1 are deleted after a swap;
+# the previous one is kept for readers that started before it
+KEEP_GENERATIONS = 2
+
+def query_current_generation(session, cache_model, *columns):
+    """Query the rows (or ``columns``) of the generation ``cache_model`` currently points at."""
+    return session.query(*(columns or (cache_model,))).join(
+        CacheGeneration,
+        and_(CacheGeneration.table_name == cache_model.__tablename__,
+             CacheGeneration.generation == cache_model.generation)
+    )
+
+def cache_updated_at(cache_model) -> Optional[datetime]:
+    """When the current generation of ``cache_model`` was last fetched or revalidated."""
+    with get_db() as session:
+        pointer = session.get(CacheGeneration, cache_model.__tablename__)
+        return pointer.updated_at if pointer else None
+
+def _load_fresh(session, cache_model, max_age: int = CACHE_DEFAULT_TIMEOUT) -> Optional[list]:
+    """Return the current generation if it is younger than ``max_age`` seconds, or None."""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    recent = query_current_generation(session, cache_model)\
+        .filter(CacheGeneration.updated_at > cutoff)\
+        .all()
+    if recent:
+        return [json_codec.loads(rec.data) for rec in recent]
+    return None
+
+def publish_cache_generation(session, cache_model, data: list) -> Optional[int]:
     """
-    Fetch JSON from TAO.app API and cache in SQL database for CACHE_DEFAULT_TIMEOUT seconds.
+    Write ``data`` as a new generation of ``cache_model`` and point readers at it.
+
+    The rows and the pointer move in one transaction, so readers see either the
+    old generation or the complete new one. Returns the new generation, or None
+    if a concurrent refresher published first.
     """
-    session = SessionLocal()
-    cutoff = datetime.utcnow() - timedelta(seconds=CACHE_DEFAULT_TIMEOUT)
-    # Check cache
-    recent = session.query(cache_model).filter(cache_model.updated_at > cutoff).all()
-    if recent:
-        data = [eval(rec.data) for rec in recent]
+    ensure_data_versions([cache_model.__tablename__])
+    now = datetime.utcnow()
+    generation = (session.query(func.max(cache_model.generation)).scalar() or 0) + 1
+    session.add_all([
+        cache_model(generation=generation, netuid=item['netuid'], data=json_codec.dumps(item), updated_at=now,
+                    **typed_fields(item))
+        for item in data
+    ])
+    pointer = session.get(CacheGeneration, cache_model.__tablename__)
+    if pointer is None:
+        session.add(CacheGeneration(table_name=cache_model.__tablename__, generation=generation, updated_at=now))
     else:
-        url = f"{TAO_API_BASE}{endpoint}"
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        # Refresh cache
-        session.query(cache_model).delete()
-        for item in data:
-            rec = cache_model(netuid=item['netuid'], data=str(item), updated_at=datetime.utcnow())
-            session.add(rec)
+        pointer.generation = generation
+        pointer.updated_at = now
+    bump_data_version(session, [cache_model.__tablename__])
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        logger.info(f"Another refresher published {cache_model.__tablename__} first")
+        return None
+    threading.Thread(target=_collect_old_generations, args=(cache_model, generation), daemon=True).start()
+    return generation
+
+def _collect_old_generations(cache_model, current: int):
+    """Delete generations no reader can still be looking at."""
+    with get_db() as session:
+        try:
+            deleted = session.query(cache_model)\
+                .filter(cache_model.generation <= current - KEEP_GENERATIONS)\
+                .delete(synchronize_session=False)
+            session.commit()
+            if deleted:
+                logger.debug(f"Removed {deleted} rows of old {cache_model.__tablename__} generations")
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.warning(f"Could not remove old {cache_model.__tablename__} generations: {str(e)}")
+
+def _refresh_cache(session, endpoint: str, cache_model, budget_timeout: Optional[float] = None) -> list:
+    """
+    Fetch ``endpoint`` from TAO.app and publish it as a new cache generation.
+
+    Raises:
+        RateLimitTimeout: If the request budget grants no token within ``budget_timeout`` seconds
+    """
+    url = f"{TAO_API_BASE}{endpoint}"
+    for _ in range(TAO_API_RATE_LIMIT["max_retries"] + 1):
+        tao_api_budget.acquire(budget_timeout)
+        resp = conditional_get(url, headers=HEADERS)
+        if not tao_api_budget.observe(resp):
+            break
+    resp.raise_for_status()
+    stale = query_current_generation(session, cache_model).all() if resp.not_modified else []
+    if stale:
+        # Upstream says nothing changed: keep the generation, just mark it fresh
+        session.query(CacheGeneration)\
+            .filter(CacheGeneration.table_name == cache_model.__tablename__)\
+            .update({CacheGeneration.updated_at: datetime.utcnow()})
         session.commit()
-    session.close()
+        return [json_codec.loads(rec.data) for rec in stale]
+    data = resp.json()
+    publish_cache_generation(session, cache_model, data)
     return data
 
+def _serve_stale(session, endpoint: str, cache_model, reason: str) -> list:
+    """
+    The current generation of ``cache_model``, however old, for a refresh that
+    could not finish in time.
+
+    Raises:
+        RefreshTimeout: If nothing is cached
+    """
+    session.rollback()
+    stale = query_current_generation(session, cache_model).all()
+    if not stale:
+        raise RefreshTimeout(f"No cached {endpoint} rows and {reason}")
+    logger.warning(f"Serving cached {endpoint} rows: {reason}")
+    return [json_codec.loads(rec.data) for rec in stale]
+
+def _refresh_single_flight(session, endpoint: str, cache_model, timeout: Optional[float] = None) -> list:
+    """
+    Refresh ``endpoint`` unless someone else already is, then return its rows.
+
+    Threads in this process queue on a per-endpoint lock, other processes on
+    a lease row, and everyone else reuses the rows the refresher wrote.
+
+    With ``timeout`` (web requests) waiting for the lock, for another process's
+    lease and for a request token share one deadline. Once it passes the
+    current generation is served, however old; RefreshTimeout is raised only
+    when there is nothing cached at all. Without it (background refreshes) the
+    lease wait is REFRESH_WAIT_SECONDS and the token wait REFRESH_BUDGET_SECONDS.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    lock = _refresh_lock(endpoint)
+    if not lock.acquire(timeout=-1 if timeout is None else timeout):
+        return _serve_stale(session, endpoint, cache_model, "another thread is still refreshing it")
+    try:
+        # Another thread may have refreshed while we waited for the lock
+        session.rollback()
+        data = _load_fresh(session, cache_model)
+        if data is not None:
+            return data
+        lease, holder = f"refresh:{endpoint}", holder_id()
+        wait_until = deadline if deadline is not None else time.monotonic() + REFRESH_WAIT_SECONDS
+        while not try_acquire_lease(lease, holder, REFRESH_LEASE_TTL):
+            if time.monotonic() > wait_until:
+                if deadline is not None:
+                    return _serve_stale(session, endpoint, cache_model, "another process is still refreshing it")
+                logger.warning(f"Gave up waiting for another process to refresh {endpoint}, fetching it here")
+                break
+            time.sleep(REFRESH_POLL_SECONDS)
+            session.rollback()
+            data = _load_fresh(session, cache_model)
+            if data is not None:
+                return data
+        try:
+            budget_timeout = REFRESH_BUDGET_SECONDS if deadline is None else max(deadline - time.monotonic(), 0.0)
+            return _refresh_cache(session, endpoint, cache_model, budget_timeout)
+        except RateLimitTimeout:
+            return _serve_stale(session, endpoint, cache_model, "the TAO.app request budget is exhausted")
+        finally:
+            release_lease(lease, holder)
+    finally:
+        lock.release()
+
+def _revalidate_in_background(endpoint: str, cache_model):
+    """Start a refresh thread for ``endpoint`` unless this process already runs one."""
+    if _refresh_lock(endpoint).locked():
+        return
+
+    def revalidate():
+        try:
+            with get_db() as session:
+                _refresh_single_flight(session, endpoint, cache_model)
+        except Exception as e:
+            logger.error(f"Background refresh of {endpoint} failed: {str(e)}")
+
+    threading.Thread(target=revalidate, name=f"revalidate{endpoint}", daemon=True).start()
+
+def fetch_and_cache_json(endpoint: str, cache_model):
+    """
+    Fetch JSON from TAO.app API and cache in SQL database for CACHE_DEFAULT_TIMEOUT seconds.
+
+    With CACHE_STALE_WHILE_REVALIDATE, expired rows up to CACHE_MAX_STALENESS
+    old are returned at once and refreshed in a background thread. Older or
+    missing rows are refreshed synchronously, once per endpoint across
+    threads and processes.
+    """
+    with get_db() as session:
+        data = _load_fresh(session, cache_model)
+        if data is not None:
+            return data
+        if CACHE_STALE_WHILE_REVALIDATE:
+            data = _load_fresh(session, cache_model, CACHE_MAX_STALENESS)
+            if data is not None:
+                _revalidate_in_background(endpoint, cache_model)
+                return data
+        return _refresh_single_flight(session, endpoint, cache_model, TAO_API_RATE_LIMIT["web_acquire_timeout"])
+
+def ensure_cache_fresh(endpoint: str, cache_model):
+    """
+    Refresh the cache for ``endpoint`` if it has expired, without loading its rows.
+    Follows the same stale-while-revalidate rules as fetch_and_cache_json.
+    """
+    updated_at = cache_updated_at(cache_model)
+    age = (datetime.utcnow() - updated_at).total_seconds() if updated_at else None
+    if age is not None and age < CACHE_DEFAULT_TIMEOUT:
+        return
+    if CACHE_STALE_WHILE_REVALIDATE and age is not None and age < CACHE_MAX_STALENESS:
+        _revalidate_in_background(endpoint, cache_model)
+        return
+    fetch_and_cache_json(endpoint, cache_model)
+
+def refresh_subnet_cache():
+    """Refresh the subnet info and screener caches if expired (see memoize_versioned)."""
+    ensure_cache_fresh(SUBNET_INFO_ENDPOINT, SubnetInfoCache)
+    ensure_cache_fresh(SUBNET_SCREENER_ENDPOINT, SubnetScreenerCache)
+
 def fetch_combined_subnet_data():
     """Fetch and merge subnet_info and subnet_screener data."""
-    info_list = fetch_and_cache_json('/api/beta/analytics/subnets/info', SubnetInfoCache)
-    screener_list = fetch_and_cache_json('/api/beta/subnet_screener', SubnetScreenerCache)
+    info_list = fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache)
+    screener_list = fetch_and_cache_json(SUBNET_SCREENER_ENDPOINT, SubnetScreenerCache)
     df_info = pd.DataFrame(info_list)
     df_scr = pd.DataFrame(screener_list)
     merged_df = pd.merge(df_info, df_scr, on='netuid', how='outer', suffixes=('_info', '_screener'))
@@ -94,15 +422,11 @@ def load_latest_apy_df() -> pd.DataFrame:
     with db_session as db:
         # Get the most recent record for each subnet
         latest_records = []
-        for netuid in range(1, 64):  # Assuming subnets 1-63
-            latest = db.query(SubnetAPY).filter(
-                SubnetAPY.netuid == netuid
-            ).order_by(desc(SubnetAPY.recorded_at)).first()
-            
+        for latest in SubnetAPY.latest_per_netuid(db):
             if latest:
                 record = {
                     'netuid': latest.netuid,
-                    'recorded_at': latest.recorded_at,
+                    'recorded_at': latest.last_seen_at or latest.recorded_at,
                     'apy': latest.data.get('apy'),  # Overall subnet APY
                 }
                 
@@ -146,21 +470,86 @@ def get_cached_netuids() -> List[int]:
         List[int]: Sorted list of active subnet IDs
     """
     with get_db() as db:
-        netuids = [row.netuid for row in db.query(SubnetInfoCache).all()]
+        netuids = [netuid for (netuid,) in query_current_generation(db, SubnetInfoCache, SubnetInfoCache.netuid).all()]
         return sorted(netuids)
 
+def get_last_recorded(model_class) -> Dict[int, datetime]:
+    """
+    Get when each netuid was last collected, in one grouped query.
+    An unchanged snapshot counts from its last_seen_at heartbeat.
+    
+    Returns:
+        Dict[int, datetime]: netuid -> timestamp of its most recent collection
+    """
+    with get_db() as db:
+        last_collected = func.coalesce(model_class.last_seen_at, model_class.recorded_at)
+        rows = db.query(model_class.netuid, func.max(last_collected))\
+            .group_by(model_class.netuid)\
+            .all()
+        return {netuid: recorded_at for netuid, recorded_at in rows}
+
+def discover_netuids() -> List[int]:
+    """
+    Get the registered netuids from the subnet info cache, refreshing it first if stale.
+    Falls back to whatever is cached if TAO.app cannot be reached.
+    
+    Returns:
+        List[int]: Sorted list of active subnet IDs
+    """
+    try:
+        fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache)
+    except Exception as e:
+        logger.warning(f"Could not refresh subnet list, using cached netuids: {str(e)}")
+    return get_cached_netuids()
+
+def prioritize_netuids(model_class, netuids: List[int], last_recorded: Optional[Dict[int, datetime]] = None) -> List[int]:
+    """
+    Order netuids so the limited request budget goes where it matters most.
+    
+    Subnets never collected come first, then the stalest (by the hour of their
+    last record, so one earlier run counts as one tier), and within a tier the
+    highest market cap first.
+    
+    Args:
+        model_class: Time series model whose freshness decides the order
+        netuids: Netuids to order
+        last_recorded: Result of get_last_recorded(model_class), if already loaded
+        
+    Returns:
+        List[int]: The same netuids, highest priority first
+    """
+    if last_recorded is None:
+        last_recorded = get_last_recorded(model_class)
+    try:
+        screener = load_cache_df(SubnetScreenerCache, fields=['netuid', 'market_cap_tao'])
+        market_caps = dict(zip(screener['netuid'], pd.to_numeric(screener['market_cap_tao'], errors='coerce').fillna(0)))
+    except (KeyError, ValueError, SyntaxError):
+        market_caps = {}
+
+    def priority(netuid):
+        recorded_at = last_recorded.get(netuid)
+        staleness = recorded_at.replace(minute=0, second=0, microsecond=0) if recorded_at else datetime.min
+        return (staleness, -market_caps.get(netuid, 0), netuid)
+
+    return sorted(netuids, key=priority)
+
 def load_cache_df(cache_model, fields=None, dtypes=None):
     """
     Load all rows from a cache model, parse the data column, and return a DataFrame.
     Optionally select fields and enforce dtypes.
+
+    When every requested field is a typed column (see TYPED_FIELDS) the rows
+    are read with a single SQL projection and the JSON blobs are not parsed.
     """
-    session = SessionLocal()
-    rows = session.query(cache_model).all()
-    session.close()
-    dicts = [ast.literal_eval(row.data) for row in rows]
-    df = pd.DataFrame(dicts)
-    if fields:
-        df = df[fields]
+    with get_db() as session:
+        if fields and set(fields) <= set(TYPED_FIELDS) | {'netuid'}:
+            query = query_current_generation(session, cache_model, *(getattr(cache_model, f) for f in fields))
+            df = pd.read_sql(query.statement, session.connection())
+        else:
+            rows = query_current_generation(session, cache_model).all()
+            df = pd.DataFrame([json_codec.loads(row.data) for row in rows])
+            if fields:
+                df = df[fields]
     if dtypes:
         for col, typ in dtypes.items():
             if col in df.columns:
@@ -172,8 +561,7 @@ def get_tao_price_history(days=365):
     Fetch TAO price history (daily close) for the past `days` days from the database.
     Returns a pandas DataFrame with columns: date, price_usd.
     """
-    session = SessionLocal()
-    rows = session.query(TaoPriceHistory).order_by(TaoPriceHistory.date.desc()).limit(days).all()
-    session.close()
+    with get_db() as session:
+        rows = session.query(TaoPriceHistory).order_by(TaoPriceHistory.date.desc()).limit(days).all()
     data = [{'date': r.date, 'price_usd': r.price_usd} for r in rows]
     return pd.DataFrame(data)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Wall-clock benchmark for store_all_subnet_apy: sequential batches vs. the
+concurrent thread pool, against a local stub server.
+
+    python -m benchmarks.bench_apy_collection --subnets 20 --latency 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Keep benchmark rows out of the real database
+_db_dir = tempfile.mkdtemp(prefix="bench_apy_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("TAO_API_REQUESTS_PER_MINUTE", "300")
+os.environ.setdefault("TAO_API_MAX_REQUESTS_PER_MINUTE", "300")
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from app import subnet_metrics
+from app.models import init_db
+from benchmarks.stub_server import start_stub_server
+
+def run_once(netuids: int, max_workers: int) -> float:
+    start = time.perf_counter()
+    results = subnet_metrics.store_all_subnet_apy(1, netuids, max_workers=max_workers)
+    elapsed = time.perf_counter() - start
+    assert all(results.values()), results
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subnets", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub response latency in seconds")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server, base_url = start_stub_server(args.latency)
+    subnet_metrics.TAO_API_BASE = base_url
+    init_db()
+
+    rpm = subnet_metrics.TAO_API_RATE_LIMIT["requests_per_minute"]
+    print(f"{args.subnets} subnets, stub latency {args.latency}s, limit {rpm} req/min")
+    for label, workers in (("sequential", 1), (f"concurrent x{args.workers}", args.workers)):
+        times = [run_once(args.subnets, workers) for _ in range(args.runs)]
+        per_run = ", ".join(f"{t:.2f}s" for t in times)
+        print(f"{label:>16}: {per_run} (best {min(times):.2f}s)")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Stored bytes per SubnetAPY row and load_all_validator_apy_df time for the
+full TAO.app response vs. the projected payload.
+
+    python -m benchmarks.bench_apy_projection --subnets 64 --snapshots 30
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+_db_dir = tempfile.mkdtemp(prefix="bench_projection_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from app.models import SubnetAPY, TimeSeriesWriter, get_db, init_db
+from app.subnet_metrics import load_all_validator_apy_df, project_apy_payload
+from benchmarks.stub_server import make_validators
+
+def full_payload(netuid: int) -> dict:
+    """Shape of what fetch_alpha_apy used to store."""
+    validators = make_validators(netuid)
+    return {
+        'data': validators,
+        'apy': 42.0,
+        'validator_apys': [{k: v.get(k) for k in (
+            'hotkey', 'validator_name', 'alpha_apy', 'alpha_stake', 'nominated_stake', 'vtrust'
+        )} for v in validators]
+    }
+
+def load(payloads, snapshots):
+    with get_db() as db:
+        db.query(SubnetAPY).delete()
+        db.commit()
+    now = datetime.utcnow()
+    with TimeSeriesWriter(flush_size=500) as writer:
+        for i in range(snapshots):
+            for netuid, data in payloads.items():
+                writer.add(SubnetAPY(netuid=netuid, data=data, recorded_at=now - timedelta(hours=i)))
+    start = time.perf_counter()
+    df = load_all_validator_apy_df()
+    return time.perf_counter() - start, len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subnets", type=int, default=64)
+    parser.add_argument("--snapshots", type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    init_db()
+
+    full = {n: full_payload(n) for n in range(args.subnets)}
+    projected = {n: project_apy_payload(p) for n, p in full.items()}
+    print(f"{args.subnets} subnets x {args.snapshots} snapshots, 64 validators each")
+    for label, payloads in (("full response", full), ("projected", projected)):
+        size = sum(len(json.dumps(p)) for p in payloads.values()) / len(payloads)
+        elapsed, rows = load(payloads, args.snapshots)
+        print(f"{label:>14}: {size / 1024:6.1f} KiB/row, load_all_validator_apy_df {elapsed:.2f}s ({rows} rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Parse time of the subnet info/screener cache with str()/eval/literal_eval
+rows vs. JSON rows: load_cache_df and fetch_combined_subnet_data (warm cache),
+plus load_cache_df of the load_emission_data fields from typed columns.
+
+    python -m benchmarks.bench_cache_codec --subnets 128 --repeat 20
+"""
+import argparse
+import ast
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+_db_dir = tempfile.mkdtemp(prefix="bench_codec_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from app import json_codec, utils
+from app.models import init_db
+from app.database import SessionLocal
+from app.utils import (SubnetInfoCache, SubnetScreenerCache, fetch_combined_subnet_data,
+                       load_cache_df, publish_cache_generation)
+
+def make_rows(count: int, fields: int, seed: int) -> list:
+    """Rows shaped like the TAO.app info/screener responses: mostly numbers, some strings."""
+    rng = random.Random(seed)
+    rows = []
+    for netuid in range(count):
+        row = {'netuid': netuid, 'subnet_name': f"Subnet {netuid}", 'github_repo': f"https://github.com/example/sn{netuid}",
+               'market_cap_tao': rng.uniform(0, 1e6), 'price': rng.uniform(0, 1), 'emission_pct': rng.uniform(0, 5)}
+        for i in range(fields):
+            row[f"metric_{i}"] = round(rng.uniform(0, 1e6), 6) if i % 5 else None
+        rows.append(row)
+    return rows
+
+CODECS = {
+    "str/eval": (SimpleNamespace(dumps=repr, loads=eval), ast.literal_eval),
+    "json": (json_codec, json_codec.loads),
+}
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subnets", type=int, default=128)
+    parser.add_argument("--fields", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    init_db()
+
+    info = make_rows(args.subnets, args.fields, 1)
+    screener = make_rows(args.subnets, args.fields, 2)
+    backend = "orjson" if json_codec.orjson is not None else "json"
+    print(f"{args.subnets} subnets x {args.fields} fields, JSON backend: {backend}")
+    for label, (codec, cache_df_loads) in CODECS.items():
+        utils.json_codec = codec
+        session = SessionLocal()
+        publish_cache_generation(session, SubnetInfoCache, info)
+        publish_cache_generation(session, SubnetScreenerCache, screener)
+        session.close()
+        fetch_time = best_of(fetch_combined_subnet_data, args.repeat)
+        utils.json_codec = SimpleNamespace(dumps=codec.dumps, loads=cache_df_loads)
+        load_time = best_of(lambda: load_cache_df(SubnetScreenerCache), args.repeat)
+        print(f"{label:>9}: load_cache_df {load_time * 1000:6.1f} ms, "
+              f"fetch_combined_subnet_data {fetch_time * 1000:6.1f} ms")
+    utils.json_codec = json_codec
+    fields = ['netuid', 'subnet_name', 'market_cap_tao', 'price', 'emission_pct']
+    parsed_time = best_of(lambda: load_cache_df(SubnetScreenerCache)[fields], args.repeat)
+    typed_time = best_of(lambda: load_cache_df(SubnetScreenerCache, fields=fields), args.repeat)
+    print(f"emission fields: parsed from JSON {parsed_time * 1000:6.1f} ms, typed columns {typed_time * 1000:6.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Serialize/deserialize time and size of memoized DataFrames with pickle vs.
+the columnar cache serializer (forced on regardless of CACHE_COLUMNAR_MIN_CELLS).
+
+    python -m benchmarks.bench_cache_serializer --repeat 20
+"""
+import argparse
+import io
+import pickle
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.cache_backend import ColumnarSerializer
+
+def merged_subnet_frame(subnets: int, columns: int) -> pd.DataFrame:
+    """Wide frame like fetch_combined_subnet_data + compute_basic_subnet_score."""
+    rng = np.random.default_rng(1)
+    data = {'netuid': np.arange(subnets)}
+    for i in range(columns):
+        if i % 8 == 0:
+            data[f"text_{i}"] = [f"subnet {n} value {i}" if n % 7 else None for n in range(subnets)]
+        else:
+            data[f"metric_{i}"] = rng.random(subnets) * 1e6
+    return pd.DataFrame(data)
+
+def validator_frame(rows: int) -> pd.DataFrame:
+    """Long frame like load_all_validator_apy_df."""
+    rng = np.random.default_rng(2)
+    return pd.DataFrame({
+        'netuid': rng.integers(0, 128, rows),
+        'recorded_at': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30 * 86400, rows), unit='s'),
+        'hotkey': [f"5Hotkey{i % 5000:06d}" for i in range(rows)],
+        'alpha_apy': rng.random(rows) * 150,
+        'alpha_stake': rng.random(rows) * 1e6,
+    })
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def measure(serializer, df, repeat):
+    buffer = io.BytesIO()
+    serializer.dump(df, buffer)
+    payload = buffer.getvalue()
+    dump_time = best_of(lambda: serializer.dump(df, io.BytesIO()), repeat)
+    load_time = best_of(lambda: serializer.load(io.BytesIO(payload)), repeat)
+    return dump_time, load_time, len(payload)
+
+class PickleSerializer:
+    def dump(self, value, f):
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, f):
+        return pickle.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    frames = {
+        "merged 128x120": merged_subnet_frame(128, 120),
+        "validators 250k": validator_frame(250_000),
+    }
+    for name, df in frames.items():
+        for label, serializer in (("pickle", PickleSerializer()), ("columnar", ColumnarSerializer(min_cells=0))):
+            dump_time, load_time, size = measure(serializer, df, args.repeat)
+            print(f"{name:>16} {label:>8}: dump {dump_time * 1000:7.2f} ms, load {load_time * 1000:7.2f} ms, "
+                  f"{size / 1024:8.1f} KiB")
+
+if __name__ == "__main__":
+    main()
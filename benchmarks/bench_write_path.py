@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Rows-per-second for SubnetAPY writes: one session and commit per row (the
+old store_alpha_apy path) vs. TimeSeriesWriter multi-row INSERTs.
+
+    python -m benchmarks.bench_write_path --rows 1000 --flush-sizes 10,100,500
+
+Uses a throwaway SQLite file unless DATABASE_URL is set to something else.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+if "DATABASE_URL" not in os.environ:
+    _db_dir = tempfile.mkdtemp(prefix="bench_write_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import logging
+from app.models import SubnetAPY, TimeSeriesWriter, get_db, init_db
+from benchmarks.stub_server import make_validators
+
+def payload(netuid: int) -> dict:
+    validators = make_validators(netuid)
+    return {'data': validators, 'apy': 42.0, 'validator_apys': validators}
+
+def per_row_commit(rows):
+    for netuid, data in rows:
+        with get_db() as db:
+            db.add(SubnetAPY(netuid=netuid, data=data, recorded_at=datetime.utcnow()))
+            db.commit()
+
+def buffered(rows, flush_size):
+    with TimeSeriesWriter(flush_size=flush_size) as writer:
+        for netuid, data in rows:
+            writer.add(SubnetAPY(netuid=netuid, data=data, recorded_at=datetime.utcnow()))
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--flush-sizes", default="10,100,500")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    init_db()
+    rows = [(i % 128, payload(i % 128)) for i in range(args.rows)]
+
+    print(f"{args.rows} SubnetAPY rows on {os.environ['DATABASE_URL'].split(':')[0]}")
+    elapsed = timed(per_row_commit, rows)
+    print(f"{'commit per row':>18}: {args.rows / elapsed:8.0f} rows/s ({elapsed:.2f}s)")
+    for size in (int(s) for s in args.flush_sizes.split(",")):
+        elapsed = timed(buffered, rows, size)
+        print(f"{f'flush_size={size}':>18}: {args.rows / elapsed:8.0f} rows/s ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    main()
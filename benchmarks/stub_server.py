@@ -0,0 +1,55 @@
+"""
+Minimal local stand-in for the TAO.app API used by the benchmarks.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+def make_validators(netuid: int, count: int = 64) -> list:
+    """Build a validator list shaped like /api/beta/apy/alpha."""
+    rng = random.Random(netuid)
+    return [{
+        'hotkey': f"5Hotkey{netuid:03d}{i:03d}",
+        'validator_name': f"Validator {i}",
+        'alpha_apy': round(rng.uniform(0, 150), 4),
+        'alpha_stake': round(rng.uniform(0, 1e6), 4),
+        'nominated_stake': round(rng.uniform(0, 1e5), 4),
+        'vtrust': round(rng.uniform(0, 1), 6),
+        'take': 0.18,
+        'coldkey': f"5Coldkey{netuid:03d}{i:03d}",
+        'registered_at_block': rng.randint(1, 5_000_000),
+        'emission': round(rng.uniform(0, 10), 6),
+    } for i in range(count)]
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        time.sleep(self.latency)
+        if parsed.path == "/api/beta/apy/alpha":
+            netuid = int(parse_qs(parsed.query).get("netuid", ["0"])[0])
+            body = {"data": make_validators(netuid)}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(latency: float = 0.3):
+    """Start the stub server on a free port. Returns (server, base_url)."""
+    handler = type("Handler", (StubHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
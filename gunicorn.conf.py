@@ -0,0 +1,9 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn wsgi:app` (Procfile: web).
+"""
+
+def post_fork(server, worker):
+    # Connections opened before the fork (e.g. by --preload) belong to the
+    # master; each worker starts its own pool instead of sharing those sockets
+    from app.database import dispose_engine
+    dispose_engine()
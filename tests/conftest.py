@@ -0,0 +1,17 @@
+"""
+Point the app at throwaway storage before any test imports it.
+
+app.config reads DATABASE_URL and CACHE_DIR at import time, so these must be
+set here rather than in fixtures; tests never touch the developer's
+tao_cache.db or ./cache.
+"""
+import os
+import shutil
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="tao_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["CACHE_DIR"] = os.path.join(_tmp_dir, "cache")
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
@@ -0,0 +1,75 @@
+import os
+import pickle
+import pytest
+import pandas as pd
+from flask import Flask
+from flask_caching import Cache
+from app.cache_backend import LRUMemoryTier, estimate_size
+
+def make_cache(directory):
+    app = Flask(__name__)
+    cache = Cache(app, config={
+        "CACHE_TYPE": "app.cache_backend.TwoTierCache",
+        "CACHE_DIR": str(directory),
+        "CACHE_DEFAULT_TIMEOUT": 600,
+    })
+    return app, cache
+
+def test_two_tier_serves_repeat_hits_from_memory(tmp_path):
+    app, cache = make_cache(tmp_path)
+    calls = []
+
+    @cache.memoize(timeout=600)
+    def frame(n):
+        calls.append(n)
+        return pd.DataFrame({"netuid": range(n)})
+
+    with app.app_context():
+        frame(5)
+        before = cache.cache.stats()
+        assert frame(5).equals(pd.DataFrame({"netuid": range(5)}))
+        after = cache.cache.stats()
+        keys = list(cache.cache.local._entries)
+    assert calls == [5]
+    assert after["local"]["hits"] > before["local"]["hits"]
+    assert after["shared"]["hits"] == before["shared"]["hits"]
+
+    # Another worker sharing the directory finds it on disk, then in memory
+    other_app, other = make_cache(tmp_path)
+    with other_app.app_context():
+        for key in keys:
+            assert other.cache.get(key) is not None
+            assert other.cache.get(key) is not None
+        stats = other.cache.stats()
+    assert stats["shared"]["hits"] == len(keys)
+    assert stats["local"]["hits"] == len(keys)
+
+def test_lru_tier_evicts_least_recently_used_by_size():
+    big = "x" * 1000
+    tier = LRUMemoryTier(max_bytes=estimate_size(big) * 2 + 10, default_timeout=60)
+    tier.set("a", big)
+    tier.set("b", big)
+    assert tier.get("a")[0]  # touch a, so b is now least recently used
+    tier.set("c", big)
+    assert tier.get("a")[0] and tier.get("c")[0]
+    assert not tier.get("b")[0]
+    assert tier.size <= tier.max_bytes
+
+def test_snapshot_and_http_dirs_stay_out_of_the_cache_dir():
+    """The filesystem backend owns every entry of CACHE_DIR; subdirectories break its clear() and pruning."""
+    from app import config
+    cache_dir = os.path.abspath(config.CACHE_DIR)
+    for directory in (config.SNAPSHOT_DIR, config.HTTP_CACHE_DIR):
+        assert not os.path.abspath(directory).startswith(cache_dir + os.sep)
+
+def test_promotion_reuses_the_bytes_read_from_the_shared_tier(tmp_path, monkeypatch):
+    """A value promoted from disk is sized by the bytes read, not serialized a second time."""
+    import app.cache_backend as cache_backend
+    app, cache = make_cache(tmp_path)
+    value = {"rows": list(range(1000))}
+    with app.app_context():
+        cache.set("k", value)
+        cache.cache.local.clear()
+        monkeypatch.setattr(cache_backend, "estimate_size", lambda value: pytest.fail("serialized again"))
+        assert cache.get("k") == value
+        assert cache.cache.stats()["local"]["bytes"] == len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
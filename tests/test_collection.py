@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from app.models import SubnetAPY, get_db, init_db
+from app.utils import prioritize_netuids, get_last_recorded
+
+TEST_NETUIDS = [9001, 9002, 9003]
+
+def _clear(db):
+    db.query(SubnetAPY).filter(SubnetAPY.netuid.in_(TEST_NETUIDS)).delete(synchronize_session=False)
+    db.commit()
+
+def test_prioritize_netuids_puts_missing_and_stalest_first():
+    init_db()
+    now = datetime.utcnow()
+    with get_db() as db:
+        _clear(db)
+        db.add_all([
+            SubnetAPY(netuid=9001, data={}, recorded_at=now - timedelta(hours=1)),
+            SubnetAPY(netuid=9002, data={}, recorded_at=now - timedelta(days=2)),
+            SubnetAPY(netuid=9002, data={}, recorded_at=now - timedelta(days=3)),
+        ])
+        db.commit()
+    try:
+        last = get_last_recorded(SubnetAPY)
+        assert last[9002] > now - timedelta(days=2, minutes=1)
+        assert 9003 not in last
+        assert prioritize_netuids(SubnetAPY, TEST_NETUIDS) == [9003, 9002, 9001]
+    finally:
+        with get_db() as db:
+            _clear(db)
+
+def test_journaled_run_resumes_only_missing(monkeypatch):
+    import uuid
+    from app import subnet_metrics
+    from app.journal import get_run_status
+
+    calls, outage = [], {9002}
+    def fake_fetch(netuid):
+        calls.append(netuid)
+        if netuid in outage:
+            outage.discard(netuid)
+            raise RuntimeError("upstream outage")
+        return [SubnetAPY(netuid=netuid, data={'apy': 1.0, 'validator_apys': []})]
+    monkeypatch.setattr(subnet_metrics, "build_apy_records", fake_fetch)
+    run_id = f"test:{uuid.uuid4().hex[:8]}"
+
+    first = subnet_metrics.store_all_subnet_apy(netuids=TEST_NETUIDS, run_id=run_id, max_workers=2)
+    assert first == {9001: True, 9002: False, 9003: True}
+
+    # The plan comes from the journal: only the failed netuid is fetched again
+    calls.clear()
+    second = subnet_metrics.store_all_subnet_apy(run_id=run_id, max_workers=1)
+    assert calls == [9002]
+    assert second == {9001: True, 9002: True, 9003: True}
+
+    calls.clear()
+    subnet_metrics.store_all_subnet_apy(run_id=run_id)
+    assert calls == []
+    assert set(get_run_status(run_id).values()) == {"ok"}
+
+    with get_db() as db:
+        assert db.query(SubnetAPY).filter(SubnetAPY.netuid.in_(TEST_NETUIDS)).count() == 3
+        _clear(db)
+
+def test_project_apy_payload_drops_raw_validator_list():
+    from app.subnet_metrics import project_apy_payload
+    raw = {
+        'data': [{'hotkey': 'hk', 'alpha_apy': 12.5, 'coldkey': 'ck', 'take': 0.18}],
+        'apy': 12.5,
+        'validator_apys': [{'hotkey': 'hk', 'validator_name': 'v', 'alpha_apy': 12.5,
+                            'alpha_stake': 1.0, 'nominated_stake': 2.0, 'vtrust': 0.9, 'coldkey': 'ck'}],
+    }
+    assert project_apy_payload(raw) == {
+        'apy': 12.5,
+        'validator_apys': [{'hotkey': 'hk', 'validator_name': 'v', 'alpha_apy': 12.5,
+                            'alpha_stake': 1.0, 'nominated_stake': 2.0, 'vtrust': 0.9}],
+    }
+
+def test_writer_deduplicates_unchanged_snapshots():
+    from app.models import TimeSeriesWriter
+    init_db()
+    now = datetime.utcnow()
+    validators = [{'hotkey': 'a', 'alpha_apy': 1.0}, {'hotkey': 'b', 'alpha_apy': 2.0}]
+    with get_db() as db:
+        _clear(db)
+    try:
+        with TimeSeriesWriter(flush_size=1) as writer:
+            writer.add(SubnetAPY(netuid=9001, recorded_at=now - timedelta(hours=2),
+                                 data={'apy': 1.5, 'validator_apys': validators}))
+            # Same validators in a different order: a heartbeat, not a new row
+            writer.add(SubnetAPY(netuid=9001, recorded_at=now - timedelta(hours=1),
+                                 data={'apy': 1.5, 'validator_apys': validators[::-1]}))
+            writer.add(SubnetAPY(netuid=9001, recorded_at=now,
+                                 data={'apy': 2.0, 'validator_apys': validators[:1]}))
+        assert (writer.rows_written, writer.rows_unchanged) == (2, 1)
+        with get_db() as db:
+            rows = db.query(SubnetAPY).filter(SubnetAPY.netuid == 9001).order_by(SubnetAPY.recorded_at).all()
+            assert len(rows) == 2
+            assert rows[0].last_seen_at == now - timedelta(hours=1)
+            assert rows[1].last_seen_at is None
+        assert get_last_recorded(SubnetAPY)[9001] == now
+    finally:
+        with get_db() as db:
+            _clear(db)
+
+def test_warmup_reports_stored_only_after_the_final_flush(monkeypatch, capsys):
+    import uuid
+    from app.journal import get_run_status
+    from app.models import TimeSeriesWriter
+    from app.scripts import warmup_base
+
+    init_db()
+    with get_db() as db:
+        _clear(db)
+    monkeypatch.setattr(warmup_base, "get_cached_netuids", lambda: TEST_NETUIDS[:2])
+
+    def failing_write(self, db, model_class, rows):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(TimeSeriesWriter, "_write", failing_write)
+    run_id = f"test:{uuid.uuid4().hex[:8]}"
+
+    results = warmup_base.run_warmup(lambda netuid: {'apy': 1.0}, SubnetAPY, name="apy", sleep_sec=0, run_id=run_id)
+    assert results == {9001: False, 9002: False}
+    assert "Stored" not in capsys.readouterr().out
+    assert set(get_run_status(run_id).values()) == {"failed"}
+
+    monkeypatch.undo()
+    monkeypatch.setattr(warmup_base, "get_cached_netuids", lambda: TEST_NETUIDS[:2])
+    try:
+        assert warmup_base.run_warmup(lambda netuid: {'apy': 1.0}, SubnetAPY, name="apy", sleep_sec=0,
+                                      run_id=run_id) == {9001: True, 9002: True}
+        assert "Stored for netuid=9001" in capsys.readouterr().out
+        assert set(get_run_status(run_id).values()) == {"ok"}
+    finally:
+        with get_db() as db:
+            _clear(db)
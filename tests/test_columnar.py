@@ -0,0 +1,52 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app.cache_backend import ColumnarSerializer
+from app.columnar import UnsupportedFrame, dumps_frame, is_columnar, loads_frame
+
+def sample_frame():
+    return pd.DataFrame({
+        'netuid': np.arange(4),
+        'subnet_name': ['apex', None, np.nan, 'apex'],
+        'market_cap_tao': [1.5, np.nan, 3.0, 4.0],
+        'recorded_at': pd.date_range('2024-01-01', periods=4),
+        'has_github': [True, False, True, True],
+        7: np.arange(4, dtype=np.int32),
+    })
+
+def test_roundtrip_preserves_dtypes_and_missing_values():
+    df = sample_frame()
+    pd.testing.assert_frame_equal(loads_frame(dumps_frame(df)), df)
+    indexed = df.set_index('subnet_name')
+    pd.testing.assert_frame_equal(loads_frame(dumps_frame(indexed)), indexed)
+    assert loads_frame(dumps_frame(df))['subnet_name'].tolist()[1:3] == [None, pytest.approx(np.nan, nan_ok=True)]
+
+def test_numeric_blocks_are_views_without_copy():
+    df = pd.DataFrame({'a': np.arange(1000.0), 'b': np.ones(1000)})
+    payload = dumps_frame(df)
+    view = loads_frame(payload, copy=False)
+    assert not view['a'].to_numpy().flags.writeable
+    pd.testing.assert_frame_equal(view, df)
+
+def test_unsupported_frames_fall_back_to_pickle():
+    nested = pd.DataFrame({'validators': [[{'hotkey': 'a'}], []]})
+    with pytest.raises(UnsupportedFrame):
+        dumps_frame(nested)
+    serializer = ColumnarSerializer(min_cells=0)
+    for value in (nested, {'not': 'a frame'}, sample_frame()):
+        buffer = io.BytesIO()
+        serializer.dump(value, buffer)
+        assert is_columnar(buffer.getvalue()) == (value is not nested and isinstance(value, pd.DataFrame))
+        loaded = serializer.load(io.BytesIO(buffer.getvalue()))
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(loaded, value)
+        else:
+            assert loaded == value
+
+def test_mixed_frames_keep_numeric_views_in_column_order():
+    df = sample_frame()
+    view = loads_frame(dumps_frame(df), copy=False)
+    pd.testing.assert_frame_equal(view, df)
+    for name in ('netuid', 'market_cap_tao', 'recorded_at', 'has_github', 7):
+        assert not view[name].values.flags.writeable
@@ -0,0 +1,53 @@
+from flask import Flask
+from flask_caching import Cache
+from app.data_version import current_versions, memoize_versioned
+from app.models import SubnetAPY, TimeSeriesWriter, ValidatorAPYSnapshot, get_db, init_db
+
+NETUID = 9101
+
+def _clear():
+    with get_db() as db:
+        db.query(SubnetAPY).filter(SubnetAPY.netuid == NETUID).delete(synchronize_session=False)
+        db.commit()
+
+def test_heartbeats_bump_the_table_but_not_its_validator_facts():
+    init_db()
+    _clear()
+    tables = (SubnetAPY.__tablename__, ValidatorAPYSnapshot.__tablename__)
+    try:
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data={"apy": 1.0}))
+        table, facts = current_versions(*tables)
+        # Unchanged data moves last_seen_at ("Last Updated") only
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data={"apy": 1.0}))
+        assert current_versions(*tables) == (table + 1, facts)
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data={"apy": 2.0}))
+        assert current_versions(*tables) == (table + 2, facts + 1)
+    finally:
+        _clear()
+
+def test_memoize_versioned_recomputes_once_per_change():
+    init_db()
+    _clear()
+    app = Flask(__name__)
+    cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"})
+    calls = []
+
+    @memoize_versioned(cache, SubnetAPY.__tablename__)
+    def derived(metric):
+        calls.append(metric)
+        return len(calls)
+
+    try:
+        with app.app_context():
+            first = derived("apy")
+            assert derived("apy") == first
+            with TimeSeriesWriter() as writer:
+                writer.add(SubnetAPY(netuid=NETUID, data={"apy": len(calls) + 10.0}))
+            assert derived("apy") == first + 1
+            assert derived("apy") == first + 1
+        assert calls == ["apy", "apy"]
+    finally:
+        _clear()
@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from app import database
+from app.database import create_db_engine, pool_stats, request_session
+from app.models import get_db
+
+def test_sqlite_engine_settings(tmp_path):
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'settings.db'}", {"sqlite_busy_timeout_ms": 1234})
+    with db_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert db_engine.pool.size() == 5
+    db_engine.dispose()
+
+def test_checkouts_are_counted(tmp_path):
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    for _ in range(3):
+        with db_engine.connect() as conn:
+            assert pool_stats(db_engine)["checked_out"] == 1
+            conn.execute(text("SELECT 1"))
+    stats = pool_stats(db_engine)
+    assert (stats["checkouts"], stats["checked_out"], stats["connects"]) == (3, 0, 1)
+    db_engine.dispose()
+
+def test_request_scoped_session_is_removed_at_teardown():
+    app = Flask(__name__)
+    database.init_app(app)
+    with app.app_context():
+        with get_db() as outer:
+            assert outer is request_session()
+            with get_db() as nested:
+                assert nested is not outer
+        with get_db() as again:
+            assert again is outer
+        assert request_session.registry.has()
+    assert not request_session.registry.has()
+    with get_db() as standalone:
+        assert not request_session.registry.has()
+        assert standalone is not outer
+
+def test_session_rolled_back_on_error():
+    with pytest.raises(RuntimeError):
+        with get_db() as db:
+            db.execute(text("SELECT 1"))
+            assert db.in_transaction()
+            raise RuntimeError("boom")
+    assert not db.in_transaction()
@@ -0,0 +1,33 @@
+import requests
+from app.http_cache import conditional_get, http_cache
+
+def make_response(status, body=b'', headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body
+    resp.headers.update(headers or {})
+    resp.encoding = 'utf-8'
+    return resp
+
+def test_conditional_get_revalidates_with_etag(tmp_path, monkeypatch):
+    """A second GET sends the stored validators and a 304 reuses the cached body."""
+    monkeypatch.setattr(http_cache, 'directory', str(tmp_path))
+    sent = []
+
+    def getter(url, params=None, headers=None, timeout=None):
+        sent.append(dict(headers))
+        if headers.get('If-None-Match') == '"v1"':
+            return make_response(304)
+        return make_response(200, b'[{"netuid": 1}]', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+    url = 'https://example.test/api/info'
+    first = conditional_get(url, getter=getter)
+    second = conditional_get(url, getter=getter)
+
+    assert not first.not_modified
+    assert second.not_modified
+    assert second.json() == [{"netuid": 1}]
+    assert 'If-None-Match' not in sent[0]
+    assert sent[1]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    stats = http_cache.stats()['/api/info']
+    assert stats['hits'] >= 1 and stats['misses'] >= 1
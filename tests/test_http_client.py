@@ -0,0 +1,26 @@
+import time
+import pytest
+import requests
+from app import http_client
+from benchmarks.stub_server import start_stub_server
+
+def test_hung_upstream_times_out():
+    """A slow upstream raises after the read timeout instead of stalling the caller."""
+    server, base_url = start_stub_server(latency=2.0)
+    try:
+        start = time.monotonic()
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            http_client.get(f"{base_url}/api/beta/apy/alpha", params={"netuid": 1}, timeout=(1, 0.2))
+        assert time.monotonic() - start < 1.5
+    finally:
+        server.shutdown()
+
+def test_stats_count_requests_and_bytes():
+    server, base_url = start_stub_server(latency=0)
+    try:
+        http_client.get(f"{base_url}/api/beta/apy/alpha", params={"netuid": 2})
+    finally:
+        server.shutdown()
+    entry = http_client.stats()[f"{base_url.split('://')[1]}/api/beta/apy/alpha"]
+    assert entry["requests"] >= 1
+    assert entry["bytes"] > 0
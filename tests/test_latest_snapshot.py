@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from app.models import SubnetAPY, engine, get_db, init_db
+
+NETUIDS = (9201, 9202)
+
+def _clear():
+    with get_db() as db:
+        db.query(SubnetAPY).filter(SubnetAPY.netuid.in_(NETUIDS)).delete(synchronize_session=False)
+        db.commit()
+
+def test_latest_per_netuid_returns_newest_row_only():
+    init_db()
+    _clear()
+    now = datetime.utcnow()
+    try:
+        with get_db() as db:
+            for netuid in NETUIDS:
+                for hours in range(5):
+                    db.add(SubnetAPY(netuid=netuid, data={"age": hours}, recorded_at=now - timedelta(hours=hours)))
+            # Same timestamp as the newest row: the later insert wins
+            db.add(SubnetAPY(netuid=NETUIDS[1], data={"age": -1}, recorded_at=now))
+            db.commit()
+            latest = SubnetAPY.latest_per_netuid(db, NETUIDS)
+            assert [(row.netuid, row.data["age"]) for row in latest] == [(NETUIDS[0], 0), (NETUIDS[1], -1)]
+            assert SubnetAPY.latest_per_netuid(db, [NETUIDS[0]])[0].netuid == NETUIDS[0]
+    finally:
+        _clear()
+
+def test_init_db_adds_netuid_recorded_at_index():
+    init_db()
+    indexes = {index["name"] for index in inspect(engine).get_indexes(SubnetAPY.__tablename__)}
+    assert "ix_subnet_apy_netuid_recorded_at" in indexes
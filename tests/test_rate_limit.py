@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+import pytest
+from app.rate_limit import TokenBucket, SharedTokenBucket, AdaptiveTokenBucket, RateLimitTimeout, parse_retry_after
+from app.models import ApiRequestBudget, get_db
+
+def test_token_bucket_is_shared_across_threads():
+    """Concurrent callers together never exceed the configured rate."""
+    bucket = TokenBucket(requests_per_minute=600, burst=1)  # 10 requests/second
+    acquired = []
+
+    def worker():
+        for _ in range(3):
+            bucket.acquire()
+            acquired.append(time.monotonic())
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(acquired) == 9
+    # First token is free (burst), the remaining 8 need 0.1s each
+    assert time.monotonic() - start >= 0.8
+
+def test_shared_bucket_limits_separate_instances():
+    """Two buckets with the same name (e.g. two processes) draw from one budget."""
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    web = SharedTokenBucket(name, requests_per_minute=600, burst=1)
+    collector = SharedTokenBucket(name, requests_per_minute=600, burst=1)
+
+    start = time.monotonic()
+    for _ in range(3):
+        web.acquire()
+        collector.acquire()
+
+    # 6 tokens from one 10/s bucket: the first is free, the rest take 0.1s each
+    assert time.monotonic() - start >= 0.5
+    assert web.try_acquire() > 0
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def _stored_rpm(name):
+    with get_db() as db:
+        return db.get(ApiRequestBudget, name).rate_per_sec * 60
+
+def test_adaptive_bucket_aimd_and_retry_after():
+    """Successes raise the rate, a 429 halves it and pauses for Retry-After."""
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    bucket = AdaptiveTokenBucket(name, requests_per_minute=60, increase_per_success=6, decrease_factor=0.5)
+    bucket.acquire()
+
+    for _ in range(4):
+        assert bucket.observe(FakeResponse(200)) is False
+    # Client errors are not successes
+    assert bucket.observe(FakeResponse(404)) is False
+    # Successes cost no write of their own: the increase rides on the next token
+    assert abs(_stored_rpm(name) - 60) < 1e-6
+    bucket.acquire()
+    assert abs(_stored_rpm(name) - 84) < 1e-6
+
+    assert bucket.observe(FakeResponse(429, {"Retry-After": "2"})) is True
+    assert abs(_stored_rpm(name) - 42) < 1e-6
+    assert 1.5 < bucket.try_acquire() <= 2
+
+    # A second throttle inside the cooldown does not halve again
+    bucket.observe(FakeResponse(503))
+    assert abs(_stored_rpm(name) - 42) < 1e-6
+
+    # The next run starts from the learned rate, not the configured default
+    AdaptiveTokenBucket(name, requests_per_minute=60).try_acquire()
+    assert abs(_stored_rpm(name) - 42) < 1e-6
+
+def test_retry_after_pause_is_capped_and_acquire_can_time_out():
+    """A long Retry-After blocks everyone for at most max_pause; callers with a timeout give up early."""
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    bucket = AdaptiveTokenBucket(name, requests_per_minute=60, max_pause=3)
+    bucket.acquire()
+    bucket.observe(FakeResponse(429, {"Retry-After": "120"}))
+    assert 2 < bucket.try_acquire() <= 3
+
+    start = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(timeout=0.2)
+    assert time.monotonic() - start < 0.5
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
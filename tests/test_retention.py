@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from app import models
+from app.models import SubnetAPY, ValidatorAPYSnapshot, get_db, init_db
+from app.retention import delete_in_chunks, orphaned_snapshot_ids_query
+from app.scheduler import build_maintenance_jobs
+
+NETUID = 9401
+
+def _clear():
+    with get_db() as db:
+        for model in (SubnetAPY, ValidatorAPYSnapshot):
+            db.query(model).filter(model.netuid == NETUID).delete(synchronize_session=False)
+        db.commit()
+
+def _seed(now):
+    with get_db() as db:
+        for hours in range(6):
+            db.add(SubnetAPY(netuid=NETUID, data={"age": hours}, recorded_at=now - timedelta(hours=hours)))
+        # Old, but confirmed by a recent identical collection
+        db.add(SubnetAPY(netuid=NETUID, data={"age": "seen"}, recorded_at=now - timedelta(days=90), last_seen_at=now))
+        db.add(SubnetAPY(netuid=NETUID, data={"age": "old"}, recorded_at=now - timedelta(days=60)))
+        db.commit()
+
+def _ages():
+    with get_db() as db:
+        return sorted(str(r.data["age"]) for r in db.query(SubnetAPY).filter(SubnetAPY.netuid == NETUID))
+
+def test_expired_ids_cover_age_and_row_count(monkeypatch):
+    init_db()
+    _clear()
+    monkeypatch.setattr(models, "MAX_ROWS_PER_NETUID", 4)
+    try:
+        _seed(datetime.utcnow())
+        with get_db() as db:
+            ids = db.execute(SubnetAPY.expired_ids_query(NETUID)).scalars().all()
+        assert delete_in_chunks(SubnetAPY, ids, chunk_size=1) == 4
+        # Newest four by recorded_at survive; the 90-day-old row only by count, so it goes
+        assert _ages() == ["0", "1", "2", "3"]
+    finally:
+        _clear()
+
+def test_purge_old_records_keeps_recently_seen_snapshots(monkeypatch):
+    init_db()
+    _clear()
+    monkeypatch.setattr(models, "MAX_ROWS_PER_NETUID", 100)
+    try:
+        _seed(datetime.utcnow())
+        with get_db() as db:
+            assert SubnetAPY.purge_old_records(db, NETUID) == 1
+        assert "old" not in _ages() and "seen" in _ages()
+    finally:
+        _clear()
+
+def test_orphaned_validator_rows_are_found():
+    init_db()
+    _clear()
+    try:
+        with get_db() as db:
+            db.add(ValidatorAPYSnapshot(netuid=NETUID, hotkey="5A", recorded_at=datetime(2020, 1, 1)))
+            db.commit()
+            orphans = db.execute(orphaned_snapshot_ids_query(SubnetAPY).where(ValidatorAPYSnapshot.netuid == NETUID)).scalars().all()
+        assert len(orphans) == 1
+    finally:
+        _clear()
+
+def test_retention_job_is_registered():
+    jobs = build_maintenance_jobs()
+    assert jobs["retention"].interval == 86400
+    assert jobs["retention"].model_class is None
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models import SubnetAPY, SubnetAPYDaily, SubnetAPYHourly, TimeSeriesWriter, ValidatorAPYSnapshot, get_db, init_db
+from app.rollups import load_apy_rollups, run_rollups
+
+NETUID = 9501
+DAY_START = datetime(2024, 3, 1)
+
+def _clear():
+    with get_db() as db:
+        for model in (SubnetAPY, ValidatorAPYSnapshot, SubnetAPYHourly, SubnetAPYDaily):
+            db.query(model).filter(model.netuid == NETUID).delete(synchronize_session=False)
+        db.commit()
+
+def _payload(apys):
+    return {"apy": sum(apys) / len(apys), "validator_apys": [
+        {"hotkey": f"5{i}", "alpha_apy": apy, "alpha_stake": 10, "nominated_stake": 1} for i, apy in enumerate(apys)
+    ]}
+
+@pytest.fixture
+def seeded():
+    init_db()
+    _clear()
+    with TimeSeriesWriter() as writer:
+        writer.add(SubnetAPY(netuid=NETUID, data=_payload([1, 2, 3]), recorded_at=DAY_START + timedelta(minutes=5)))
+        writer.add(SubnetAPY(netuid=NETUID, data=_payload([5, 0]), recorded_at=DAY_START + timedelta(minutes=40)))
+        # Seen again unchanged two hours later: counts for hours 1 and 2 as well
+        writer.add(SubnetAPY(netuid=NETUID, data=_payload([5, 0]), recorded_at=DAY_START + timedelta(hours=2, minutes=10)))
+    yield
+    _clear()
+
+def test_hourly_rollups_cover_heartbeated_snapshots(seeded):
+    written = run_rollups(now=DAY_START + timedelta(days=1, hours=1), netuids=[NETUID])
+    assert written == {"subnet_apy_hourly": 3, "subnet_apy_daily": 1}
+
+    hourly = load_apy_rollups("hourly", [NETUID])
+    assert [h.hour for h in hourly["bucket_start"]] == [0, 1, 2]
+    first = hourly.iloc[0]
+    assert first["samples"] == 2 and first["validator_count"] == 3
+    assert first["apy_count"] == 4  # zero APYs are left out
+    assert (first["apy_min"], first["apy_max"], first["apy_mean"], first["apy_median"]) == (1, 5, 2.75, 2.5)
+    assert first["alpha_stake_total"] == 25
+
+    daily = load_apy_rollups("daily", [NETUID]).iloc[0]
+    assert daily["bucket_start"] == DAY_START
+    assert daily["samples"] == 4 and daily["apy_count"] == 6
+    assert (daily["apy_min"], daily["apy_max"]) == (1, 5)
+    values = [1, 2, 3, 5, 5, 5]
+    mean = sum(values) / len(values)
+    assert daily["apy_mean"] == pytest.approx(mean)
+    assert daily["apy_std"] == pytest.approx((sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5)
+
+def test_rollups_only_cover_complete_buckets_once(seeded):
+    assert run_rollups(now=DAY_START + timedelta(hours=1, minutes=30), netuids=[NETUID]) == \
+        {"subnet_apy_hourly": 1, "subnet_apy_daily": 0}
+    assert run_rollups(now=DAY_START + timedelta(hours=1, minutes=50), netuids=[NETUID]) == \
+        {"subnet_apy_hourly": 0, "subnet_apy_daily": 0}
+    assert run_rollups(now=DAY_START + timedelta(days=2), netuids=[NETUID]) == \
+        {"subnet_apy_hourly": 2, "subnet_apy_daily": 1}
+    assert len(load_apy_rollups("hourly", [NETUID])) == 3
+
+def test_heartbeat_after_daily_rollup_rebuilds_the_day():
+    init_db()
+    _clear()
+    try:
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data=_payload([2, 4]), recorded_at=DAY_START + timedelta(minutes=10)))
+        assert run_rollups(now=DAY_START + timedelta(days=1, minutes=5), netuids=[NETUID]) == \
+            {"subnet_apy_hourly": 1, "subnet_apy_daily": 1}
+
+        # Seen again unchanged the next day: it was observed through all of DAY_START
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data=_payload([2, 4]), recorded_at=DAY_START + timedelta(days=1, minutes=10)))
+        written = run_rollups(now=DAY_START + timedelta(days=1, hours=1, minutes=5), netuids=[NETUID])
+        assert written == {"subnet_apy_hourly": 24, "subnet_apy_daily": 1}
+
+        hourly = load_apy_rollups("hourly", [NETUID])
+        assert (hourly["bucket_start"] < DAY_START + timedelta(days=1)).sum() == 24
+        daily = load_apy_rollups("daily", [NETUID])
+        assert len(daily) == 1
+        day = daily.iloc[0]
+        assert day["samples"] == 24 and day["apy_count"] == 48
+        assert (day["apy_min"], day["apy_max"], day["apy_mean"]) == (2, 4, 3)
+    finally:
+        _clear()
@@ -0,0 +1,75 @@
+import calendar
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.locks import LeaderLock, try_acquire_lease, release_lease
+from app.config import COLLECTION_MAX_ATTEMPTS
+from app.journal import begin_run, record_attempt, window_run_id
+from app.scheduler import parse_frequency, build_jobs
+
+def test_parse_frequency():
+    assert parse_frequency("hourly") == 3600
+    assert parse_frequency("Daily") == 86400
+    assert parse_frequency("weekly") == 604800
+    assert parse_frequency("900") == 900
+
+def test_build_jobs_skips_metrics_without_collector():
+    jobs = build_jobs({"apy": "daily", "entropy": "hourly"})
+    assert list(jobs) == ["apy"]
+    assert jobs["apy"].interval == 86400
+
+def test_lease_is_exclusive_until_released():
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    assert try_acquire_lease(name, "a", ttl=60)
+    assert not try_acquire_lease(name, "b", ttl=60)
+    assert try_acquire_lease(name, "a", ttl=60)  # renewal
+    release_lease(name, "a")
+    assert try_acquire_lease(name, "b", ttl=60)
+    release_lease(name, "b")
+
+def test_only_one_leader():
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    first, second = LeaderLock(name, ttl=60), LeaderLock(name, ttl=60)
+    second.holder += ":other"
+    try:
+        assert first.acquire()
+        assert not second.acquire()
+        first.release()
+        assert second.acquire()
+    finally:
+        first.release()
+        second.release()
+
+def test_jittered_runs_get_one_run_id_per_window():
+    """A year of daily runs of varying length never repeats or skips a window."""
+    job = build_jobs({"apy": "daily"})["apy"]
+    random.seed(6)
+    started = calendar.timegm(datetime(2024, 1, 1, 23, 30).timetuple())
+    run_ids = []
+    for _ in range(365):
+        run_ids.append(window_run_id("apy", job.interval, datetime.utcfromtimestamp(started)))
+        finished = started + random.uniform(60, 3 * 3600)
+        # The scheduler only starts a due job once the previous one has finished
+        started = max(job.next_window_run(started), finished)
+    days = {datetime.strptime(run_id.split(":")[1], "%Y%m%dT%H%M") for run_id in run_ids}
+    assert len(days) == 365
+    assert max(days) - min(days) == timedelta(days=364)
+
+def test_failed_netuids_resume_the_window_until_the_attempt_cap():
+    job = build_jobs({"apy": "daily"})["apy"]
+    run_id = window_run_id("apy", job.interval)
+    begin_run(run_id, "apy", [9101, 9102])
+    record_attempt(run_id, 9101, True, 1.0)
+    record_attempt(run_id, 9102, False, 1.0, "timeout")
+
+    now = time.time()
+    job.schedule_from_history()
+    assert job.next_run <= time.time()
+    assert begin_run(run_id, "apy", [9101, 9102]) == ([9102], [9101])
+
+    for _ in range(COLLECTION_MAX_ATTEMPTS - 1):
+        record_attempt(run_id, 9102, False, 1.0, "timeout")
+    job.schedule_from_history()
+    assert job.next_run >= now - now % job.interval + job.interval
+    assert begin_run(run_id, "apy", [9101, 9102]) == ([], [9101])
@@ -0,0 +1,262 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import requests
+from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app import database, utils
+from app.database import SessionLocal
+from app.locks import try_acquire_lease, release_lease
+from app.models import init_db
+from app.utils import (SubnetInfoCache, CacheGeneration, SUBNET_INFO_ENDPOINT, fetch_and_cache_json,
+                       publish_cache_generation, query_current_generation)
+
+def _clear():
+    init_db()
+    session = SessionLocal()
+    session.query(SubnetInfoCache).delete()
+    session.query(CacheGeneration).filter(CacheGeneration.table_name == SubnetInfoCache.__tablename__).delete()
+    session.commit()
+    session.close()
+
+def _current_netuids():
+    session = SessionLocal()
+    rows = query_current_generation(session, SubnetInfoCache, SubnetInfoCache.netuid).all()
+    session.close()
+    return rows
+
+def _fake_upstream(monkeypatch, calls, delay=0.3):
+    def fake_get(url, headers=None):
+        calls.append(url)
+        time.sleep(delay)
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b'[{"netuid": 1, "name": "alpha"}]'
+        resp.not_modified = False
+        return resp
+    monkeypatch.setattr(utils, "conditional_get", fake_get)
+
+def test_concurrent_misses_fetch_once(monkeypatch):
+    """Threads missing the cache together trigger a single upstream fetch."""
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _clear()
+
+    assert len(calls) == 1
+    assert results == [[{"netuid": 1, "name": "alpha"}]] * 4
+
+def test_waits_for_other_process_refresh(monkeypatch):
+    """While another process holds the refresh lease, reuse the rows it writes."""
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls)
+    monkeypatch.setattr(utils, "REFRESH_POLL_SECONDS", 0.05)
+    lease = f"refresh:{SUBNET_INFO_ENDPOINT}"
+    assert try_acquire_lease(lease, "other-dyno", 30)
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache)))
+    waiter.start()
+    time.sleep(0.2)
+    session = SessionLocal()
+    publish_cache_generation(session, SubnetInfoCache, [{"netuid": 2}])
+    session.close()
+    waiter.join(timeout=5)
+    release_lease(lease, "other-dyno")
+    _clear()
+
+    assert calls == []
+    assert result == [[{"netuid": 2}]]
+
+def _insert(netuid, age_seconds):
+    session = SessionLocal()
+    publish_cache_generation(session, SubnetInfoCache, [{"netuid": netuid}])
+    session.query(CacheGeneration)\
+        .filter(CacheGeneration.table_name == SubnetInfoCache.__tablename__)\
+        .update({CacheGeneration.updated_at: datetime.utcnow() - timedelta(seconds=age_seconds)})
+    session.commit()
+    session.close()
+
+def test_stale_rows_served_while_revalidating(monkeypatch):
+    """Expired rows come back immediately and a background thread refreshes them."""
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls)
+    monkeypatch.setattr(utils, "CACHE_STALE_WHILE_REVALIDATE", True)
+    _insert(3, utils.CACHE_DEFAULT_TIMEOUT + 60)
+
+    start = time.monotonic()
+    assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 3}]
+    assert time.monotonic() - start < 0.3  # did not wait for the fake upstream
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        rows = _current_netuids()
+        if rows == [(1,)]:
+            break
+        time.sleep(0.05)
+    _clear()
+    assert calls and rows == [(1,)]
+
+def test_too_stale_rows_refresh_synchronously(monkeypatch):
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls, delay=0)
+    monkeypatch.setattr(utils, "CACHE_STALE_WHILE_REVALIDATE", True)
+    _insert(4, utils.CACHE_MAX_STALENESS + 60)
+
+    assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 1, "name": "alpha"}]
+    _clear()
+    assert len(calls) == 1
+
+def test_exhausted_budget_serves_old_rows_instead_of_blocking(monkeypatch):
+    """A web request that gets no request token in time falls back to the cached generation."""
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls, delay=0)
+    def no_token(timeout=None):
+        assert timeout is not None
+        raise utils.RateLimitTimeout("paused upstream")
+    monkeypatch.setattr(utils.tao_api_budget, "acquire", no_token)
+    _insert(5, utils.CACHE_MAX_STALENESS + 60)
+
+    assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 5}]
+    _clear()
+    assert calls == []
+
+def test_web_request_serves_old_rows_while_a_refresh_is_stuck(monkeypatch):
+    """A background refresh blocked on the upstream never holds a web request past its deadline."""
+    _clear()
+    calls = []
+    _fake_upstream(monkeypatch, calls, delay=0)
+    monkeypatch.setitem(utils.TAO_API_RATE_LIMIT, "web_acquire_timeout", 0.2)
+    _insert(6, utils.CACHE_MAX_STALENESS + 60)
+    lock = utils._refresh_lock(SUBNET_INFO_ENDPOINT)
+    lock.acquire()
+    try:
+        start = time.monotonic()
+        assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 6}]
+        assert time.monotonic() - start < 1
+    finally:
+        lock.release()
+
+    lease = f"refresh:{SUBNET_INFO_ENDPOINT}"
+    assert try_acquire_lease(lease, "other-dyno", 30)
+    try:
+        start = time.monotonic()
+        assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 6}]
+        assert time.monotonic() - start < 1
+    finally:
+        release_lease(lease, "other-dyno")
+        _clear()
+    assert calls == []
+
+def test_readers_never_see_a_partial_generation():
+    """A new generation only becomes visible once all its rows are committed."""
+    _clear()
+    session = SessionLocal()
+    publish_cache_generation(session, SubnetInfoCache, [{"netuid": n} for n in range(3)])
+
+    writer = SessionLocal()
+    writer.add(SubnetInfoCache(generation=99, netuid=0, data='{"netuid": 0}'))
+    writer.flush()  # half-written generation, not yet pointed at
+    assert sorted(n for (n,) in _current_netuids()) == [0, 1, 2]
+    writer.rollback()
+    writer.close()
+
+    publish_cache_generation(session, SubnetInfoCache, [{"netuid": 7}])
+    session.close()
+    assert _current_netuids() == [(7,)]
+    _clear()
+
+def test_legacy_repr_rows_are_reencoded_as_json():
+    _clear()
+    session = SessionLocal()
+    publish_cache_generation(session, SubnetInfoCache, [{"netuid": 5, "subnet_name": "five"}])
+    session.query(SubnetInfoCache).update({SubnetInfoCache.data: str({"netuid": 5, "subnet_name": "five", "price": None})})
+    session.commit()
+    session.close()
+
+    session = SessionLocal()
+    session.query(SubnetInfoCache).update({SubnetInfoCache.subnet_name: None})
+    session.commit()
+    session.close()
+
+    utils._migrate_cache_rows(backfill=[SubnetInfoCache])
+
+    df = utils.load_cache_df(SubnetInfoCache)
+    typed = utils.load_cache_df(SubnetInfoCache, fields=['netuid', 'subnet_name'])
+    _clear()
+    assert df.to_dict('records') == [{"netuid": 5, "subnet_name": "five", "price": None}]
+    assert typed.to_dict('records') == [{"netuid": 5, "subnet_name": "five"}]
+
+def test_typed_fields_are_selected_without_the_blob():
+    _clear()
+    session = SessionLocal()
+    publish_cache_generation(session, SubnetInfoCache, [
+        {"netuid": 1, "market_cap_tao": "1500.5", "price": 0.02, "subnet_name": "one", "extra": [1, 2]},
+        {"netuid": 2, "market_cap_tao": "n/a", "price": None},
+    ])
+    session.close()
+
+    df = utils.load_cache_df(SubnetInfoCache, fields=['netuid', 'market_cap_tao', 'subnet_name'], dtypes={'netuid': int})
+    _clear()
+    records = df.sort_values('netuid').to_dict('records')
+    assert records[0] == {"netuid": 1, "market_cap_tao": 1500.5, "subnet_name": "one"}
+    assert records[1]["subnet_name"] is None and records[1]["market_cap_tao"] != records[1]["market_cap_tao"]  # NaN
+
+def test_web_request_reads_through_the_request_session():
+    """Cache reads inside a request share its session instead of opening their own."""
+    _clear()
+    _insert(8, 0)
+    app = Flask(__name__)
+    database.init_app(app)
+    sessions = []
+
+    def record(session, transaction, connection):
+        # Generation cleanup from _insert runs in threads of its own
+        if threading.current_thread() is threading.main_thread():
+            sessions.append(session)
+
+    event.listen(Session, "after_begin", record)
+    try:
+        with app.app_context():
+            assert utils.cache_updated_at(SubnetInfoCache) is not None
+            assert fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache) == [{"netuid": 8}]
+            assert utils.load_cache_df(SubnetInfoCache, fields=['netuid'])['netuid'].tolist() == [8]
+            request = database.request_session()
+    finally:
+        event.remove(Session, "after_begin", record)
+        _clear()
+    assert sessions and all(session is request for session in sessions)
+
+def test_legacy_cache_tables_are_carried_over_and_reencoded():
+    """A database from before generations keeps its rows, re-encoded as JSON with typed columns."""
+    _clear()
+    SubnetInfoCache.__table__.drop(bind=database.engine)
+    updated_at = datetime.utcnow() - timedelta(minutes=5)
+    with database.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE subnet_info (netuid INTEGER PRIMARY KEY, data TEXT, updated_at DATETIME)"))
+        conn.execute(text("INSERT INTO subnet_info VALUES (:netuid, :data, :updated_at)"), [
+            {"netuid": 3, "data": str({"netuid": 3, "subnet_name": "three", "price": 0.5}), "updated_at": updated_at},
+            {"netuid": 4, "data": str({"netuid": 4, "subnet_name": "four", "price": None}), "updated_at": updated_at},
+        ])
+    try:
+        utils.init_cache_tables()
+        typed = utils.load_cache_df(SubnetInfoCache, fields=['netuid', 'subnet_name'])
+        assert sorted(typed.to_dict('records'), key=lambda r: r['netuid']) == [
+            {"netuid": 3, "subnet_name": "three"}, {"netuid": 4, "subnet_name": "four"}]
+        assert sorted(fetch_and_cache_json(SUBNET_INFO_ENDPOINT, SubnetInfoCache), key=lambda r: r['netuid']) == [
+            {"netuid": 3, "subnet_name": "three", "price": 0.5}, {"netuid": 4, "subnet_name": "four", "price": None}]
+        assert utils.cache_updated_at(SubnetInfoCache) == updated_at
+    finally:
+        _clear()
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pandas as pd
+from app import snapshots
+from app.models import SubnetAPY, TimeSeriesWriter, get_db, init_db
+
+NETUID = 9201
+
+def test_snapshot_built_once_per_version_and_mapped(tmp_path, monkeypatch):
+    init_db()
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({"netuid": np.arange(3), "apy": np.linspace(1, 3, 3), "name": ["a", "b", None]})
+
+    snapshots.register_dataset("test_apy", build, ("subnet_apy",))
+    try:
+        first = snapshots.load_snapshot("test_apy")
+        snapshots._loaded.pop("test_apy")  # as seen from another worker
+        second = snapshots.load_snapshot("test_apy")
+        assert calls == [1]
+        pd.testing.assert_frame_equal(first, second)
+        assert not second["apy"].to_numpy().flags.writeable
+
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data={"apy": float(len(os.listdir(tmp_path)))}))
+        snapshots.load_snapshot("test_apy")
+        assert calls == [1, 1]
+        assert len([f for f in os.listdir(tmp_path) if f.endswith(".snap")]) == 1
+    finally:
+        snapshots.DATASETS.pop("test_apy")
+        snapshots._loaded.pop("test_apy", None)
+        with get_db() as db:
+            db.query(SubnetAPY).filter(SubnetAPY.netuid == NETUID).delete(synchronize_session=False)
+            db.commit()
+
+def test_empty_frames_are_not_persisted_and_removed_files_are_reloaded(tmp_path, monkeypatch):
+    init_db()
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    frames = [pd.DataFrame(), pd.DataFrame({"netuid": [1]}), pd.DataFrame({"netuid": [2]})]
+    snapshots.register_dataset("test_gap", lambda: frames.pop(0), ("subnet_apy",))
+    real_read = snapshots._read
+    reads = []
+
+    def read_after_newer_version_removed_it(path):
+        reads.append(path)
+        if len(reads) == 1:
+            os.remove(path)
+        return real_read(path)
+
+    monkeypatch.setattr(snapshots, "_read", read_after_newer_version_removed_it)
+    try:
+        assert snapshots.load_snapshot("test_gap").empty
+        assert not [f for f in os.listdir(tmp_path) if f.endswith(".snap")]
+        assert snapshots.load_snapshot("test_gap")["netuid"].tolist() == [2]
+        assert len(reads) == 2
+    finally:
+        snapshots.DATASETS.pop("test_gap")
+        snapshots._loaded.pop("test_gap", None)
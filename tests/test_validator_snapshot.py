@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.locks import release_lease, try_acquire_lease
+from app.models import SubnetAPY, TimeSeriesWriter, ValidatorAPYSnapshot, backfill_snapshot_tables, get_db, init_db
+from app.subnet_metrics import load_all_validator_apy_df
+
+NETUID = 9301
+
+def _payload(apy):
+    return {"apy": apy, "validator_apys": [
+        {"hotkey": "5A", "validator_name": "", "alpha_apy": str(apy), "alpha_stake": "10", "nominated_stake": None, "vtrust": 0.9},
+        {"hotkey": "5B", "validator_name": "b", "alpha_apy": None, "alpha_stake": 1, "nominated_stake": 2, "vtrust": None},
+    ]}
+
+def _clear():
+    with get_db() as db:
+        for model in (SubnetAPY, ValidatorAPYSnapshot):
+            db.query(model).filter(model.netuid == NETUID).delete(synchronize_session=False)
+        db.commit()
+
+def _facts():
+    with get_db() as db:
+        return db.query(ValidatorAPYSnapshot).filter(ValidatorAPYSnapshot.netuid == NETUID)\
+            .order_by(ValidatorAPYSnapshot.recorded_at, ValidatorAPYSnapshot.hotkey).all()
+
+def test_writer_populates_validator_rows_for_new_snapshots_only():
+    init_db()
+    _clear()
+    now = datetime.utcnow()
+    try:
+        with TimeSeriesWriter() as writer:
+            writer.add(SubnetAPY(netuid=NETUID, data=_payload(5), recorded_at=now - timedelta(hours=2)))
+            writer.add(SubnetAPY(netuid=NETUID, data=_payload(5), recorded_at=now - timedelta(hours=1)))
+            writer.add(SubnetAPY(netuid=NETUID, data=_payload(7), recorded_at=now))
+        facts = _facts()
+        assert [(f.hotkey, f.alpha_apy, f.alpha_stake) for f in facts] == [
+            ("5A", 5.0, 10.0), ("5B", None, 1.0), ("5A", 7.0, 10.0), ("5B", None, 1.0)]
+        assert facts[-1].recorded_at == now
+
+        df = load_all_validator_apy_df()
+        df = df[df["netuid"] == NETUID]
+        assert df[["hotkey", "alpha_apy", "validator_name", "nominated_stake"]].values.tolist() == [["5A", 7.0, "No-name", 0]]
+    finally:
+        _clear()
+
+def test_backfill_skips_while_another_process_holds_the_lease():
+    init_db()
+    _clear()
+    now = datetime.utcnow()
+    lease = f"backfill:{ValidatorAPYSnapshot.__tablename__}"
+    try:
+        with get_db() as db:
+            db.query(ValidatorAPYSnapshot).delete()
+            db.add(SubnetAPY(netuid=NETUID, data=_payload(5), recorded_at=now))
+            db.commit()
+        assert try_acquire_lease(lease, "other-worker", 60)
+        assert backfill_snapshot_tables() == 0
+        release_lease(lease, "other-worker")
+
+        assert backfill_snapshot_tables() >= 2
+        assert [f.hotkey for f in _facts()] == ["5A", "5B"]
+        with get_db() as db:
+            db.add(ValidatorAPYSnapshot(netuid=NETUID, recorded_at=now, hotkey="5A"))
+            with pytest.raises(IntegrityError):
+                db.commit()
+    finally:
+        release_lease(lease, "other-worker")
+        _clear()